@@ -6,19 +6,29 @@ Strictly rule-based: only uses patterns/sets/weights defined in your bundles (+
 Charts: matplotlib (single-plot per chart), with explicit colors (requested by user).
 """
 
-import argparse, base64, io, json, math, os, re, sys, textwrap, zipfile
+import argparse, base64, gzip, hashlib, html, importlib.util, inspect, io, json, math, os, pickle, re, sys, textwrap, time, zipfile, zlib
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from collections import defaultdict, Counter
+from array import array
+from collections import defaultdict, deque, Counter
 
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import yaml
 
 # Import Absence Detection Module
-from DETECT_absence_meta import integrate_absence_detection
+from DETECT_absence_meta import OnlineAbsenceDetector, absence_params, build_tag_index, detect_absence_meta
+from pattern_scanner import PatternScanner
+
+try:  # optional: --compress zstd
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
 
 # -------------------------
 # Paths & defaults
@@ -34,6 +44,11 @@ EXTRA_MARKERS_PATH = Path("extra_markers.yaml")
 REPORT_TEMPLATE_PATH = Path("report_template.html")
 ABSENCE_CONFIG_PATH = Path("absence_meta_config.yaml")
 
+# On-disk cache of parsed archive members (see ZipIndex); opt-in via --cache / --cache-dir
+PARSE_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "analyze_chat"
+PARSE_CACHE_VERSION = 1  # bump when the cached entry layout changes
+STREAM_BATCH = 4096  # messages per scan_corpus call in --stream mode
+
 # Color palette (explicitly colorful as requested)
 PALETTE = [
     "#5B8FF9", "#5AD8A6", "#5D7092", "#F6BD16", "#E8684A",
@@ -46,67 +61,225 @@ BAR_NEU = "#5D7092"
 # -------------------------
 # Robust ZIP loader helpers
 # -------------------------
-def _zip_namelist(zp: Path):
-    if not zp.exists():
-        return []
-    with zipfile.ZipFile(zp, "r") as z:
-        return z.namelist()
+class ZipIndex:
+    """Single-pass view of one archive: opened once, each member parsed at most once.
+
+    Parsed results are memoized and, with ``cache_dir``, persisted to a pickle
+    keyed by cache format version, parser fingerprint, archive size, mtime and
+    a CRC over the central directory (member names + CRC32s), so repeat runs
+    skip YAML/JSON parsing entirely. The pickle is trusted: only point
+    ``cache_dir`` at a directory you own.
+    Use as a context manager (or call ``close()``) to release the archive.
+    """
 
-def read_text_from_zip(zp: Path, name_contains: str, fallback_exact: str = None, encoding="utf-8"):
-    """Read the first file in zip that contains substring; fallback to exact name if given."""
-    if not zp.exists():
-        return None
-    with zipfile.ZipFile(zp, "r") as z:
-        target = None
-        for n in z.namelist():
+    def __init__(self, zp: Path, cache_dir: Path = None):
+        self.path = Path(zp) if zp else None
+        self.names = []
+        self._zip = None
+        self._memo = {}
+        self._dirty = False
+        self._cache_file = None
+        self.key = None
+        if not self.path or not self.path.exists():
+            return
+        self._zip = zipfile.ZipFile(self.path, "r")
+        infos = self._zip.infolist()
+        self.names = [i.filename for i in infos]
+        crc = 0
+        for i in infos:
+            crc = zlib.crc32(f"{i.filename}\0{i.CRC}\0{i.file_size}\n".encode("utf-8"), crc)
+        st = self.path.stat()
+        self.key = (PARSE_CACHE_VERSION, _parser_fingerprint(), st.st_size, st.st_mtime_ns, crc)
+        if cache_dir:
+            tag = hashlib.sha1(str(self.path.resolve()).encode("utf-8")).hexdigest()[:12]
+            self._cache_file = Path(cache_dir) / f"{self.path.stem}-{tag}.pickle"
+            try:
+                with open(self._cache_file, "rb") as f:
+                    cached = pickle.load(f)
+                if cached.get("key") == self.key:
+                    self._memo = cached["entries"]
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Write back newly parsed members (if caching) and close the archive."""
+        if self._dirty and self._cache_file:
+            try:
+                self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self._cache_file.with_name(self._cache_file.name + f".{os.getpid()}.tmp")
+                with open(tmp, "wb") as f:
+                    pickle.dump({"key": self.key, "entries": self._memo}, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self._cache_file)
+            except OSError:
+                pass
+            self._dirty = False
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+    def _get(self, key, build):
+        if key not in self._memo:
+            self._memo[key] = build()
+            self._dirty = True
+        return self._memo[key]
+
+    def _read(self, name):
+        if self._zip is None:  # closed after a previous pass: reopen once
+            self._zip = zipfile.ZipFile(self.path, "r")
+        return self._zip.read(name)
+
+    def find(self, name_contains: str, fallback_exact: str = None):
+        for n in self.names:
             if name_contains in n and not n.endswith("/"):
-                target = n; break
-        if not target and fallback_exact and fallback_exact in z.namelist():
-            target = fallback_exact
+                return n
+        if fallback_exact and fallback_exact in self.names:
+            return fallback_exact
+        return None
+
+    def text(self, name_contains: str, fallback_exact: str = None, encoding="utf-8"):
+        """First member whose name contains substring (or exact fallback), decoded."""
+        target = self.find(name_contains, fallback_exact)
         if not target:
             return None
-        data = z.read(target)
+        def build():
+            data = self._read(target)
+            try:
+                return data.decode(encoding, errors="ignore")
+            except Exception:
+                return data.decode("utf-8", errors="ignore")
+        return self._get(("text", target, encoding), build)
+
+    def yaml_docs(self):
+        """All non-empty YAML documents in the archive (unparseable members skipped)."""
+        def build():
+            out = []
+            for n in self.names:
+                if n.lower().endswith((".yml", ".yaml")) and not n.endswith("/"):
+                    try:
+                        obj = yaml.safe_load(self._read(n))
+                        if obj:
+                            out.append(obj)
+                    except Exception:
+                        pass
+            return out
+        return self._get(("yaml_docs",), build)
+
+    def json_docs(self):
+        """All parseable JSON members: name -> object."""
+        def build():
+            out = {}
+            for n in self.names:
+                if n.lower().endswith(".json") and not n.endswith("/"):
+                    try:
+                        txt = self._read(n).decode("utf-8", errors="ignore")
+                        out[n] = json.loads(txt)
+                    except Exception:
+                        pass
+            return out
+        return self._get(("json_docs",), build)
+
+@lru_cache(maxsize=1)
+def _parser_fingerprint():
+    """Hash over the member parsers (ZipIndex source + PyYAML version) for the cache key."""
     try:
-        return data.decode(encoding, errors="ignore")
-    except Exception:
-        return data.decode("utf-8", errors="ignore")
+        src = inspect.getsource(ZipIndex)
+    except (OSError, TypeError):  # no source available: never reuse a cache
+        src = repr(time.time_ns())
+    return hashlib.sha1(f"{yaml.__version__}\0{src}".encode("utf-8")).hexdigest()[:16]
+
+def _zip_namelist(zp: Path):
+    with ZipIndex(zp) as z:
+        return z.names
+
+def read_text_from_zip(zp: Path, name_contains: str, fallback_exact: str = None, encoding="utf-8"):
+    """Read the first file in zip that contains substring; fallback to exact name if given."""
+    with ZipIndex(zp) as z:
+        return z.text(name_contains, fallback_exact, encoding)
 
 def read_all_yaml_from_zip(zp: Path):
-    out = []
-    if not zp.exists():
-        return out
-    with zipfile.ZipFile(zp, "r") as z:
-        for n in z.namelist():
-            if n.lower().endswith((".yml", ".yaml")) and not n.endswith("/"):
-                try:
-                    obj = yaml.safe_load(z.read(n))
-                    if obj:
-                        out.append(obj)
-                except Exception:
-                    pass
-    return out
+    with ZipIndex(zp) as z:
+        return list(z.yaml_docs())
 
 def read_all_json_from_zip(zp: Path):
-    out = {}
-    if not zp.exists():
-        return out
-    with zipfile.ZipFile(zp, "r") as z:
-        for n in z.namelist():
-            if n.lower().endswith(".json") and not n.endswith("/"):
-                try:
-                    txt = z.read(n).decode("utf-8", errors="ignore")
-                    obj = json.loads(txt)
-                    out[n] = obj
-                except Exception:
-                    pass
-    return out
+    with ZipIndex(zp) as z:
+        return dict(z.json_docs())
 
 # -------------------------
 # Resource loading
 # -------------------------
+class MarkerTables:
+    """Frozen per-marker lookup arrays, compiled once per Resources.
+
+    Marker ids are interned to codes 0..G-1 (`code`). Every array has one
+    extra trailing entry with the defaults for unknown markers (weight 1.0,
+    no axis/narrative, neither E nor D), so code -1 needs no special case.
+    `E_SET` / `D_SET` are the frozen sets behind `is_E` / `is_D`.
+    """
+    __slots__ = ("ids", "code", "weight", "axes", "axis", "narratives", "narr", "is_E", "is_D",
+                 "E_SET", "D_SET", "d_candidates")
+
+    def __init__(self, ids, marker_weights, marker_to_primary, axes, marker_to_narr, E_SET, D_SET):
+        self.ids = tuple(dict.fromkeys(ids))
+        self.code = {m: k for k, m in enumerate(self.ids)}
+        self.axes = tuple(dict.fromkeys([*axes, *marker_to_primary.values()]))
+        self.narratives = tuple(dict.fromkeys(marker_to_narr.values()))
+        ax = {a: k for k, a in enumerate(self.axes)}
+        na = {x: k for k, x in enumerate(self.narratives)}
+        col = lambda f, default, dtype: np.array([f(m) for m in self.ids] + [default], dtype=dtype)
+        w = lambda m: float(marker_weights.get(m, 1.0))
+        self.weight = col(w, 1.0, float)
+        self.axis = col(lambda m: ax.get(marker_to_primary.get(m), -1), -1, np.int32)
+        self.narr = col(lambda m: na.get(marker_to_narr.get(m), -1), -1, np.int32)
+        self.E_SET, self.D_SET = frozenset(E_SET), frozenset(D_SET)
+        self.is_E = col(lambda m: m in E_SET, False, bool)
+        self.is_D = col(lambda m: m in D_SET, False, bool)
+        for a in (self.weight, self.axis, self.narr, self.is_E, self.is_D):
+            a.flags.writeable = False
+        # generic balancing candidates for build_objective_tips(): D markers by weight (ties by id)
+        self.d_candidates = tuple(sorted(D_SET, key=lambda m: (-w(m), m)))
+
+    def lookup(self, markers):
+        """Codes (-1 = unknown) for a list of marker ids, e.g. HitTable.markers."""
+        code = self.code
+        return np.fromiter((code.get(m, -1) for m in markers), dtype=np.int64, count=len(markers))
+
+    def counts(self, hits):
+        """(codes, counts) per distinct marker of a HitTable, hit dicts or a marker Counter."""
+        if isinstance(hits, HitTable):
+            return self.lookup(hits.markers), hits.marker_bincount()
+        cnt = _marker_counter(hits)
+        return self.lookup(list(cnt)), np.fromiter(cnt.values(), dtype=np.int64, count=len(cnt))
+
+    def ed(self, hits):
+        codes, n = self.counts(hits)
+        return int(n[self.is_E[codes]].sum()), int(n[self.is_D[codes]].sum())
+
+    def weighted_sum(self, hits):
+        codes, n = self.counts(hits)
+        return float(n @ self.weight[codes])
+
+    def primary_counts(self, hits) -> Counter:
+        """Counter(axis), keys in first-appearance order like compute_primary_counts()."""
+        codes, n = self.counts(hits)
+        a = self.axis[codes]
+        keep = a >= 0
+        a, n = a[keep], n[keep]
+        if not len(a):
+            return Counter()
+        uniq, first = np.unique(a, return_index=True)
+        sums = np.bincount(a, weights=n, minlength=len(self.axes))
+        return Counter({self.axes[k]: int(sums[k]) for k in uniq[np.argsort(first)].tolist()})
+
 class Resources:
     def __init__(self, zip_schema: Path, zip_markers: Path, zip_detectors: Path,
-                 themes_map: Path, actions_map: Path, extra_markers: Path, absence_config: Path):
+                 themes_map: Path, actions_map: Path, extra_markers: Path, absence_config: Path,
+                 cache_dir: Path = None):
         self.zip_schema = zip_schema
         self.zip_markers = zip_markers
         self.zip_detectors = zip_detectors
@@ -115,6 +288,17 @@ class Resources:
         self.extra_markers = self._load_yaml(extra_markers) or []
         self.absence_config = self._load_yaml(absence_config) or {}
 
+        # Each archive is opened once; parsed members are shared (and disk-cached)
+        self._schema_zip = ZipIndex(zip_schema, cache_dir)
+        self._marker_zip = ZipIndex(zip_markers, cache_dir)
+        try:
+            self._load_from_archives()
+        finally:
+            self._schema_zip.close()
+            self._marker_zip.close()
+
+    def _load_from_archives(self):
+        """Everything derived from the schema/marker archives (indices are open here)."""
         # Try to load canonical files from schema zip
         self.schema_bundle = self._load_schema_bundle()
         self.sets_cfg = self._load_sets_cfg()
@@ -122,13 +306,15 @@ class Resources:
 
         # Build regex marker registry from: schema bundle groups + markers zip + extras
         self.regex_markers = self._build_regex_registry()
+        # Literal prefilter + combined automata over the same registry
+        self.marker_scanner = PatternScanner(self.regex_markers)
 
         # Map: marker_id -> primary axis/category (best-effort, uses schema metrics.primaryOrder + descriptions/tags)
         self.primary_axes = self._extract_primary_axes()
         self.marker_to_primary = self._map_marker_to_primary()
 
-        # E/D sets (fallback-safe)
-        self.E_SET, self.D_SET = self._extract_ED_sets()
+        # E/D sets (fallback-safe); read them frozen via E_SET / D_SET (= R.tables)
+        self.ed_sets = self._extract_ED_sets()
 
         # Optional: human labels for markers (from YAML 'frame.*')
         self.marker_labels = self._build_marker_labels()
@@ -139,6 +325,30 @@ class Resources:
         # Build complete marker registry for absence detection
         self.complete_marker_registry = self._build_complete_marker_registry()
 
+        self.compile_tables()
+
+    def compile_tables(self):
+        """Frozen lookup structures for the report stage (MarkerTables, ThemeMatrix).
+
+        Built from the dicts/sets above; call again after changing any of them.
+        """
+        mw = self.weights.get("marker_weights", {}) if isinstance(self.weights, dict) else {}
+        E, D = self.ed_sets
+        ids = [*self.regex_markers, *self.marker_labels, *self.marker_to_primary, *self.marker_to_narr,
+               *sorted(E), *sorted(D), *mw]
+        self.tables = MarkerTables(ids, mw, self.marker_to_primary, self.primary_axes, self.marker_to_narr,
+                                   E, D)
+        self.theme_matrix = ThemeMatrix(self.themes_map, self.marker_to_narr, self.marker_to_primary,
+                                        self.primary_axes)
+
+    @property
+    def E_SET(self) -> frozenset:
+        return self.tables.E_SET
+
+    @property
+    def D_SET(self) -> frozenset:
+        return self.tables.D_SET
+
     def _load_yaml(self, p: Path):
         if not p or not p.exists():
             return None
@@ -147,14 +357,14 @@ class Resources:
 
     def _load_schema_bundle(self):
         # Prefer an obvious file
-        txt = read_text_from_zip(self.zip_schema, "schema_full_bundle.json", fallback_exact="schema_full_bundle.json")
+        txt = self._schema_zip.text("schema_full_bundle.json", fallback_exact="schema_full_bundle.json")
         if txt:
             try:
                 return json.loads(txt)
             except Exception:
                 pass
         # Fallback: pick the largest json in schema zip
-        allj = read_all_json_from_zip(self.zip_schema)
+        allj = self._schema_zip.json_docs()
         if allj:
             # choose by size
             name = max(allj.keys(), key=lambda n: len(json.dumps(allj[n])))
@@ -162,14 +372,14 @@ class Resources:
         return {"ATO": [], "SEM": [], "CLU": [], "MEMA": [], "metrics": {"primaryOrder": []}}
 
     def _load_sets_cfg(self):
-        txt = read_text_from_zip(self.zip_schema, "sets_config.json", fallback_exact="sets_config.json")
+        txt = self._schema_zip.text("sets_config.json", fallback_exact="sets_config.json")
         if txt:
             try: return json.loads(txt)
             except Exception: pass
         return {"E": [], "D": []}
 
     def _load_weights(self):
-        txt = read_text_from_zip(self.zip_schema, "weights.json", fallback_exact="weights.json")
+        txt = self._schema_zip.text("weights.json", fallback_exact="weights.json")
         if txt:
             try: return json.loads(txt)
             except Exception: pass
@@ -186,7 +396,7 @@ class Resources:
                     try: reg[mid] = re.compile(pat, re.IGNORECASE)
                     except re.error: pass
         # 2) From markers zip YAML files (pattern field)
-        for y in read_all_yaml_from_zip(self.zip_markers):
+        for y in self._marker_zip.yaml_docs():
             mid = y.get("id")
             pat = y.get("pattern") or (y.get("frame", {}) if isinstance(y.get("frame"), str) else None)
             if mid and isinstance(pat, str):
@@ -211,24 +421,25 @@ class Resources:
     def _map_marker_to_primary(self):
         """Best-effort mapping: explicit in schema descriptions, else tag heuristics."""
         m = {}
-        axes = self.primary_axes
-        if not axes:
+        if not self.primary_axes:
             return m
+        # one compiled word-boundary regex per axis (first axis in primaryOrder wins)
+        axes = [(ax, re.compile(rf"\b{re.escape(ax)}\b", re.IGNORECASE)) for ax in self.primary_axes]
+        def first_axis(text):
+            return next((ax for ax, rx in axes if rx.search(text)), None)
         # From schema bundle description/tags
         for group in ["ATO","SEM","CLU","MEMA","EMO","ACT"]:
             for e in self.schema_bundle.get(group, []) or []:
                 mid = e.get("id"); desc = (e.get("description") or "") + " " + " ".join(e.get("tags") or [])
                 if not mid: continue
-                for ax in axes:
-                    if re.search(rf"\b{re.escape(ax)}\b", desc, flags=re.IGNORECASE):
-                        m[mid] = ax; break
+                ax = first_axis(desc)
+                if ax is not None: m[mid] = ax
         # From extra markers tags
         for y in self.extra_markers:
             mid = y.get("id"); tags = " ".join(y.get("tags") or [])
             if not mid: continue
-            for ax in axes:
-                if re.search(rf"\b{re.escape(ax)}\b", tags, flags=re.IGNORECASE):
-                    m[mid] = ax; break
+            ax = first_axis(tags)
+            if ax is not None: m[mid] = ax
         return m
 
     def _extract_ED_sets(self):
@@ -288,7 +499,7 @@ class Resources:
                     registry.append(e)
         
         # Aus markers zip YAMLs
-        for y in read_all_yaml_from_zip(self.zip_markers):
+        for y in self._marker_zip.yaml_docs():
             if y.get("id"):
                 registry.append(y)
         
@@ -302,57 +513,352 @@ class Resources:
 # -------------------------
 # Core analysis
 # -------------------------
+def iter_messages(lines, start=0):
+    """Lazy chunk_messages over any iterable of lines (e.g. an open file).
+
+    Each physical line is split again with str.splitlines(), so the result is
+    identical to chunk_messages() on the whole text. `start` is the index of
+    the first message (resuming after already analyzed lines).
+    """
+    i = start
+    for raw in lines:
+        for line in raw.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            m = re.match(r"^([^:]{1,40}):\s*(.+)$", line)
+            if m:
+                spk, msg = m.group(1), m.group(2)
+            else:
+                spk, msg = "Unknown", line
+            yield {"i": i, "speaker": spk, "text": msg}
+            i += 1
+
 def chunk_messages(text: str):
     """Very simple: 'Name: message' or lines -> messages with 'Unknown' speaker."""
-    msgs = []
-    for i, line in enumerate([l.strip() for l in text.splitlines() if l.strip()]):
-        m = re.match(r"^([^:]{1,40}):\s*(.+)$", line)
-        if m:
-            spk, msg = m.group(1), m.group(2)
-        else:
-            spk, msg = "Unknown", line
-        msgs.append({"i": i, "speaker": spk, "text": msg})
-    return msgs
+    return list(iter_messages(text.splitlines()))
+
+class HitTable:
+    """Columnar hit store: message index, interned speaker and marker code (int32 each).
+
+    12 bytes per hit instead of one dict per hit. Codes are assigned in order
+    of first appearance, so the bincount-based group-bys below return keys in
+    the same order as a Counter over the equivalent list of hit dicts.
+    """
+    __slots__ = ("i", "spk", "mk", "speakers", "markers")
+
+    def __init__(self, i, spk, mk, speakers, markers):
+        self.i, self.spk, self.mk = i, spk, mk
+        self.speakers, self.markers = list(speakers), list(markers)   # code -> id
+
+    @classmethod
+    def of(cls, hits):
+        """HitTable as-is, or built from an iterable of {i, speaker, marker} dicts."""
+        if isinstance(hits, HitTable):
+            return hits
+        b = HitTableBuilder()
+        for h in hits:
+            b.add(h["i"], h["speaker"], h["marker"])
+        return b.build()
+
+    def __len__(self):
+        return len(self.i)
+
+    @property
+    def nbytes(self):
+        return self.i.nbytes + self.spk.nbytes + self.mk.nbytes
+
+    def rows(self):
+        """Hit dicts in table order (for JSON output and dict-based consumers)."""
+        spk, mk = self.speakers, self.markers
+        for i, s, m in zip(self.i.tolist(), self.spk.tolist(), self.mk.tolist()):
+            yield {"i": i, "speaker": spk[s], "marker": mk[m]}
+
+    def to_dicts(self):
+        return list(self.rows())
+
+    def concat(self, hits):
+        """New table with `hits` (dicts) appended; existing codes are kept."""
+        b = HitTableBuilder(self.speakers, self.markers)
+        for h in hits:
+            b.add(h["i"], h["speaker"], h["marker"])
+        t = b.build()
+        return HitTable(np.concatenate([self.i, t.i]), np.concatenate([self.spk, t.spk]),
+                        np.concatenate([self.mk, t.mk]), t.speakers, t.markers)
+
+    def marker_lookup(self, values, default=0, dtype=np.int64):
+        """Per-code array of values[marker] -> index it with self.mk for a per-hit column."""
+        return np.array([values.get(m, default) for m in self.markers], dtype=dtype)
+
+    def _in_set(self, marker_set):
+        return np.fromiter((m in marker_set for m in self.markers), dtype=bool, count=len(self.markers))
+
+    def mask(self, marker_set):
+        """Boolean per-hit mask: marker in marker_set (e.g. the E/D sets)."""
+        return self._in_set(marker_set)[self.mk]
+
+    def count_in(self, marker_set):
+        return int(self.marker_bincount()[self._in_set(marker_set)].sum())
+
+    def marker_bincount(self):
+        return np.bincount(self.mk, minlength=len(self.markers))
+
+    def marker_counts(self) -> Counter:
+        return Counter(dict(zip(self.markers, self.marker_bincount().tolist())))
+
+    def weighted_sum(self, marker_weights: dict):
+        w = self.marker_lookup(marker_weights, 1.0, dtype=float)
+        return float(self.marker_bincount() @ w)
+
+    def speaker_marker_counts(self):
+        """speaker -> Counter(marker), keys in first-appearance order (per speaker)."""
+        M = len(self.markers)
+        out = {s: Counter() for s in self.speakers}
+        if not M:
+            return out
+        pair = self.spk.astype(np.int64) * M + self.mk
+        uniq, first, counts = np.unique(pair, return_index=True, return_counts=True)
+        order = np.argsort(first, kind="stable")
+        for p, c in zip(uniq[order].tolist(), counts[order].tolist()):
+            out[self.speakers[p // M]][self.markers[p % M]] = c
+        return out
+
+    def speaker_groups(self):
+        """speaker -> list of hit dicts (hits_by_speaker() layout, hit order kept)."""
+        out = {s: [] for s in self.speakers}
+        for h in self.rows():
+            out[h["speaker"]].append(h)
+        return out
+
+class HitTableBuilder:
+    """Append-only builder (array('i') columns + intern dicts) for HitTable."""
+
+    def __init__(self, speakers=(), markers=()):
+        self._i, self._spk, self._mk = array("i"), array("i"), array("i")
+        self._speakers = {s: k for k, s in enumerate(speakers)}
+        self._markers = {m: k for k, m in enumerate(markers)}
+
+    def add(self, i, speaker, marker):
+        spk = self._speakers.setdefault(speaker, len(self._speakers))
+        mk = self._markers.setdefault(marker, len(self._markers))
+        self._i.append(i); self._spk.append(spk); self._mk.append(mk)
+
+    def build(self) -> HitTable:
+        cols = [np.frombuffer(a, dtype=np.intc).astype(np.int32) for a in (self._i, self._spk, self._mk)]
+        return HitTable(*cols, self._speakers, self._markers)
 
 def match_markers(msgs, regex_markers):
-    """Return list of hits: {i, speaker, marker}"""
+    """Return list of hits: {i, speaker, marker}
+
+    regex_markers: dict marker_id -> compiled regex, or a prebuilt PatternScanner
+    (Resources.marker_scanner) so the literal prefilter is compiled only once.
+    The chat is scanned as one corpus (PatternScanner.scan_corpus: joined buffer,
+    offset map + bisect); each marker is reported at most once per message.
+    """
+    scanner = regex_markers if isinstance(regex_markers, PatternScanner) else PatternScanner(regex_markers)
     hits = []
-    for m in msgs:
-        txt = m["text"]
-        for mid, creg in regex_markers.items():
-            try:
-                if creg.search(txt):
-                    hits.append({"i": m["i"], "speaker": m["speaker"], "marker": mid})
-            except Exception:
-                pass
+    fired_per_msg = scanner.scan_corpus([m["text"] for m in msgs])
+    for m, fired in zip(msgs, fired_per_msg):
+        for mid in fired:
+            hits.append({"i": m["i"], "speaker": m["speaker"], "marker": mid})
     return hits
 
-def rolling_windows(n, win):
+def match_markers_table(msgs, regex_markers) -> HitTable:
+    """match_markers() straight into a HitTable (no per-hit dicts)."""
+    scanner = regex_markers if isinstance(regex_markers, PatternScanner) else PatternScanner(regex_markers)
+    b = HitTableBuilder()
+    for m, fired in zip(msgs, scanner.scan_corpus([m["text"] for m in msgs])):
+        for mid in fired:
+            b.add(m["i"], m["speaker"], mid)
+    return b.build()
+
+def scan_stream(msgs, scanner: PatternScanner, batch=STREAM_BATCH):
+    """Yield (message, fired marker ids) while reading `msgs` lazily.
+
+    Messages are scanned in batches of `batch` with scan_corpus(), so at most
+    one batch of texts is held in memory at a time.
+    """
+    buf = []
+    for m in msgs:
+        buf.append(m)
+        if len(buf) >= batch:
+            yield from zip(buf, scanner.scan_corpus([x["text"] for x in buf]))
+            buf = []
+    if buf:
+        yield from zip(buf, scanner.scan_corpus([x["text"] for x in buf]))
+
+def rolling_windows(n, win, step=None):
+    """[i, j) message windows of size `win`, advancing by `step` (default: win, non-overlapping).
+
+    With step < win the windows overlap; the sweep stops at the first window
+    that reaches the end of the chat.
+    """
+    step = max(1, step or win)
     i = 0
     while i < n:
         j = min(n, i+win)
         yield i, j
-        i += win
+        if j >= n:
+            break
+        i += step
+
+class WindowIndex:
+    """Prefix-sum counts per message: any [i, j) window in O(1).
+
+    E/D cumulative counts are built once from the hits (HitTable or dicts);
+    per-marker cumulative counts are built on first request and cached. Hits
+    whose "i" lies outside [0, n) are ignored, like the old per-window filter.
+    """
+
+    def __init__(self, n, hits, E_SET, D_SET):
+        self.n = n
+        t = HitTable.of(hits)
+        valid = (t.i >= 0) & (t.i < n)
+        self._i, self._mk = t.i[valid], t.mk[valid]
+        self.markers = t.markers
+        self._codes = {m: k for k, m in enumerate(t.markers)}
+        self.cum_E = self._cumsum(self._i[t.mask(E_SET)[valid]])
+        self.cum_D = self._cumsum(self._i[t.mask(D_SET)[valid]])
+        self._cum_marker = {}
+
+    def _cumsum(self, idx):
+        return [0] + np.cumsum(np.bincount(idx, minlength=self.n)).tolist()
+
+    def ed(self, i, j):
+        """(E, D) hit counts in messages [i, j)."""
+        return self.cum_E[j] - self.cum_E[i], self.cum_D[j] - self.cum_D[i]
+
+    def marker_cum(self, mid):
+        cum = self._cum_marker.get(mid)
+        if cum is None:
+            code = self._codes.get(mid, -1)
+            cum = self._cum_marker[mid] = self._cumsum(self._i[self._mk == code])
+        return cum
+
+    def count(self, mid, i, j):
+        """Hits of one marker in messages [i, j)."""
+        cum = self.marker_cum(mid)
+        return cum[j] - cum[i]
+
+    def windows(self, win, step=None):
+        """(i, j, E, D) for each window of rolling_windows(n, win, step)."""
+        for i, j in rolling_windows(self.n, max(1, win), step):
+            e, d = self.ed(i, j)
+            yield i, j, e, d
+
+    def category_counts(self, lookups, k, win, step=None):
+        """(i, j, counts) per window: hits per category 0..k-1 in [i, j).
+
+        lookups: per-marker-code arrays (category or -1), e.g.
+        ThemeMatrix.feature_lookup(index.markers); a hit counts once per array.
+        One sort of the hits, then two searchsorted calls for all windows.
+        """
+        bounds = list(rolling_windows(self.n, max(1, win), step))
+        if not bounds:
+            return []
+        cat = np.concatenate([lk[self._mk] for lk in lookups]) if len(self._mk) else np.empty(0, np.int64)
+        msg = np.tile(self._i, len(lookups))
+        keep = cat >= 0
+        key = np.sort(cat[keep].astype(np.int64) * (self.n + 1) + msg[keep])
+        lo, hi = (np.array(b, dtype=np.int64) for b in zip(*bounds))
+        base = np.arange(k, dtype=np.int64) * (self.n + 1)
+        counts = (np.searchsorted(key, base + hi[:, None]) - np.searchsorted(key, base + lo[:, None]))
+        return [(i, j, c) for (i, j), c in zip(bounds, counts.tolist())]
+
+class StreamingWindows:
+    """Same windows as WindowIndex.windows(), fed one message at a time.
+
+    Keeps only the last `win` per-message (E, D) counts; push() returns the
+    window that closes with this message (or None), finish() the final
+    partial window (rolling_windows semantics).
+    """
 
+    def __init__(self, win, step=None):
+        self.win = max(1, win)
+        self.step = max(1, step or self.win)
+        self.n = 0
+        self._last = deque()          # (E, D) of the last `win` messages
+        self._e = self._d = 0
+        self._next = 0                # start of the next window to emit
+        self._end = None              # end of the last emitted window
+
+    def push(self, e, d):
+        self._last.append((e, d))
+        self._e += e; self._d += d
+        if len(self._last) > self.win:
+            oe, od = self._last.popleft()
+            self._e -= oe; self._d -= od
+        self.n += 1
+        i = self.n - self.win
+        if i == self._next:
+            self._next += self.step
+            self._end = self.n
+            return i, self.n, self._e, self._d
+        return None
+
+    def finish(self):
+        """Trailing window [i, n) shorter than `win`, if rolling_windows() would emit one."""
+        i, n = self._next, self.n
+        if i >= n or self._end == n:
+            return None
+        tail = list(self._last)[i - n:]
+        return i, n, sum(e for e, _ in tail), sum(d for _, d in tail)
+
+class StreamingCounts:
+    """WindowIndex.category_counts() for --stream, fed one message at a time.
+
+    Keeps one running count vector plus a snapshot at each pending window
+    start (win/step of them); a closing window is the difference of the two.
+    """
+
+    def __init__(self, k, win, step=None):
+        self.win = max(1, win)
+        self.step = max(1, step or self.win)
+        self.n = 0
+        self.cum = [0] * k
+        self._starts = {0: list(self.cum)}
+        self._end = None
+
+    def add(self, cats):
+        for c in cats:
+            self.cum[c] += 1
+
+    def close_message(self):
+        """End of message n; returns the window closing here (or None)."""
+        self.n = n = self.n + 1
+        if n % self.step == 0:
+            self._starts[n] = list(self.cum)
+        i = n - self.win
+        if i >= 0 and i % self.step == 0 and i in self._starts:
+            snap = self._starts.pop(i)
+            self._end = n
+            return i, n, [a - b for a, b in zip(self.cum, snap)]
+        return None
+
+    def finish(self):
+        """Trailing window shorter than `win`, if rolling_windows() would emit one."""
+        i, n = min(self._starts, default=self.n), self.n
+        if i >= n or self._end == n:
+            return None
+        return i, n, [a - b for a, b in zip(self.cum, self._starts[i])]
+
+# The aggregations below take a HitTable (or a list of hit dicts) and work on
+# per-marker bincounts, i.e. once per distinct marker instead of once per hit.
 def compute_primary_counts(hits, marker_to_primary):
     prim = Counter()
-    for h in hits:
-        ax = marker_to_primary.get(h["marker"])
+    for mid, c in _marker_counter(hits).items():
+        ax = marker_to_primary.get(mid)
         if ax:
-            prim[ax] += 1
+            prim[ax] += c
     return prim
 
 def weighted_sum(hits, weights):
     w = weights.get("marker_weights", {}) if isinstance(weights, dict) else {}
-    s = 0.0
-    for h in hits:
-        s += float(w.get(h["marker"], 1.0))
-    return s
+    return HitTable.of(hits).weighted_sum(w)
 
 def ed_counts(hits, E_SET, D_SET):
-    E = sum(1 for h in hits if h["marker"] in E_SET)
-    D = sum(1 for h in hits if h["marker"] in D_SET)
-    return E, D
+    t = HitTable.of(hits)
+    return t.count_in(E_SET), t.count_in(D_SET)
 
 def hits_by_speaker(hits):
     per = defaultdict(list)
@@ -360,53 +866,183 @@ def hits_by_speaker(hits):
         per[h["speaker"]].append(h)
     return per
 
+def _marker_counter(hits):
+    """Marker counts from a HitTable or hit list; a Counter (streaming aggregates) is passed through."""
+    if isinstance(hits, Counter):
+        return hits
+    if isinstance(hits, HitTable):
+        return hits.marker_counts()
+    return Counter([h["marker"] for h in hits])
+
+class ChatAggregate:
+    """Running counters for --stream: everything the report needs, without keeping hits.
+
+    add() must see hits in chat order; per-speaker and marker counters then
+    have the same key order as the list-based helpers above. Axis counts and
+    the weighted sum are derived from the marker counter (R.tables) at the end.
+    """
+
+    def __init__(self, R: Resources):
+        self._tables = R.tables
+        self._E_SET, self._D_SET = self._tables.E_SET, self._tables.D_SET
+        self.n_messages = 0
+        self.n_hits = 0
+        self.markers = Counter()
+        self.per_speaker = {}         # speaker -> Counter(marker)
+        self.E = self.D = 0
+
+    COUNTERS = ("n_messages", "n_hits", "markers", "per_speaker", "E", "D")
+
+    def counters(self) -> dict:
+        """The running counters (for the --incremental state file; the tables come from R)."""
+        return {k: getattr(self, k) for k in self.COUNTERS}
+
+    @classmethod
+    def resume(cls, R: Resources, counters: dict):
+        agg = cls(R)
+        for k in cls.COUNTERS:
+            setattr(agg, k, counters[k])
+        return agg
+
+    @property
+    def prim_counts(self) -> Counter:
+        return self._tables.primary_counts(self.markers)
+
+    @property
+    def wsum(self) -> float:
+        return self._tables.weighted_sum(self.markers)
+
+    def add(self, hits):
+        """Count a batch of hits; returns their (E, D) count for the time series."""
+        e = d = 0
+        for h in hits:
+            mid = h["marker"]
+            self.n_hits += 1
+            self.markers[mid] += 1
+            self.per_speaker.setdefault(h["speaker"], Counter())[mid] += 1
+            if mid in self._E_SET: e += 1
+            if mid in self._D_SET: d += 1
+        self.E += e; self.D += d
+        return e, d
+
+class ThemeMatrix:
+    """themes_map compiled once against the marker -> narrative / primary-axis maps.
+
+    Features are the narratives followed by the primary axes (primaryOrder
+    first). The sparse marker matrix (COO: rows, cols, vals) has one column
+    per feature (the hop itself, weight 1) and one per theme (the hop weights
+    folded per theme), so narrative/axis tallies and theme scores for any set
+    of hits come out of a single mat-vec over marker counts.
+    """
+
+    def __init__(self, themes_map, marker_to_narr, marker_to_primary, primary_axes=()):
+        themes_cfg = (themes_map or {}).get("themes", {}) or {}
+        self.themes = list(themes_cfg)
+        self.labels = {k: (themes_cfg[k] or {}).get("label", k) for k in self.themes}
+        self.narratives = list(dict.fromkeys(marker_to_narr.values()))
+        self.axes = list(dict.fromkeys([*primary_axes, *marker_to_primary.values()]))
+        nn, F, T = len(self.narratives), len(self.narratives) + len(self.axes), len(self.themes)
+        feat = {("narr", x): k for k, x in enumerate(self.narratives)}
+        feat.update({("axis", a): nn + k for k, a in enumerate(self.axes)})
+
+        # feature -> theme weights (dense, F x T; features unknown to the markers drop out)
+        self.weights = np.zeros((F, T))
+        for t, key in enumerate(self.themes):
+            cfg = themes_cfg[key] or {}
+            for kind, block in (("narr", "narratives"), ("axis", "primary_axes")):
+                for name, w in (cfg.get(block) or {}).items():
+                    f = feat.get((kind, name))
+                    if f is not None:
+                        self.weights[f, t] += float(w)
+
+        self.markers = list(dict.fromkeys([*marker_to_narr, *marker_to_primary]))
+        self._codes = {m: g for g, m in enumerate(self.markers)}
+        self._features = {}                    # marker -> feature codes (narrative, axis)
+        rows, cols, vals = [], [], []
+        for g, m in enumerate(self.markers):
+            fs = tuple(feat[k] for k in (("narr", marker_to_narr.get(m)), ("axis", marker_to_primary.get(m)))
+                       if k in feat)
+            self._features[m] = fs
+            for f in fs:
+                rows.append(g); cols.append(f); vals.append(1.0)
+            tw = self.weights[list(fs)].sum(axis=0) if fs else ()
+            for t, w in enumerate(tw):
+                if w:
+                    rows.append(g); cols.append(F + t); vals.append(float(w))
+        self._rows = np.array(rows, dtype=np.int64)
+        self._cols = np.array(cols, dtype=np.int64)
+        self._vals = np.array(vals)
+        self.n_features = F
+
+    def features_of(self, mid):
+        return self._features.get(mid, ())
+
+    def feature_lookup(self, markers):
+        """Per-code arrays (narrative feature, axis feature; -1 = none) for a HitTable's markers."""
+        nn = len(self.narratives)
+        narr = np.full(len(markers), -1, dtype=np.int64)
+        axis = np.full(len(markers), -1, dtype=np.int64)
+        for k, m in enumerate(markers):
+            for f in self._features.get(m, ()):
+                if f < nn: narr[k] = f
+                else: axis[k] = f
+        return narr, axis
+
+    def counts(self, hits):
+        """Marker count vector over self.markers (HitTable, hit dicts or a marker Counter)."""
+        c = np.zeros(len(self.markers))
+        for mid, n in _marker_counter(hits).items():
+            g = self._codes.get(mid)
+            if g is not None:
+                c[g] += n
+        return c
+
+    def matvec(self, c):
+        """Sparse M^T c: feature tallies followed by (unnormalized) theme scores."""
+        return np.bincount(self._cols, weights=self._vals * c[self._rows],
+                           minlength=self.n_features + len(self.themes))
+
+    def scores(self, features):
+        """Normalized theme scores from feature tallies (e.g. one window)."""
+        features = np.asarray(features, dtype=float)
+        return features @ self.weights / (features.sum() or 1)
+
+    def resonance(self, hits):
+        """Theme/narrative/axis scores; narr_score and prim_score keep first-hit key order."""
+        cnt = _marker_counter(hits)
+        v = self.matvec(self.counts(cnt))
+        F, nn = self.n_features, len(self.narratives)
+        f = v[:F].tolist()
+        total = sum(f) or 1
+        seen = dict.fromkeys(k for mid in cnt for k in self._features.get(mid, ()) if f[k])
+        narr_score = {self.narratives[k]: f[k] / total for k in seen if k < nn}
+        prim_score = {self.axes[k - nn]: f[k] / total for k in seen if k >= nn}
+        theme_scores = {key: float(s) / total for key, s in zip(self.themes, v[F:])}
+        if theme_scores:
+            best_key = max(theme_scores, key=lambda k: theme_scores[k])
+            return {"theme_key": best_key, "theme_label": self.labels[best_key],
+                    "theme_scores": theme_scores, "narr_score": narr_score, "prim_score": prim_score}
+        if prim_score:
+            # Fallback: highest primary axis as theme
+            best_ax = max(prim_score, key=lambda a: prim_score[a])
+            return {"theme_key": best_ax, "theme_label": best_ax,
+                    "theme_scores": {best_ax: 1.0}, "narr_score": narr_score, "prim_score": prim_score}
+        return {"theme_key":"Unbestimmt","theme_label":"Unbestimmt",
+                "theme_scores":{}, "narr_score": narr_score, "prim_score": prim_score}
+
+    def trajectory(self, windows):
+        """[(i, j, {theme: score})] from (i, j, feature tallies) windows."""
+        return [(i, j, dict(zip(self.themes, self.scores(f).tolist()))) for i, j, f in windows]
+
 def theme_resonance(hits, R: Resources):
     """Compute resonance across:
        - narratives (frame.narrative)
        - primary axes
        -> merge via THEMES_MAP for human-readable names
+    `hits` may also be a marker Counter (see ChatAggregate). The themes map is
+    precompiled in R.theme_matrix, so this is one sparse mat-vec.
     """
-    # raw tallies
-    narr = Counter()
-    prim = Counter()
-    for h in hits:
-        mid = h["marker"]
-        if mid in R.marker_to_narr:
-            narr[R.marker_to_narr[mid]] += 1
-        ax = R.marker_to_primary.get(mid)
-        if ax:
-            prim[ax] += 1
-
-    # normalized scores
-    total = sum(narr.values()) + sum(prim.values()) or 1
-    narr_score = {k: v/total for k,v in narr.items()}
-    prim_score = {k: v/total for k,v in prim.items()}
-
-    # combine using themes_map rule (weights)
-    themes_cfg = R.themes_map.get("themes", {})
-    theme_scores = {}
-    for theme_key, cfg in themes_cfg.items():
-        score = 0.0
-        for na, w in (cfg.get("narratives") or {}).items():
-            score += w * narr_score.get(na, 0.0)
-        for ax, w in (cfg.get("primary_axes") or {}).items():
-            score += w * prim_score.get(ax, 0.0)
-        theme_scores[theme_key] = score
-
-    # pick best theme
-    if theme_scores:
-        best_key = max(theme_scores, key=lambda k: theme_scores[k])
-        best_label = themes_cfg.get(best_key, {}).get("label", best_key)
-        return {"theme_key": best_key, "theme_label": best_label,
-                "theme_scores": theme_scores, "narr_score": narr_score, "prim_score": prim_score}
-    else:
-        # Fallback: highest primary axis as theme
-        if prim:
-            best_ax, _ = prim.most_common(1)[0]
-            return {"theme_key": best_ax, "theme_label": best_ax,
-                    "theme_scores": {best_ax: 1.0}, "narr_score": narr_score, "prim_score": prim_score}
-        return {"theme_key":"Unbestimmt","theme_label":"Unbestimmt",
-                "theme_scores":{}, "narr_score": narr_score, "prim_score": prim_score}
+    return R.theme_matrix.resonance(hits)
 
 def build_objective_tips(per_speaker_hits, R: Resources):
     """
@@ -417,20 +1053,20 @@ def build_objective_tips(per_speaker_hits, R: Resources):
     tips = {}
     act = R.actions_map or {}
     balance_table = act.get("balance", {})
+    code, is_E = R.tables.code, R.tables.is_E.tolist()
+    generic = list(R.tables.d_candidates[:3])   # pre-sorted by weight in MarkerTables
     for spk, hits in per_speaker_hits.items():
-        cnt = Counter([h["marker"] for h in hits])
+        cnt = _marker_counter(hits)
         # Top-3 escalation markers of this speaker
-        top_e = [mid for mid, c in cnt.most_common() if mid in R.E_SET][:3]
+        top_e = [mid for mid, c in cnt.most_common() if is_E[code.get(mid, -1)]][:3]
         suggestions = []
         for mid in top_e:
             # candidates
             cand = balance_table.get(mid) or []
             # If no explicit mapping, suggest generic D markers with highest weights
             if not cand:
-                d_weighted = sorted([(m, float(R.weights.get("marker_weights", {}).get(m, 1.0)))
-                                    for m in R.D_SET],
-                                    key=lambda x: -x[1])[:3]
-                cand = [m for m,_ in d_weighted]
+                cand = generic
+            cand = list(cand)   # own list per suggestion (the report may edit it)
             suggestions.append({
                 "problem_marker": mid,
                 "problem_label": R.marker_labels.get(mid, mid),
@@ -443,120 +1079,308 @@ def build_objective_tips(per_speaker_hits, R: Resources):
 # -------------------------
 # Charts (one plot per chart, with colors)
 # -------------------------
-def _fig_to_base64(fig):
+# Every chart is first described as a plain, picklable spec dict (type, title,
+# labels/values, explicit colors). Specs are rasterized by matplotlib (png),
+# drawn as vector SVG, or shipped as-is for client-side rendering ("spec").
+CHART_FORMATS = ("png", "svg", "spec")
+IMAGE_MIME = {"png": "image/png", "svg": "image/svg+xml"}
+
+def _fig_to_bytes(fig, fmt="png"):
     buf = io.BytesIO()
-    fig.savefig(buf, format="png", dpi=160, bbox_inches="tight")
+    if fmt == "png":
+        fig.savefig(buf, format="png", dpi=160, bbox_inches="tight")
+    else:
+        fig.savefig(buf, format=fmt, bbox_inches="tight")
     plt.close(fig)
-    return base64.b64encode(buf.getvalue()).decode("ascii")
+    return buf.getvalue()
 
-def chart_donut(counts: dict, title: str):
+def _fig_to_base64(fig, fmt="png"):
+    return base64.b64encode(_fig_to_bytes(fig, fmt)).decode("ascii")
+
+def spec_donut(counts: dict, title: str):
     if not counts:
         return None
     labels = list(counts.keys())
-    sizes = list(counts.values())
-    fig, ax = plt.subplots()
     cols = (PALETTE * ((len(labels)//len(PALETTE))+1))[:len(labels)]
-    wedges, _ = ax.pie(sizes, labels=labels, wedgeprops=dict(width=0.4), colors=cols, startangle=90)
-    ax.set_title(title)
-    return _fig_to_base64(fig)
+    return {"type": "donut", "title": title, "labels": labels,
+            "values": list(counts.values()), "colors": cols}
 
-def chart_bar_compare(rows, title: str):
+def spec_bar_compare(rows, title: str):
     """rows: list of (label, value)"""
     if not rows: return None
-    labels = [r[0] for r in rows]; values = [r[1] for r in rows]
-    fig, ax = plt.subplots()
-    ax.bar(labels, values, color=PALETTE[0:len(labels)])
-    ax.set_title(title); ax.set_ylabel("Count")
-    ax.set_xticklabels(labels, rotation=20, ha="right")
-    return _fig_to_base64(fig)
+    labels = [r[0] for r in rows]
+    return {"type": "bar", "title": title, "labels": labels, "values": [r[1] for r in rows],
+            "colors": PALETTE[0:len(labels)], "ylabel": "Count", "rotate": True}
 
-def chart_ed_bars(E, D, title="E vs D (gesamt)"):
-    fig, ax = plt.subplots()
-    ax.bar(["Eskalation (E)"], [E], color=BAR_NEG)
-    ax.bar(["Deeskalation (D)"], [D], color=BAR_POS)
-    ax.set_title(title)
-    ax.set_ylabel("Treffer")
-    return _fig_to_base64(fig)
-
-def chart_timeseries_ed(msgs, hits, E_SET, D_SET, window=20, title="E/D über Zeit (rollierend)"):
-    """Simple block windows (non-overlapping) to keep it transparent and fast."""
-    n = len(msgs); if n == 0: return None
+def spec_ed_bars(E, D, title="E vs D (gesamt)"):
+    return {"type": "bar", "title": title, "labels": ["Eskalation (E)", "Deeskalation (D)"],
+            "values": [E, D], "colors": [BAR_NEG, BAR_POS], "ylabel": "Treffer"}
+
+def spec_timeseries_ed(msgs, hits, E_SET, D_SET, window=20, title="E/D über Zeit (rollierend)",
+                       step=None, index=None):
+    """Block windows (non-overlapping) by default; `step` < window gives sliding windows.
+
+    Counts come from a WindowIndex (pass `index` to reuse one across window sweeps).
+    """
+    n = len(msgs)
+    if n == 0: return None
+    index = index or WindowIndex(n, hits, E_SET, D_SET)
+    return spec_timeseries_windows(index.windows(window, step), title)
+
+def spec_timeseries_windows(windows, title="E/D über Zeit (rollierend)"):
+    """Line chart from (i, j, E, D) windows (WindowIndex.windows or StreamingWindows)."""
     xs, e_vals, d_vals = [], [], []
-    for i,j in rolling_windows(n, max(1, window)):
+    for i, j, e, d in windows:
         xs.append(f"{i}-{j-1}")
-        seg = [h for h in hits if i <= h["i"] < j]
-        e = sum(1 for h in seg if h["marker"] in E_SET)
-        d = sum(1 for h in seg if h["marker"] in D_SET)
         e_vals.append(e); d_vals.append(d)
-    fig, ax = plt.subplots()
-    ax.plot(xs, e_vals, marker="o", label="E", color=BAR_NEG)
-    ax.plot(xs, d_vals, marker="o", label="D", color=BAR_POS)
-    ax.set_title(title); ax.set_xlabel("Nachrichten-Fenster"); ax.set_ylabel("Treffer")
-    ax.legend()
-    return _fig_to_base64(fig)
+    if not xs: return None
+    return {"type": "line", "title": title, "labels": xs,
+            "series": [{"name": "E", "values": e_vals, "color": BAR_NEG},
+                       {"name": "D", "values": d_vals, "color": BAR_POS}],
+            "xlabel": "Nachrichten-Fenster", "ylabel": "Treffer"}
 
-def chart_theme_resonance(theme_scores: dict, title="Themen-Resonanz (gesamt)"):
+def spec_theme_resonance(theme_scores: dict, title="Themen-Resonanz (gesamt)"):
     if not theme_scores: return None
     items = sorted(theme_scores.items(), key=lambda kv: -kv[1])[:8]
     labels = [R if isinstance(R, str) else str(R) for R,_ in items]
-    values = [v for _,v in items]
+    return {"type": "bar", "title": title, "labels": labels, "values": [v for _,v in items],
+            "colors": PALETTE[:len(labels)], "ylabel": "Score (normiert)", "rotate": True}
+
+def spec_theme_trajectory(trajectory, labels: dict, title="Themen-Verlauf (Fenster)"):
+    """Line chart, one series per theme, from ThemeMatrix.trajectory() windows."""
+    if not trajectory or not labels: return None
+    keys = list(trajectory[0][2])
+    cols = (PALETTE * ((len(keys)//len(PALETTE))+1))[:len(keys)]
+    return {"type": "line", "title": title, "labels": [f"{i}-{j-1}" for i, j, _ in trajectory],
+            "series": [{"name": labels.get(k, k), "values": [round(sc[k], 4) for _, _, sc in trajectory],
+                        "color": c} for k, c in zip(keys, cols)],
+            "xlabel": "Nachrichten-Fenster", "ylabel": "Score (normiert)"}
+
+def spec_top_markers(spk, hits, marker_labels, topk=8):
+    top = _marker_counter(hits).most_common(topk)
+    return {"type": "barh", "title": f"Top-Marker: {spk}",
+            "labels": [marker_labels.get(mid, mid) for mid,_ in top],
+            "values": [v for _,v in top], "colors": PALETTE[:len(top)], "xlabel": "Treffer"}
+
+def _draw_chart(spec):
+    """spec -> matplotlib figure (same drawing calls as the original chart functions)."""
+    kind, labels, values = spec["type"], spec["labels"], spec.get("values")
     fig, ax = plt.subplots()
-    ax.bar(labels, values, color=PALETTE[:len(labels)])
-    ax.set_title(title); ax.set_ylabel("Score (normiert)")
-    ax.set_xticklabels(labels, rotation=20, ha="right")
-    return _fig_to_base64(fig)
+    if kind == "donut":
+        ax.pie(values, labels=labels, wedgeprops=dict(width=0.4), colors=spec["colors"], startangle=90)
+    elif kind == "bar":
+        ax.bar(labels, values, color=spec["colors"])
+        if spec.get("rotate"):
+            ax.set_xticks(range(len(labels)), labels, rotation=20, ha="right")
+    elif kind == "barh":
+        pos = range(len(labels))[::-1]
+        ax.barh(pos, list(values)[::-1], color=spec["colors"])
+        ax.set_yticks(pos, labels[::-1])
+    elif kind == "line":
+        for s in spec["series"]:
+            ax.plot(labels, s["values"], marker="o", label=s["name"], color=s["color"])
+        ax.legend()
+    else:
+        plt.close(fig)
+        raise ValueError(f"Unbekannter Chart-Typ: {kind}")
+    ax.set_title(spec["title"])
+    if spec.get("xlabel"): ax.set_xlabel(spec["xlabel"])
+    if spec.get("ylabel"): ax.set_ylabel(spec["ylabel"])
+    return fig
+
+def render_chart(spec, fmt="png", encode=True):
+    """Render one spec to base64 (png/svg), or raw bytes with encode=False; None stays None."""
+    if spec is None:
+        return None
+    fig = _draw_chart(spec)
+    return _fig_to_base64(fig, fmt) if encode else _fig_to_bytes(fig, fmt)
 
-def chart_top_markers_per_speaker(per_speaker_hits, marker_labels, topk=8):
-    imgs = {}
-    for spk, hits in per_speaker_hits.items():
-        cnt = Counter([h["marker"] for h in hits])
-        top = cnt.most_common(topk)
-        labels = [marker_labels.get(mid, mid) for mid,_ in top]
-        values = [v for _,v in top]
-        fig, ax = plt.subplots()
-        ax.barh(range(len(top))[::-1], list(values)[::-1], color=PALETTE[:len(top)])
-        ax.set_yticks(range(len(top))[::-1], labels[::-1])
-        ax.set_title(f"Top-Marker: {spk}")
-        ax.set_xlabel("Treffer")
-        imgs[spk] = _fig_to_base64(fig)
-    return imgs
+def _render_item(item):
+    name, spec, fmt, encode = item
+    return name, render_chart(spec, fmt, encode)
+
+def render_charts(specs: dict, fmt="png", jobs=None, encode=True):
+    """Render name -> spec, serially unless ``jobs`` > 1 asks for a process pool.
+
+    matplotlib figures are not thread-safe, so the pool uses processes; every
+    worker gets plain spec dicts and returns base64 strings (bytes with
+    encode=False, for sidecar files). Order is kept.
+    """
+    items = [(name, spec, fmt, encode) for name, spec in specs.items() if spec is not None]
+    jobs = min(jobs or 1, len(items))
+    if jobs <= 1:
+        out = dict(map(_render_item, items))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            out = dict(pool.map(_render_item, items, chunksize=max(1, len(items) // (4 * jobs))))
+    return {name: out.get(name) for name in specs}
+
+def chart_donut(counts: dict, title: str):
+    return render_chart(spec_donut(counts, title))
+
+def chart_bar_compare(rows, title: str):
+    """rows: list of (label, value)"""
+    return render_chart(spec_bar_compare(rows, title))
+
+def chart_ed_bars(E, D, title="E vs D (gesamt)"):
+    return render_chart(spec_ed_bars(E, D, title))
+
+def chart_timeseries_ed(msgs, hits, E_SET, D_SET, window=20, title="E/D über Zeit (rollierend)",
+                        step=None, index=None):
+    return render_chart(spec_timeseries_ed(msgs, hits, E_SET, D_SET, window, title, step, index))
+
+def chart_theme_resonance(theme_scores: dict, title="Themen-Resonanz (gesamt)"):
+    return render_chart(spec_theme_resonance(theme_scores, title))
+
+def chart_top_markers_per_speaker(per_speaker_hits, marker_labels, topk=8, fmt="png", jobs=1):
+    specs = {spk: spec_top_markers(spk, hits, marker_labels, topk) for spk, hits in per_speaker_hits.items()}
+    return render_charts(specs, fmt, jobs)
+
+# Client-side renderer for --charts spec: turns the embedded JSON specs into
+# inline SVG for every <img src="#chart:NAME"> placeholder.
+CHART_SPEC_JS = r"""
+(function(){
+  var specs = JSON.parse(document.getElementById("chart-specs").textContent);
+  function esc(s){ return String(s).replace(/&/g,"&amp;").replace(/</g,"&lt;").replace(/>/g,"&gt;"); }
+  function txt(x,y,s,a,extra){ return '<text x="'+x+'" y="'+y+'" font-size="11" text-anchor="'+(a||"middle")+'"'+(extra||"")+'>'+esc(s)+'</text>'; }
+  function svg(sp){
+    var W=480,H=320,L=60,T=30,B=70,R=20,w=W-L-R,h=H-T-B,o=[txt(W/2,18,sp.title)];
+    var vals = sp.type==="line" ? [].concat.apply([], sp.series.map(function(s){return s.values;})) : sp.values;
+    var mx = Math.max.apply(null, vals.concat([0])) || 1, n = sp.labels.length || 1;
+    if (sp.type==="donut") {
+      var tot = vals.reduce(function(a,b){return a+b;},0)||1, a0=-Math.PI/2, cx=W/2, cy=T+h/2+10, r=110, ri=66;
+      sp.values.forEach(function(v,k){
+        var a1=a0+2*Math.PI*v/tot, big=(a1-a0>Math.PI)?1:0, c0=Math.cos(a0),s0=Math.sin(a0),c1=Math.cos(a1),s1=Math.sin(a1);
+        if (v>=tot) { a1-=1e-4; c1=Math.cos(a1); s1=Math.sin(a1); }
+        o.push('<path fill="'+sp.colors[k%sp.colors.length]+'" d="M'+(cx+r*c0)+','+(cy+r*s0)+'A'+r+','+r+' 0 '+big+' 1 '+(cx+r*c1)+','+(cy+r*s1)+
+               'L'+(cx+ri*c1)+','+(cy+ri*s1)+'A'+ri+','+ri+' 0 '+big+' 0 '+(cx+ri*c0)+','+(cy+ri*s0)+'Z"/>');
+        var am=(a0+a1)/2; o.push(txt(cx+(r+14)*Math.cos(am), cy+(r+14)*Math.sin(am), sp.labels[k], Math.cos(am)<0?"end":"start"));
+        a0=a1;
+      });
+    } else if (sp.type==="barh") {
+      var bh=h/n;
+      sp.values.forEach(function(v,k){
+        o.push('<rect x="'+(L+60)+'" y="'+(T+k*bh+2)+'" width="'+((w-60)*v/mx)+'" height="'+(bh-4)+'" fill="'+sp.colors[k%sp.colors.length]+'"/>');
+        o.push(txt(L+56, T+k*bh+bh/2+4, sp.labels[k], "end"));
+      });
+    } else {
+      var bw=w/n;
+      o.push('<line x1="'+L+'" y1="'+(T+h)+'" x2="'+(L+w)+'" y2="'+(T+h)+'" stroke="#333"/>');
+      sp.labels.forEach(function(lab,k){
+        o.push(txt(L+k*bw+bw/2, T+h+14, lab, sp.rotate?"end":"middle", sp.rotate?' transform="rotate(-20 '+(L+k*bw+bw/2)+' '+(T+h+14)+')"':''));
+      });
+      if (sp.type==="bar") {
+        sp.values.forEach(function(v,k){
+          o.push('<rect x="'+(L+k*bw+bw*0.1)+'" y="'+(T+h-h*v/mx)+'" width="'+(bw*0.8)+'" height="'+(h*v/mx)+'" fill="'+sp.colors[k%sp.colors.length]+'"/>');
+        });
+      } else {
+        sp.series.forEach(function(s,q){
+          var pts=s.values.map(function(v,k){ return (L+k*bw+bw/2)+','+(T+h-h*v/mx); });
+          o.push('<polyline fill="none" stroke="'+s.color+'" stroke-width="2" points="'+pts.join(" ")+'"/>');
+          o.push(txt(L+w-4, T+14+14*q, s.name, "end", ' fill="'+s.color+'"'));
+        });
+      }
+      o.push(txt(14, T+h/2, sp.ylabel||"", "middle", ' transform="rotate(-90 14 '+(T+h/2)+')"'));
+      o.push(txt(L+w, T+h-4, mx, "end"));
+    }
+    return '<svg xmlns="http://www.w3.org/2000/svg" width="'+W+'" height="'+H+'" font-family="sans-serif">'+o.join("")+'</svg>';
+  }
+  document.querySelectorAll('img[src^="#chart:"]').forEach(function(img){
+    var sp = specs[img.getAttribute("src").slice(7)];
+    if (sp) img.src = "data:image/svg+xml;charset=utf-8," + encodeURIComponent(svg(sp));
+  });
+})();
+"""
 
 # -------------------------
 # Reporting
 # -------------------------
-def render_html_report(template_html: str, context: dict) -> str:
-    # naive templating: {{key}} and {{#section}}..{{/section}} for simple loops
-    out = template_html
-
-    # simple replace for scalar values
-    for k,v in context.items():
-        if isinstance(v, (str,int,float)):
-            out = out.replace("{{"+k+"}}", str(v))
-
-    # sections: dicts of base64 images or arrays
-    # images: context["images"] is dict name->dataurl
+_PLACEHOLDER = re.compile(r"\{\{([^{}<>]+)\}\}")
+
+def _tokenize(template_html: str, body_anchor=True):
+    """Split into ("lit", text) / ("ph", key) segments; optional ("body", "") anchor before </body>."""
+    segs, pos = [], 0
+    for m in _PLACEHOLDER.finditer(template_html):
+        segs.append(("lit", template_html[pos:m.start()]))
+        segs.append(("ph", m.group(1)))
+        pos = m.end()
+    segs.append(("lit", template_html[pos:]))
+    if body_anchor:
+        # Anker für eingebettete Chart-Specs: vor dem ersten </body> (sonst am Ende)
+        for k, (kind, text) in enumerate(segs):
+            if kind == "lit" and "</body>" in text:
+                head, tail = text.split("</body>", 1)
+                segs[k:k+1] = [("lit", head), ("body", ""), ("lit", "</body>" + tail)]
+                break
+        else:
+            segs.append(("body", ""))
+    return tuple(seg for seg in segs if seg != ("lit", ""))
+
+@lru_cache(maxsize=8)
+def compile_template(template_html: str):
+    """Tokenized template, cached: batch runs render every report from the same segments."""
+    return _tokenize(template_html)
+
+def _image_src(name, value, fmt):
+    # png/svg -> data URL; spec -> "#chart:name" (filled client-side); url -> value as-is (sidecar files)
+    if fmt == "spec":
+        return (f"#chart:{name}",)
+    if fmt == "url":
+        return (value,)
+    return (f"data:{IMAGE_MIME[fmt]};base64,", value)
+
+def write_html_report(fh, template_html: str, context: dict):
+    """Render the template in one pass straight into the text stream fh.
+
+    Placeholders: {{key}} (str/int/float values), {{img:name}}, {{table:name}},
+    {{text:name}}, {{list:name}}. Text blocks may themselves reference
+    {{img:...}} (the per-speaker profiles do); unknown placeholders stay as-is.
+    context["image_format"]: png/svg -> data URLs, url -> context["images"] holds
+    ready URLs (sidecar files), spec -> "#chart:name" placeholders that
+    CHART_SPEC_JS fills client-side from context["chart_specs"].
+    """
     images = context.get("images", {})
-    for k, b64 in images.items():
-        out = out.replace("{{img:"+k+"}}", f"data:image/png;base64,{b64}")
-
-    # tables: context["tables"] : dict name -> HTML table
+    fmt = context.get("image_format", "png")
     tables = context.get("tables", {})
-    for k, html in tables.items():
-        out = out.replace("{{table:"+k+"}}", html)
-
-    # text blocks
     blocks = context.get("text", {})
-    for k, s in blocks.items():
-        out = out.replace("{{text:"+k+"}}", s)
-
-    # small lists
     lists = context.get("lists", {})
-    for k, arr in lists.items():
-        if isinstance(arr, list):
-            li = "".join(f"<li>{mat_html(str(x))}</li>" for x in arr)
-            out = out.replace("{{list:"+k+"}}", f"<ul>{li}</ul>")
 
-    return out
+    def emit(segs, nested):
+        for kind, val in segs:
+            if kind == "lit":
+                fh.write(val)
+            elif kind == "body":
+                specs = context.get("chart_specs")
+                if specs:
+                    payload = json.dumps(specs, ensure_ascii=False).replace("</", "<\\/")
+                    fh.write(f'<script type="application/json" id="chart-specs">{payload}</script>\n'
+                             f'<script>{CHART_SPEC_JS}</script>\n')
+            else:
+                emit_placeholder(val, nested)
+
+    def emit_placeholder(key, nested):
+        kind, _, name = key.partition(":")
+        if kind == "img" and name in images:
+            for part in _image_src(name, images[name], fmt):
+                fh.write(part)
+        elif kind == "table" and name in tables:
+            fh.write(tables[name])
+        elif kind == "text" and name in blocks and not nested:
+            emit(_tokenize(blocks[name], body_anchor=False), True)
+        elif kind == "list" and isinstance(lists.get(name), list):
+            li = "".join(f"<li>{mat_html(str(x))}</li>" for x in lists[name])
+            fh.write(f"<ul>{li}</ul>")
+        elif isinstance(context.get(key), (str, int, float)):
+            fh.write(str(context[key]))
+        else:
+            fh.write("{{" + key + "}}")
+
+    emit(compile_template(template_html), False)
+
+def render_html_report(template_html: str, context: dict) -> str:
+    buf = io.StringIO()
+    write_html_report(buf, template_html, context)
+    return buf.getvalue()
 
 def mat_html(s):  # minimal escape
     return (s.replace("&","&amp;").replace("<","&lt;").replace(">","&gt;"))
@@ -567,6 +1391,131 @@ def df_to_table(df: pd.DataFrame):
     # light styling inline
     return df.to_html(index=False, border=0, classes="table table-striped")
 
+# -------------------------
+# Results output
+# -------------------------
+RESULT_FORMATS = ("json", "ndjson", "parquet", "arrow")
+COMPRESSIONS = ("none", "gzip", "zstd")
+_SUFFIX = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+def open_output(path: Path, compress="none"):
+    """Text handle for path (+ .gz/.zst); returns (handle, final path)."""
+    path = path.with_name(path.name + _SUFFIX[compress])
+    if compress == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8"), path
+    if compress == "zstd":
+        if zstandard is None:
+            raise RuntimeError("--compress zstd braucht das Paket 'zstandard'")
+        raw = zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+        return io.TextIOWrapper(raw, encoding="utf-8"), path
+    return open(path, "w", encoding="utf-8"), path
+
+def _hit_json_rows(hits: HitTable, pad="", sel=None):
+    """JSON text per hit straight from the codes (pad=None: one line as json.dumps, else
+    the indent=2 layout of json.dump at indentation `pad`); `sel` picks rows by position."""
+    spk = [json.dumps(x, ensure_ascii=False) for x in hits.speakers]
+    mk = [json.dumps(x, ensure_ascii=False) for x in hits.markers]
+    if pad is None:
+        tpl = '{"i": %d, "speaker": %s, "marker": %s}'
+    else:
+        tpl = f'{pad}{{\n{pad}  "i": %d,\n{pad}  "speaker": %s,\n{pad}  "marker": %s\n{pad}}}'
+    cols = (hits.i, hits.spk, hits.mk) if sel is None else (hits.i[sel], hits.spk[sel], hits.mk[sel])
+    for i, s, m in zip(*(c.tolist() for c in cols)):
+        yield tpl % (i, spk[s], mk[m])
+
+def _write_json_list(fh, items, pad):
+    """Write an indent=2 JSON list of pre-encoded items; `pad` = indentation of the list itself."""
+    first = True
+    for item in items:
+        fh.write("[\n" if first else ",\n")
+        fh.write(item)
+        first = False
+    fh.write("[]" if first else f"\n{pad}]")
+
+def _write_results_json(fh, msgs, hits: HitTable, summary: dict):
+    """results.json, byte-identical to json.dump(..., indent=2) of the dict layout,
+    but hits and per_speaker are written from the HitTable columns (no hit dicts)."""
+    enc = json.JSONEncoder(ensure_ascii=False, indent=2)
+    def value(v):  # one level deep: shift the encoder's indentation by two spaces
+        for chunk in enc.iterencode(v):
+            fh.write(chunk.replace("\n", "\n  "))
+    fh.write('{\n  "messages": ')
+    value(msgs)
+    fh.write(',\n  "hits": ')
+    _write_json_list(fh, _hit_json_rows(hits, "    "), "  ")
+    fh.write(',\n  "per_speaker": ')
+    if not hits.speakers:
+        fh.write("{}")
+    else:
+        order = np.argsort(hits.spk, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(hits.spk, minlength=len(hits.speakers)))]).tolist()
+        for k, name in enumerate(hits.speakers):
+            fh.write(("{\n" if k == 0 else ",\n") + f"    {json.dumps(name, ensure_ascii=False)}: ")
+            _write_json_list(fh, _hit_json_rows(hits, "      ", order[bounds[k]:bounds[k + 1]]), "    ")
+        fh.write("\n  }")
+    for key, v in summary.items():
+        fh.write(f",\n  {json.dumps(key, ensure_ascii=False)}: ")
+        value(v)
+    fh.write("\n}")
+
+def _write_ndjson(path: Path, rows, compress):
+    fh, path = open_output(path, compress)
+    with fh:
+        for r in rows:
+            fh.write(json.dumps(r, ensure_ascii=False) + "\n")
+    return path
+
+def _hits_frame(hits: HitTable):
+    # categorical columns straight from the interned codes, no string re-hashing
+    return pd.DataFrame({
+        "i": hits.i,
+        "speaker": pd.Categorical.from_codes(hits.spk, categories=hits.speakers),
+        "marker": pd.Categorical.from_codes(hits.mk, categories=hits.markers),
+    })
+
+def _write_frame(df: pd.DataFrame, path: Path, fmt, compress):
+    if fmt == "parquet":
+        path = path.with_suffix(".parquet")
+        df.to_parquet(path, index=False, compression=None if compress == "none" else compress)
+    else:  # Arrow IPC file (Feather v2): memory-mappable with pyarrow
+        path = path.with_suffix(".arrow")
+        df.to_feather(path, compression="uncompressed" if compress == "none" else compress)
+    return path
+
+def write_results(outdir: Path, summary: dict, msgs, hits: HitTable, fmt="json", compress="none", omit_texts=False):
+    """Write the raw analysis data; returns the written paths.
+
+    json    -> results.json (classic layout: messages, hits, per_speaker + summary)
+    ndjson  -> summary.json + hits.ndjson + messages.ndjson (one record per line)
+    parquet/arrow -> summary.json + hits.* + messages.* (columnar, categorical ids)
+    compress applies to the json/ndjson payload files and as codec for parquet/arrow.
+    omit_texts drops the message texts (messages keep i and speaker).
+    """
+    if omit_texts:
+        msgs = [{"i": m["i"], "speaker": m["speaker"]} for m in msgs]
+    if fmt == "json":
+        fh, path = open_output(outdir / "results.json", compress)
+        with fh:
+            _write_results_json(fh, msgs, hits, summary)
+        return [path]
+
+    written = []
+    if fmt == "ndjson":
+        fh, path = open_output(outdir / "hits.ndjson", compress)
+        with fh:
+            for row in _hit_json_rows(hits, pad=None):
+                fh.write(row + "\n")
+        written.append(path)
+        written.append(_write_ndjson(outdir / "messages.ndjson", msgs, compress))
+    else:
+        written.append(_write_frame(_hits_frame(hits), outdir / "hits", fmt, compress))
+        written.append(_write_frame(pd.DataFrame(msgs, columns=["i", "speaker"] if omit_texts else ["i", "speaker", "text"]),
+                                    outdir / "messages", fmt, compress))
+    meta = {"n_messages": len(msgs), "n_hits": len(hits), **summary,
+            "files": [p.name for p in written]}
+    (outdir / "summary.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    return [outdir / "summary.json"] + written
+
 # -------------------------
 # Scenario profiles
 # -------------------------
@@ -590,56 +1539,132 @@ SCENARIOS = {
 }
 
 # -------------------------
-# Main
+# Incremental re-analysis (append-only chats)
 # -------------------------
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--input", "-i", type=Path, required=True, help="Chat-Textdatei ('Name: Nachricht' pro Zeile empfohlen)")
-    ap.add_argument("--scenario", "-s", choices=list(SCENARIOS.keys()), default="beziehung")
-    ap.add_argument("--outdir", "-o", type=Path, default=Path("out_report"))
-    ap.add_argument("--zip-schema", type=Path, default=DEFAULT_ZIP_SCHEMA)
-    ap.add_argument("--zip-markers", type=Path, default=DEFAULT_ZIP_MARKERS)
-    ap.add_argument("--zip-detectors", type=Path, default=DEFAULT_ZIP_DETECTORS)
-    ap.add_argument("--window", type=int, default=None, help="Override rollierendes Fenster (Anzahl Nachrichten)")
-    args = ap.parse_args()
+STATE_FILE = "analysis_state.pickle"
+STATE_VERSION = 2
 
-    args.outdir.mkdir(parents=True, exist_ok=True)
+def absence_tags(R: Resources):
+    """(tag_index, id_to_tags) over R.complete_marker_registry, as integrate_absence_detection() builds them."""
+    reg = R.complete_marker_registry
+    return build_tag_index(list(reg.values()) if isinstance(reg, dict) else reg)
 
-    # Load text
-    chat_text = args.input.read_text(encoding="utf-8", errors="ignore")
-
-    # Load resources
-    R = Resources(args.zip_schema, args.zip_markers, args.zip_detectors,
-                  THEMES_MAP_PATH, ACTIONS_MAP_PATH, EXTRA_MARKERS_PATH, ABSENCE_CONFIG_PATH)
-
-    # Messages & hits
-    msgs = chunk_messages(chat_text)
-    hits = match_markers(msgs, R.regex_markers)
-    
-    # ABSENCE DETECTION: Insert after regular matching, before scoring
-    if R.absence_config:
-        hits = integrate_absence_detection(msgs, hits, R.absence_config, R.complete_marker_registry, R.E_SET)
-    
-    per_speaker = hits_by_speaker(hits)
-    prim_counts = compute_primary_counts(hits, R.marker_to_primary)
-    E, D = ed_counts(hits, R.E_SET, R.D_SET)
-    wsum = weighted_sum(hits, R.weights)
-
-    # Resonance / Core Theme
-    theme = theme_resonance(hits, R)  # returns best theme + scores dicts
-
-    # Scenario window
-    conf = SCENARIOS[args.scenario]
-    window = args.window or conf["window"]
+def absence_setup(R: Resources):
+    """absence_params() for R (None without absence config)."""
+    if not R.absence_config:
+        return None
+    return absence_params(R.absence_config, absence_tags(R)[0])
+
+def analysis_fingerprint(R: Resources, P=None, window=None, step=None) -> str:
+    """Everything the stored running state depends on: marker patterns, E/D sets,
+    theme features, resolved absence config and the window/step of the series."""
+    h = hashlib.sha1(R.marker_scanner.fingerprint().encode("ascii"))
+    TM = R.theme_matrix
+    h.update(json.dumps([sorted(R.E_SET), sorted(R.D_SET), window, step,
+                         [(m, TM.features_of(m)) for m in TM.markers]], default=str).encode("utf-8"))
+    if P:
+        h.update(json.dumps([{k: v for k, v in P.items() if k != "ABS"},
+                             {k: sorted(v) for k, v in P["ABS"].items()}],
+                            sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+def prefix_hash(fh, offset, chunk=1 << 20):
+    """sha1 object over the first `offset` bytes of a binary file (None if it is shorter)."""
+    h = hashlib.sha1()
+    fh.seek(0)
+    while offset > 0:
+        data = fh.read(min(chunk, offset))
+        if not data:
+            return None
+        h.update(data)
+        offset -= len(data)
+    return h
+
+def last_line_end(fh, size, chunk=1 << 16) -> int:
+    """Byte offset just after the last b"\\n" of a binary file (0 if there is none)."""
+    end = size
+    while end > 0:
+        start = max(0, end - chunk)
+        fh.seek(start)
+        k = fh.read(end - start).rfind(b"\n")
+        if k >= 0:
+            return start + k + 1
+        end = start
+    return 0
+
+def read_lines(fh, end, digest=None):
+    """Decoded lines of a binary file from its current position up to byte `end`.
+
+    Decoding per line with errors="ignore" gives the same text as reading the
+    file in text mode (UTF-8 never has b"\\n" inside a character). The raw
+    bytes are fed to `digest` (a hashlib object), if given.
+    """
+    pos = fh.tell()
+    while pos < end:
+        raw = fh.readline(end - pos)
+        if not raw:
+            break
+        pos += len(raw)
+        if digest is not None:
+            digest.update(raw)
+        yield raw.decode("utf-8", "ignore")
+
+def load_state(state_path: Path, fingerprint, fh, size, hits_path: Path):
+    """Running state of the last --incremental run, if it still applies.
+
+    Valid only for the same fingerprint, an input whose first `offset` bytes
+    are unchanged (append-only) and a hits file at least as long as recorded.
+    The prefix hash is kept under "hash" and continued over the new tail.
+    """
+    try:
+        with open(state_path, "rb") as sfh:
+            st = pickle.load(sfh)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if not (isinstance(st, dict) and st.get("version") == STATE_VERSION and st.get("fingerprint") == fingerprint):
+        return None
+    if st["offset"] > size or not hits_path.exists() or hits_path.stat().st_size < st["hits_size"]:
+        return None
+    h = prefix_hash(fh, st["offset"])
+    if h is None or h.hexdigest() != st["digest"]:
+        return None
+    st["hash"] = h
+    return st
 
+# -------------------------
+# Main
+# -------------------------
+SIDECAR_DIR = "img"
+
+def write_sidecar_images(outdir: Path, rendered: dict, fmt) -> dict:
+    """Write name -> image bytes under outdir/SIDECAR_DIR; returns name -> relative URL ("" if none)."""
+    (outdir / SIDECAR_DIR).mkdir(parents=True, exist_ok=True)
+    urls = {}
+    for name, data in rendered.items():
+        if data is None:
+            urls[name] = ""
+            continue
+        # speaker names end up in chart names: keep them readable, the hash keeps them unique
+        stem = re.sub(r"[^\w.-]+", "_", name)
+        fname = f"{stem}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}.{fmt}"
+        (outdir / SIDECAR_DIR / fname).write_bytes(data)
+        urls[name] = f"{SIDECAR_DIR}/{fname}"
+    return urls
+
+def write_report(outdir: Path, R: Resources, args, *, n_messages, n_hits, per_speaker, prim_counts,
+                 E, D, wsum, theme, windows, window, trajectory=()) -> Path:
+    """Render report.html (and charts.json in spec mode) from aggregates only.
+
+    per_speaker: speaker -> Counter(marker); windows: (i, j, E, D) tuples;
+    trajectory: (i, j, {theme: score}) tuples (ThemeMatrix.trajectory).
+    Shared by analyze_one() and the constant-memory analyze_stream().
+    """
     # Build tables
     # per-speaker basiswerte:
     rows = []
-    for spk, hlist in per_speaker.items():
-        cnt = Counter([h["marker"] for h in hlist])
+    for spk, cnt in per_speaker.items():
         total = sum(cnt.values())
-        Es = sum(v for mid, v in cnt.items() if mid in R.E_SET)
-        Ds = sum(v for mid, v in cnt.items() if mid in R.D_SET)
+        Es, Ds = R.tables.ed(cnt)
         rows.append({
             "Person": spk,
             "Marker gesamt": total,
@@ -650,7 +1675,7 @@ def main():
 
     # Text blocks (strictly marker-based)
     overview_txt = textwrap.dedent(f"""
-    <b>Übersicht.</b> Es wurden <b>{len(hits)}</b> Marker-Treffer in <b>{len(msgs)}</b> Nachrichten erkannt.
+    <b>Übersicht.</b> Es wurden <b>{n_hits}</b> Marker-Treffer in <b>{n_messages}</b> Nachrichten erkannt.
     E/D gesamt: E=<b>{E}</b>, D=<b>{D}</b>. Gewichtete Summe (modellabhängig): <b>{round(wsum,2)}</b>.
     """).strip()
 
@@ -673,38 +1698,46 @@ def main():
             cands = ", ".join([mat_html(x) for x in s["suggest_labels"]])
             tips_txt += f"<p>Häufiger Marker: <b>{pm}</b> → balancierende Marker anstreben: <b>{cands}</b>.</p>\n"
 
-    # Build charts
-    img_primary = chart_donut(dict(prim_counts), "Primär-Achsen (gesamt)")
-    img_ed = chart_ed_bars(E, D, "E vs D (gesamt)")
-    img_ts = chart_timeseries_ed(msgs, hits, R.E_SET, R.D_SET, window=window, title=f"E/D über Zeit (Fenster={window})")
-    # Per speaker top markers (horizontal bars)
-    img_tops = chart_top_markers_per_speaker(per_speaker, R.marker_labels, topk=8)
-
-    # Theme resonance chart
-    theme_chart = chart_theme_resonance(theme.get("theme_scores", {}), title="Themen-Resonanz (gesamt)")
+    # Build chart specs (rendered below in one pass)
+    specs = {
+        "primary": spec_donut(dict(prim_counts), "Primär-Achsen (gesamt)"),
+        "ed": spec_ed_bars(E, D, "E vs D (gesamt)"),
+        "timeseries": spec_timeseries_windows(windows, title=f"E/D über Zeit (Fenster={window})"),
+        "theme": spec_theme_resonance(theme.get("theme_scores", {}), title="Themen-Resonanz (gesamt)"),
+        "theme_trend": spec_theme_trajectory(trajectory, R.theme_matrix.labels,
+                                             title=f"Themen-Verlauf (Fenster={window})"),
+    }
+    # Per speaker top markers (horizontal bars); keyed by position, names never enter attributes
+    for k, (spk, cnt) in enumerate(per_speaker.items()):
+        specs[f"tops:{k}"] = spec_top_markers(spk, cnt, R.marker_labels, topk=8)
 
     # Tables
     tables = {
         "compare": df_to_table(df_compare)
     }
 
-    # Images to embed
-    images = {
-        "primary": img_primary or "",
-        "ed": img_ed or "",
-        "timeseries": img_ts or "",
-        "theme": theme_chart or ""
-    }
-    # add per-speaker images
-    for spk, b64 in img_tops.items():
-        images[f"tops:{spk}"] = b64
+    # Images to embed (spec mode: no rasterization, the browser draws from chart_specs;
+    # sidecar mode: files under SIDECAR_DIR, the report only links them)
+    chart_specs = None
+    image_format = args.charts
+    if args.charts == "spec":
+        chart_specs = {k: v for k, v in specs.items() if v is not None}
+        images = {k: "" for k in specs}
+        (outdir / "charts.json").write_text(json.dumps(chart_specs, ensure_ascii=False, indent=2), encoding="utf-8")
+    elif args.sidecar_images:
+        images = write_sidecar_images(outdir, render_charts(specs, args.charts, args.jobs, encode=False), args.charts)
+        image_format = "url"
+    else:
+        images = {k: b64 or "" for k, b64 in render_charts(specs, args.charts, args.jobs).items()}
 
     # Per-speaker sections (plain, marker-described)
     profiles = []
-    for spk, hlist in per_speaker.items():
-        cnt = Counter([R.marker_labels.get(h["marker"], h["marker"]) for h in hlist])
-        top = ", ".join([f"{lab} ({n})" for lab,n in cnt.most_common(10)])
-        profiles.append(f"<h4>{mat_html(spk)}</h4><p>Häufigste Marker (Top10): {mat_html(top)}</p><img class='img' src='{{{{img:tops:{spk}}}}}' alt='Top {spk}'/>")
+    for k, (spk, cnt) in enumerate(per_speaker.items()):
+        labels = Counter()
+        for mid, c in cnt.items():
+            labels[R.marker_labels.get(mid, mid)] += c
+        top = ", ".join([f"{lab} ({n})" for lab,n in labels.most_common(10)])
+        profiles.append(f"<h4>{mat_html(spk)}</h4><p>Häufigste Marker (Top10): {mat_html(top)}</p><img class='img' src='{{{{img:tops:{k}}}}}' alt='Top {html.escape(spk, quote=True)}'/>")
 
     profiles_html = "\n".join(profiles)
 
@@ -715,14 +1748,18 @@ def main():
     Erhöhte E-Anteile deuten auf mehr eskalierende Marker-Häufungen hin; eine Zunahme der D-Anteile im Zeitverlauf spricht für deeskalierende Sequenzen. 
     Die oben gezeigten Fenster-Verläufe zeigen, <i>wann</i> Cluster von E- bzw. D-Markern auftraten (rein aus Treffern, ohne zusätzliche Deutung).
     """).strip()
+    if specs["theme_trend"]:
+        dynamics_txt += "\n<img class='img' src='{{img:theme_trend}}' alt='Themen-Verlauf'/>"
 
     # Put together HTML
     template = REPORT_TEMPLATE_PATH.read_text(encoding="utf-8")
-    html = render_html_report(template, {
+    context = {
         "project_title": "Chat-Analyse (markerbasiert)",
         "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
         "scenario": args.scenario.title(),
         "images": images,
+        "image_format": image_format,
+        "chart_specs": chart_specs,
         "tables": tables,
         "text": {
             "overview": overview_txt,
@@ -731,26 +1768,381 @@ def main():
             "tips": tips_txt,
             "profiles": profiles_html
         }
-    })
+    }
 
-    # Save files
-    out_html = args.outdir / "report.html"
-    out_html.write_text(html, encoding="utf-8")
+    # Save files (rendered straight into the file, no full-report string in memory)
+    out_html = outdir / "report.html"
+    with open(out_html, "w", encoding="utf-8") as fh:
+        write_html_report(fh, template, context)
+    return out_html
 
-    # Also dump raw JSON (for reproducibility)
-    dump = {
-        "messages": msgs,
-        "hits": hits,
-        "per_speaker": {k: [h for h in v] for k,v in per_speaker.items()},
+def analyze_one(chat_text: str, R: Resources, outdir: Path, args) -> dict:
+    """Analyze one chat with prebuilt Resources; writes report.html + results.json into outdir.
+
+    Returns a small per-chat summary (used by the batch mode's corpus summary).
+    """
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    # Messages & hits (columnar)
+    msgs = chunk_messages(chat_text)
+    hits = match_markers_table(msgs, R.marker_scanner)
+
+    # ABSENCE DETECTION: Insert after regular matching, before scoring
+    # (the detector reads the table columns; its synthetic hits are appended to the table)
+    if R.absence_config:
+        tag_index, id_to_tags = absence_tags(R)
+        hits = hits.concat(detect_absence_meta(msgs, hits, R.absence_config, tag_index, id_to_tags, R.E_SET))
+    
+    per_speaker = hits.speaker_marker_counts()
+    prim_counts = R.tables.primary_counts(hits)
+    E, D = R.tables.ed(hits)
+    wsum = R.tables.weighted_sum(hits)
+
+    # Resonance / Core Theme
+    theme = theme_resonance(hits, R)  # returns best theme + scores dicts
+
+    # Scenario window
+    conf = SCENARIOS[args.scenario]
+    window = args.window or conf["window"]
+
+    windows, trajectory = [], []
+    if msgs:
+        index = WindowIndex(len(msgs), hits, R.E_SET, R.D_SET)
+        windows = list(index.windows(window, args.step))
+        TM = R.theme_matrix
+        trajectory = TM.trajectory(index.category_counts(TM.feature_lookup(index.markers), TM.n_features,
+                                                         window, args.step))
+    out_html = write_report(outdir, R, args, n_messages=len(msgs), n_hits=len(hits),
+                            per_speaker=per_speaker,
+                            prim_counts=prim_counts, E=E, D=D, wsum=wsum, theme=theme,
+                            windows=windows, window=window, trajectory=trajectory)
+
+    # Also dump raw data (for reproducibility)
+    summary = {
         "prim_counts": dict(prim_counts),
         "E": E, "D": D,
         "weighted_sum": wsum,
-        "theme": theme
+        "theme": theme,
+        "theme_trajectory": [{"i": i, "j": j, "scores": sc} for i, j, sc in trajectory]
+    }
+    written = write_results(outdir, summary, msgs, hits, fmt=args.results_format, compress=args.compress,
+                            omit_texts=args.omit_texts)
+
+    return {
+        "messages": len(msgs), "hits": len(hits), "E": E, "D": D,
+        "weighted_sum": wsum, "theme_key": theme.get("theme_key", "Unbestimmt"),
+        "markers": dict(hits.marker_counts()),
+        "report": str(out_html),
+        "results": [str(p) for p in written],
+    }
+
+def analyze_stream(path: Path, R: Resources, outdir: Path, args) -> dict:
+    """Constant-memory variant of analyze_one() for huge exports (--stream).
+
+    Lines are read lazily and scanned in STREAM_BATCH-sized batches. Hits go
+    straight to hits.ndjson (a message's regular hits, then any absence hits
+    of a window closing at it, see OnlineAbsenceDetector). Only the open
+    absence window, the last `window` E/D counts, the theme-feature snapshots
+    of the open windows and the ChatAggregate counters stay in memory, so
+    results.json carries aggregates instead of message and hit lists.
+
+    With --incremental that running state is pickled to <outdir>/STATE_FILE
+    together with the byte offset of the last complete input line, a digest
+    of the bytes before it and the length of hits.ndjson at that point. A
+    rerun on the grown (append-only) export checks the digest, seek()s to the
+    offset and only reads, matches and counts the new tail; hits.ndjson is
+    cut back to the recorded length (dropping the hits of the windows that
+    were still open) and appended to. Any mismatch means a full run.
+    """
+    outdir.mkdir(parents=True, exist_ok=True)
+    conf = SCENARIOS[args.scenario]
+    window = args.window or conf["window"]
+    TM = R.theme_matrix
+    P = absence_setup(R)
+    incremental = getattr(args, "incremental", False)
+    state_path = outdir / STATE_FILE
+
+    with open(path, "rb") as fh:
+        size = os.fstat(fh.fileno()).st_size
+        hits_path = outdir / ("hits.ndjson" + _SUFFIX[args.compress])
+        fp = analysis_fingerprint(R, P, window, args.step) if incremental else None
+        st = load_state(state_path, fp, fh, size, hits_path) if incremental else None
+        if st:
+            agg = ChatAggregate.resume(R, st["aggregate"])
+            series, windows = st["series"], st["windows"]
+            theme_series, theme_windows = st["theme_series"], st["theme_windows"]
+            detector, pending = st["detector"], st["pending"]
+            offset, digest = st["offset"], st["hash"]
+            os.truncate(hits_path, st["hits_size"])
+            out = open(hits_path, "a", encoding="utf-8")
+        else:
+            agg = ChatAggregate(R)
+            series = StreamingWindows(window, args.step)
+            windows = []
+            theme_series = StreamingCounts(TM.n_features, window, args.step)
+            theme_windows = []
+            detector = OnlineAbsenceDetector.from_params(P, R.E_SET) if P else None
+            pending = None  # (E, D) of the previous message: absence hits may still land on it
+            offset, digest = 0, hashlib.sha1()
+            out, hits_path = open_output(outdir / "hits.ndjson", args.compress)
+        reused = agg.n_messages
+        # the last line may still be growing: state is saved after the last complete one
+        cut = max(offset, last_line_end(fh, size)) if incremental else size
+        fh.seek(offset)
+
+        with out:
+            def emit(hits):
+                for h in hits:
+                    out.write(json.dumps(h, ensure_ascii=False) + "\n")
+                    theme_series.add(TM.features_of(h["marker"]))
+                return agg.add(hits)
+
+            def close_message(pending):
+                w = series.push(*pending)
+                if w: windows.append(w)
+                w = theme_series.close_message()
+                if w: theme_windows.append(w)
+
+            def feed(lines, pending):
+                for msg, fired in scan_stream(iter_messages(lines, agg.n_messages), R.marker_scanner):
+                    if pending is not None:
+                        close_message(pending)
+                    agg.n_messages += 1
+                    hits = [{"i": msg["i"], "speaker": msg["speaker"], "marker": mid} for mid in fired]
+                    e, d = emit(hits)
+                    if detector:
+                        e2, d2 = emit(detector.push(msg, hits))
+                        e += e2; d += d2
+                    pending = (e, d)
+                return pending
+
+            pending = feed(read_lines(fh, cut, digest if incremental else None), pending)
+            if incremental:
+                out.flush()
+                state = pickle.dumps({
+                    "version": STATE_VERSION, "fingerprint": fp, "offset": cut, "digest": digest.hexdigest(),
+                    "hits_size": os.fstat(out.fileno()).st_size,
+                    "aggregate": agg.counters(), "series": series, "windows": windows,
+                    "theme_series": theme_series, "theme_windows": theme_windows,
+                    "detector": detector, "pending": pending,
+                }, protocol=pickle.HIGHEST_PROTOCOL)
+                fh.seek(cut)
+                pending = feed(read_lines(fh, size), pending)
+            if detector and pending is not None:
+                e2, d2 = emit(detector.finish())
+                pending = (pending[0] + e2, pending[1] + d2)
+            if pending is not None:
+                close_message(pending)
+            w = series.finish()
+            if w: windows.append(w)
+            w = theme_series.finish()
+            if w: theme_windows.append(w)
+
+    theme = theme_resonance(agg.markers, R)
+    trajectory = TM.trajectory(theme_windows)
+    out_html = write_report(outdir, R, args, n_messages=agg.n_messages, n_hits=agg.n_hits,
+                            per_speaker=agg.per_speaker, prim_counts=agg.prim_counts,
+                            E=agg.E, D=agg.D, wsum=agg.wsum, theme=theme,
+                            windows=windows, window=window, trajectory=trajectory)
+
+    dump = {
+        "streamed": True,
+        "n_messages": agg.n_messages,
+        "n_hits": agg.n_hits,
+        "hits_file": hits_path.name,
+        "per_speaker": {k: dict(v) for k, v in agg.per_speaker.items()},
+        "prim_counts": dict(agg.prim_counts),
+        "E": agg.E, "D": agg.D,
+        "weighted_sum": agg.wsum,
+        "theme": theme,
+        "theme_trajectory": [{"i": i, "j": j, "scores": sc} for i, j, sc in trajectory]
+    }
+    (outdir / "results.json").write_text(json.dumps(dump, ensure_ascii=False, indent=2), encoding="utf-8")
+    if incremental:
+        tmp = state_path.with_name(state_path.name + ".tmp")
+        tmp.write_bytes(state)
+        os.replace(tmp, state_path)
+
+    return {
+        "messages": agg.n_messages, "hits": agg.n_hits, "E": agg.E, "D": agg.D,
+        "weighted_sum": agg.wsum, "theme_key": theme.get("theme_key", "Unbestimmt"),
+        "markers": dict(agg.markers),
+        "reused_messages": reused,
+        "report": str(out_html),
+        "results": [str(outdir / "results.json"), str(hits_path)],
     }
-    (args.outdir / "results.json").write_text(json.dumps(dump, ensure_ascii=False, indent=2), encoding="utf-8")
+
+def build_arg_parser():
+    ap = argparse.ArgumentParser()
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--input", "-i", type=Path, help="Chat-Textdatei ('Name: Nachricht' pro Zeile empfohlen)")
+    src.add_argument("--input-dir", type=Path, help="Batch-Modus: Verzeichnis mit Chat-Dateien (ein Unterordner je Chat in --outdir)")
+    ap.add_argument("--glob", default="*.txt", help="Batch-Modus: Dateimuster in --input-dir (z.B. '**/*.txt')")
+    ap.add_argument("--scenario", "-s", choices=list(SCENARIOS.keys()), default="beziehung")
+    ap.add_argument("--outdir", "-o", type=Path, default=Path("out_report"))
+    ap.add_argument("--zip-schema", type=Path, default=DEFAULT_ZIP_SCHEMA)
+    ap.add_argument("--zip-markers", type=Path, default=DEFAULT_ZIP_MARKERS)
+    ap.add_argument("--zip-detectors", type=Path, default=DEFAULT_ZIP_DETECTORS)
+    ap.add_argument("--window", type=int, default=None, help="Override rollierendes Fenster (Anzahl Nachrichten)")
+    ap.add_argument("--step", type=int, default=None, help="Schrittweite der Fenster (Default: Fenstergröße, < Fenster = gleitend)")
+    ap.add_argument("--cache", action="store_true", help=f"Geparste ZIP-Inhalte cachen (in {PARSE_CACHE_DIR})")
+    ap.add_argument("--cache-dir", type=Path, default=None, help="Cache für geparste ZIP-Inhalte in diesem Verzeichnis (impliziert --cache)")
+    ap.add_argument("--no-cache", action="store_true", help="ZIP-Inhalte immer neu parsen (überstimmt --cache/--cache-dir)")
+    ap.add_argument("--stream", action="store_true",
+                    help="Konstanter Speicher: Eingabe zeilenweise lesen, Treffer nach hits.ndjson, results.json nur mit Aggregaten")
+    ap.add_argument("--incremental", action="store_true",
+                    help=f"Wie --stream, Zustand in <outdir>/{STATE_FILE}: beim nächsten Lauf nur die angehängten Zeilen lesen und auswerten")
+    ap.add_argument("--results-format", choices=RESULT_FORMATS, default="json",
+                    help="Rohdaten: json (results.json), ndjson, parquet oder arrow (IPC, memory-mappable)")
+    ap.add_argument("--compress", choices=COMPRESSIONS, default="none",
+                    help="Kompression der Rohdaten (gzip/zstd; bei parquet/arrow als Codec)")
+    ap.add_argument("--omit-texts", action="store_true", help="Nachrichtentexte nicht in die Rohdaten schreiben")
+    ap.add_argument("--charts", choices=CHART_FORMATS, default="png",
+                    help="png = Rasterbilder, svg = Vektor, spec = JSON-Specs (Rendering im Browser)")
+    ap.add_argument("--sidecar-images", action="store_true",
+                    help=f"Charts als Dateien in <outdir>/{SIDECAR_DIR}/ ablegen statt base64 einzubetten")
+    ap.add_argument("--jobs", "-j", type=int, default=None, help="Prozesse für Chart-Rendering (Default: seriell) bzw. Chats im Batch-Modus (Default: CPU-Anzahl)")
+    return ap
+
+def parse_cache_dir(args):
+    """ZIP parse cache directory for these CLI options, or None (the cache is opt-in)."""
+    if args.no_cache:
+        return None
+    return args.cache_dir or (PARSE_CACHE_DIR if args.cache else None)
+
+def load_resources(args) -> Resources:
+    return Resources(args.zip_schema, args.zip_markers, args.zip_detectors,
+                     THEMES_MAP_PATH, ACTIONS_MAP_PATH, EXTRA_MARKERS_PATH, ABSENCE_CONFIG_PATH,
+                     cache_dir=parse_cache_dir(args))
+
+# -------------------------
+# Batch corpus mode
+# -------------------------
+_BATCH = {}  # per worker process: Resources + CLI options, set once by _init_batch_worker
+
+def _init_batch_worker(R, args):
+    _BATCH["R"], _BATCH["args"] = R, args
+
+def _analyze_batch_item(item):
+    path, outdir = item
+    t0 = time.perf_counter()
+    try:
+        if _BATCH["args"].stream or _BATCH["args"].incremental:
+            info = analyze_stream(path, _BATCH["R"], outdir, _BATCH["args"])
+        else:
+            chat_text = path.read_text(encoding="utf-8", errors="ignore")
+            info = analyze_one(chat_text, _BATCH["R"], outdir, _BATCH["args"])
+    except Exception as e:  # one broken chat must not stop the corpus run
+        info = {"error": f"{type(e).__name__}: {e}"}
+    info.update(chat=str(path), seconds=round(time.perf_counter() - t0, 4))
+    return info
+
+def batch_inputs(input_dir: Path, pattern: str, outdir: Path):
+    """Sorted (chat file, per-chat outdir) pairs; the outdir mirrors the relative path without suffix."""
+    files = sorted(p for p in input_dir.glob(pattern) if p.is_file())
+    return [(p, outdir / p.relative_to(input_dir).with_suffix("")) for p in files]
+
+def summarize_corpus(rows, elapsed):
+    """Corpus totals from per-chat summaries (per-chat marker counts are folded into top_markers)."""
+    markers, themes = Counter(), Counter()
+    ok = [r for r in rows if "error" not in r]
+    for r in ok:
+        markers.update(r.pop("markers"))
+        themes[r["theme_key"]] += 1
+    return {
+        "chats": len(rows),
+        "failed": len(rows) - len(ok),
+        "messages": sum(r["messages"] for r in ok),
+        "hits": sum(r["hits"] for r in ok),
+        "E": sum(r["E"] for r in ok), "D": sum(r["D"] for r in ok),
+        "weighted_sum": sum(r["weighted_sum"] for r in ok),
+        "themes": dict(themes.most_common()),
+        "top_markers": dict(markers.most_common(50)),
+        "elapsed_seconds": round(elapsed, 3),
+        "chats_per_sec": round(len(rows) / elapsed, 3) if elapsed > 0 else None,
+        "per_chat": rows,
+    }
+
+def run_batch(args):
+    """Analyze every chat under --input-dir with one shared Resources instance.
+
+    Resources are built once in the parent; each worker process receives them
+    once through the pool initializer (inherited for free under fork) instead
+    of rebuilding zip reads, YAML parsing and regex compilation per chat.
+    """
+    items = batch_inputs(args.input_dir, args.glob, args.outdir)
+    if not items:
+        raise SystemExit(f"Keine Chats für '{args.glob}' in {args.input_dir}")
+    args.outdir.mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    R = load_resources(args)
+    t_res = time.perf_counter() - t0
+
+    jobs = min(args.jobs or os.cpu_count() or 1, len(items))
+    worker_args = argparse.Namespace(**{**vars(args), "jobs": 1})  # no nested chart pools
+    t1 = time.perf_counter()
+    if jobs <= 1:
+        _init_batch_worker(R, worker_args)
+        rows = list(map(_analyze_batch_item, items))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_batch_worker,
+                                 initargs=(R, worker_args)) as pool:
+            rows = list(pool.map(_analyze_batch_item, items, chunksize=max(1, len(items) // (8 * jobs))))
+    elapsed = time.perf_counter() - t1
+
+    summary = summarize_corpus(rows, elapsed)
+    summary["resources_seconds"] = round(t_res, 3)
+    summary["jobs"] = jobs
+    out = args.outdir / "corpus_summary.json"
+    out.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    for r in rows:
+        if "error" in r:
+            print(f"[WARN] {r['chat']}: {r['error']}", file=sys.stderr)
+    print(f"[OK] {summary['chats'] - summary['failed']}/{summary['chats']} Chats analysiert "
+          f"({summary['chats_per_sec']} Chats/s, {jobs} Prozess(e), Ressourcen {t_res:.2f}s)")
+    print(f"[OK] Korpus-Übersicht: {out}")
+    return summary
+
+def main():
+    ap = build_arg_parser()
+    args = ap.parse_args()
+    if (args.stream or args.incremental) and args.results_format != "json":
+        ap.error("--stream/--incremental schreiben immer hits.ndjson + results.json (Aggregate)")
+    if args.incremental and args.compress != "none":
+        ap.error("--incremental hängt an hits.ndjson an und braucht --compress none")
+    if args.results_format == "arrow" and args.compress == "gzip":
+        ap.error("arrow unterstützt nur --compress zstd oder none")
+    if args.compress == "zstd" and zstandard is None and args.results_format in ("json", "ndjson"):
+        ap.error("--compress zstd braucht das Paket 'zstandard'")
+    if args.results_format in ("parquet", "arrow") and importlib.util.find_spec("pyarrow") is None \
+            and not (args.results_format == "parquet" and importlib.util.find_spec("fastparquet")):
+        ap.error(f"--results-format {args.results_format} braucht pyarrow (parquet: alternativ fastparquet)")
+    if args.input_dir:
+        run_batch(args)
+        return
+
+    args.outdir.mkdir(parents=True, exist_ok=True)
+
+    # Load resources
+    R = load_resources(args)
+
+    if args.stream or args.incremental:
+        info = analyze_stream(args.input, R, args.outdir, args)
+    else:
+        # Load text
+        chat_text = args.input.read_text(encoding="utf-8", errors="ignore")
+        info = analyze_one(chat_text, R, args.outdir, args)
+    out_html = Path(info["report"])
 
     print(f"[OK] Report: {out_html}")
-    print(f"[OK] Raw data: {args.outdir / 'results.json'}")
+    if args.incremental:
+        print(f"[OK] Inkrementell: {info['reused_messages']}/{info['messages']} Nachrichten aus {STATE_FILE} übernommen")
+    print(f"[OK] Raw data: {', '.join(info['results'])}")
+    st = R.marker_scanner.stats()
+    print(f"[OK] Prefilter: {st['skipped']}/{st['skipped'] + st['regex_evaluations']} regex evaluations skipped "
+          f"({st['skip_ratio']:.1%})")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Kaltstart der MarkerEngine mit und ohne Snapshot.
+
+Legt einen synthetischen Marker-Baum (ATO-Marker aus bench_pattern_scanner
+plus Schemata) in einem Temp-Verzeichnis an und misst den Konstruktor
+  - ohne Snapshot (YAML/JSON parsen, Scanner kompilieren),
+  - mit Snapshot beim ersten Lauf (Aufbau + Schreiben),
+  - mit Snapshot beim Folgelauf (Laden).
+
+    python bench_engine_startup.py --sizes 500 2000 --repeat 3
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+from bench_pattern_scanner import make_markers
+from marker_engine_core import MarkerEngine
+
+
+def make_tree(root: Path, n: int, rng):
+    atomic = root / "markers" / "atomic"
+    atomic.mkdir(parents=True)
+    (root / "schemata").mkdir()
+    (root / "plugins").mkdir()
+    for mid, pats in make_markers(n, rng).items():
+        (atomic / f"{mid}.yaml").write_text(yaml.safe_dump({
+            "id": mid, "pattern": pats, "scoring": {"weight": 1.0},
+            "description": "synthetischer Marker " + mid,
+        }, allow_unicode=True), encoding="utf-8")
+    for sid in ("SCH_DEFAULT", "SCH_BEZIEHUNG"):
+        (root / "schemata" / f"{sid}.json").write_text(json.dumps({"id": sid}), encoding="utf-8")
+    (root / "schemata" / "MASTER_SCH_CORE.json").write_text(json.dumps({
+        "active_schemata": ["SCH_DEFAULT", "SCH_BEZIEHUNG"],
+        "priority": {"SCH_DEFAULT.json": 0.5, "SCH_BEZIEHUNG.json": 0.7},
+    }), encoding="utf-8")
+    (root / "DETECT_registry.json").write_text("[]", encoding="utf-8")
+
+
+def build(root: Path, snapshot=None) -> MarkerEngine:
+    return MarkerEngine(marker_root=str(root / "markers"),
+                        schema_root=str(root / "schemata"),
+                        detect_registry=str(root / "DETECT_registry.json"),
+                        plugin_root=str(root / "plugins"),
+                        snapshot=snapshot)
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench(sizes, repeat, seed=7):
+    rng = random.Random(seed)
+    print(f"{'marker':>7} {'plain ms':>9} {'first ms':>9} {'snapshot ms':>12} {'speedup':>8}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            make_tree(root, n, rng)
+            snap = root / "engine.snapshot"
+            t_plain = timed(lambda: build(root), repeat)
+
+            def first():
+                snap.unlink(missing_ok=True)
+                build(root, str(snap))
+            t_first = timed(first, repeat)
+
+            def warm():
+                if not build(root, str(snap)).snapshot_used:
+                    raise SystemExit("Snapshot wurde nicht verwendet!")
+            t_warm = timed(warm, repeat)
+            print(f"{n:>7} {t_plain*1000:>9.1f} {t_first*1000:>9.1f} {t_warm*1000:>12.1f} "
+                  f"{t_plain/t_warm:>7.1f}x")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[500, 2000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    bench(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
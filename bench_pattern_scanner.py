@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: PatternScanner vs. klassische Einzel-Pattern-Schleife
+(wie Schritt 2 in MarkerEngine.analyze()), plus Korpus-Modus
+(PatternScanner.scan_corpus, wie analyze_chat.match_markers).
+
+Erzeugt synthetische ATO-Marker im Stil des Marker_5.0-Bundles und prüft
+neben der Laufzeit, dass beide Wege exakt dieselben Marker liefern.
+
+    python bench_pattern_scanner.py --sizes 100 500 2000 --messages 2000
+"""
+
+import argparse
+import random
+import time
+
+from pattern_scanner import PatternScanner, scan_loop
+
+VOCAB = [
+    "immer", "nie", "nicht", "details", "schuld", "bitte", "warum", "ich", "du", "wir",
+    "kalt", "herzlos", "vertrauen", "lügen", "ehrlich", "sorry", "später", "plan", "update",
+    "grenze", "respekt", "okay", "morgen", "termin", "gefühl", "angst", "wut", "traurig",
+    "eigentlich", "vielleicht", "sicher", "allein", "stich", "helfen", "gut", "böse",
+    "reden", "klären", "hören", "verstehen", "druck", "ruhe", "zeit", "arbeit", "kinder",
+]
+
+# Füllwörter, auf die kein synthetisches Pattern zielt (realistischere Trefferdichte)
+FILLER = [
+    "und", "das", "ist", "ja", "so", "mal", "noch", "heute", "einfach", "schon", "auch",
+    "hab", "habe", "gerade", "echt", "dann", "wenn", "aber", "doch", "hier", "da", "was",
+    "wie", "mit", "für", "von", "zu", "auf", "den", "dem", "ein", "eine", "kurz", "lang",
+]
+
+
+def make_markers(n, rng):
+    """n synthetische ATO-Marker mit 1-3 Patterns (Wortgrenzen, Alternationen, Lücken)."""
+    markers = {}
+    for k in range(n):
+        pats = []
+        for _ in range(rng.randint(1, 3)):
+            a, b, c = rng.sample(VOCAB, 3)
+            shape = rng.randint(0, 3)
+            if shape == 0:
+                pats.append(rf"(?i)\b{a}\b")
+            elif shape == 1:
+                pats.append(rf"\b({a}|{b}) {c}\b")
+            elif shape == 2:
+                pats.append(rf"\b{a}\b.*\b{b}\w*")
+            else:
+                pats.append(rf"\b{a}{k % 7}\b")  # feuert praktisch nie
+        markers[f"ATO_SYNTH_{k:04d}"] = pats
+    return markers
+
+
+def make_texts(m, rng, vocab_share=0.2):
+    def word():
+        return rng.choice(VOCAB) if rng.random() < vocab_share else rng.choice(FILLER)
+    return [" ".join(word() for _ in range(rng.randint(4, 18))).capitalize() + "."
+            for _ in range(m)]
+
+
+def bench(sizes, n_messages, chunk_size, seed=7):
+    rng = random.Random(seed)
+    texts = make_texts(n_messages, rng)
+    print(f"{'marker':>7} {'patterns':>9} {'loop ms':>10} {'scanner ms':>11} {'corpus ms':>10} {'speedup':>8}")
+    for n in sizes:
+        markers = make_markers(n, rng)
+        scanner = PatternScanner(markers, chunk_size=chunk_size)
+
+        t0 = time.perf_counter()
+        ref = [scan_loop(markers, t) for t in texts]
+        t_loop = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        got = [scanner.scan(t) for t in texts]
+        t_scan = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        got_corpus = scanner.scan_corpus(texts)
+        t_corpus = time.perf_counter() - t0
+
+        if got != ref or got_corpus != ref:
+            raise SystemExit(f"Abweichung bei {n} Markern!")
+        print(f"{n:>7} {len(scanner):>9} {t_loop*1000:>10.1f} {t_scan*1000:>11.1f} {t_corpus*1000:>10.1f} "
+              f"{t_loop/min(t_scan, t_corpus):>7.1f}x")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000])
+    ap.add_argument("--messages", type=int, default=2000)
+    ap.add_argument("--chunk-size", type=int, default=16)
+    args = ap.parse_args()
+    bench(args.sizes, args.messages, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
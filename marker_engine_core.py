@@ -8,134 +8,859 @@ führt Scoring und Fusion nach Master-Schema durch. Gibt strukturierte Ergebniss
 """
 
 from pathlib import Path
+from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import yaml
 import json
+import hashlib
+import heapq
 import importlib
+import importlib.util
+import itertools
+import os
+import pickle
 import re
+import copy
 import datetime
-from typing import Dict, List, Any
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Pattern, Set, Tuple
+
+from pattern_scanner import PatternScanner
+
+try:  # optional: vektorisiertes Scoring großer Trefferlisten
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
 # --------------------------------------------------------------
 PRFX_LEVELS = ("ATO_", "SEM_", "CLU_", "MEMA_")
 
+# Ab dieser Trefferzahl wird per numpy.bincount statt in der Python-Schleife akkumuliert
+VECTOR_SCORE_MIN = 32
+
+# Unterhalb dieser Batchgröße lohnt der Prozess-Pool nicht (Start + Engine-Aufbau je Worker)
+BATCH_INPROCESS_MAX = 2000
+
+# Formatversion der Engine-Snapshots; bei Strukturänderungen hochzählen
+SNAPSHOT_VERSION = 3
+
+
+@dataclass(frozen=True)
+class DetectorSpec:
+    """Vorkompilierter Registry-Eintrag; wird nur beim Laden/refresh() gebaut."""
+    id: str
+    module: str
+    file_path: str
+    fires_marker: Optional[str] = None
+    pattern: Optional[Pattern] = None
+
+
+class LazyPlugin:
+    """Platzhalter für ein Detector-Plugin; das Modul wird erst beim ersten Zugriff ausgeführt.
+
+    Attributzugriffe (``plugin.run(text)``) werden an das Modul durchgereicht.
+    ``import_seconds`` hält die gemessene Importzeit; beim Pickeln (Snapshot,
+    Batch-Worker) wird nur der Platzhalter übertragen, nicht das Modul.
+    """
+
+    def __init__(self, plugin_id: str, path: Path):
+        self.plugin_id = plugin_id
+        self.path = path
+        self.import_seconds: Optional[float] = None
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    t0 = time.perf_counter()
+                    spec = importlib.util.spec_from_file_location(self.plugin_id, self.path)
+                    mod  = importlib.util.module_from_spec(spec)
+                    spec.loader.exec_module(mod)  # type: ignore
+                    self.import_seconds = time.perf_counter() - t0
+                    self._module = mod
+        return self._module
+
+    def __getattr__(self, name: str):
+        if name.startswith("__") or name in ("_module", "_lock"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __getstate__(self):
+        return {"plugin_id": self.plugin_id, "path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["plugin_id"], state["path"])
+
+
+# "ANY 2 IN 30 messages", "AT_LEAST 2 DISTINCT SEMs IN 5 messages", "ALL", …
+_RULE_RX = re.compile(
+    r"^\s*(?:(?P<kind>ANY|AT_LEAST)\s+(?P<n>\d+)|(?P<all>ALL))"
+    r"(?P<distinct>\s+DISTINCT)?"
+    r"(?:\s+(?P<level>ATO|SEM|CLU|MEMA)S?)?"
+    r"(?:\s+IN\s+(?P<window>\d+)\s+MESSAGES?)?\s*$",
+    re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class ActivationRule:
+    """Kompilierte ``activation.rule`` eines zusammengesetzten Markers."""
+    min_count: int = 1
+    distinct: bool = False
+    level: Optional[str] = None                     # Präfix-Filter, z.B. "SEM_"
+    window: Optional[int] = None                    # Fenster in Nachrichten (Streaming)
+    weights: Tuple[Tuple[str, float], ...] = ()     # WEIGHTED_AND
+    threshold: Optional[float] = None
+
+    def satisfied(self, counts, deps: Tuple[str, ...]) -> bool:
+        """counts: Marker-ID -> Trefferzahl im betrachteten Ausschnitt (dict oder Fenster-Sicht)."""
+        if self.threshold is not None:
+            return sum(w for mid, w in self.weights if counts.get(mid, 0) > 0) >= self.threshold
+        present = [d for d in deps
+                   if counts.get(d, 0) > 0 and (self.level is None or d.startswith(self.level))]
+        n = len(present) if self.distinct else sum(counts[d] for d in present)
+        return n >= self.min_count
+
+
+def _marker_deps(marker: Dict[str, Any]) -> Tuple[str, ...]:
+    deps = [d for d in (marker.get("composed_of") or []) if isinstance(d, str)]
+    combo = marker.get("combination")
+    if isinstance(combo, dict):
+        deps += [c["marker_id"] for c in combo.get("components") or []
+                 if isinstance(c, dict) and c.get("marker_id")]
+    return tuple(dict.fromkeys(deps))
+
+
+def parse_activation(marker: Dict[str, Any], deps: Tuple[str, ...]) -> Optional[ActivationRule]:
+    """ActivationRule aus ``activation``/``window``; None, wenn die Regel nicht auswertbar ist."""
+    act = marker.get("activation") or {}
+    rule = act.get("rule") if isinstance(act, dict) else act
+    win = marker.get("window")
+    window = win.get("messages") if isinstance(win, dict) else None
+    if not rule:
+        return ActivationRule(window=window)
+    rule = str(rule)
+    if rule.strip().upper() == "WEIGHTED_AND":
+        combo = marker.get("combination") or {}
+        weights = tuple((c["marker_id"], float(c.get("weight", 0.0)))
+                        for c in combo.get("components") or []
+                        if isinstance(c, dict) and c.get("marker_id"))
+        return ActivationRule(window=window, weights=weights,
+                              threshold=float(combo.get("threshold", 0.0)))
+    m = _RULE_RX.match(rule)
+    if not m:
+        return None
+    level = (m.group("level").upper() + "_") if m.group("level") else None
+    if m.group("window"):
+        window = int(m.group("window"))
+    if m.group("all"):
+        n = len([d for d in deps if level is None or d.startswith(level)])
+        return ActivationRule(min_count=max(1, n), distinct=True, level=level, window=window)
+    return ActivationRule(min_count=int(m.group("n")), distinct=bool(m.group("distinct")),
+                          level=level, window=window)
+
+
+class _WindowView:
+    """Sicht auf ein ConversationWindow, begrenzt auf die letzten ``window`` Nachrichten."""
+    __slots__ = ("_win", "_window")
+
+    def __init__(self, win: "ConversationWindow", window: int):
+        self._win, self._window = win, window
+
+    def get(self, mid: str, default: int = 0) -> int:
+        return self._win.count(mid, self._window) or default
+
+    def __getitem__(self, mid: str) -> int:
+        return self._win.count(mid, self._window)
+
+
+class ConversationWindow:
+    """Rollierender Marker-Zustand über die letzten ``max_window`` Nachrichten.
+
+    Je Marker eine Deque der Nachrichtenindizes, in denen er gefeuert hat;
+    ältere Einträge fallen beim advance() heraus. Speicher O(max_window ·
+    Treffer je Nachricht), unabhängig von der Gesprächslänge.
+    analyze() nutzt ein Fenster der Länge 1 (nur die aktuelle Nachricht).
+    """
+
+    def __init__(self, max_window: int = 1):
+        self.max_window = max(1, int(max_window))
+        self.now = -1
+        self._fires: Dict[str, deque] = {}
+        self._log: deque = deque()        # je Nachricht die dort gefeuerten Marker
+
+    def advance(self):
+        """Nächste Nachricht beginnen; Einträge außerhalb des Fensters verwerfen."""
+        self.now += 1
+        self._log.append([])
+        if len(self._log) > self.max_window:
+            for mid in self._log.popleft():
+                d = self._fires[mid]
+                d.popleft()
+                if not d:
+                    del self._fires[mid]
+
+    def add(self, mid: str):
+        """Marker hat in der aktuellen Nachricht gefeuert."""
+        self._fires.setdefault(mid, deque()).append(self.now)
+        self._log[-1].append(mid)
+
+    def count(self, mid: str, window: Optional[int] = None) -> int:
+        d = self._fires.get(mid)
+        if not d:
+            return 0
+        if window is None or window >= self.max_window:
+            return len(d)
+        lo = self.now - window
+        n = 0
+        for idx in reversed(d):
+            if idx <= lo:
+                break
+            n += 1
+        return n
+
+    def within(self, window: Optional[int]) -> _WindowView:
+        return _WindowView(self, window or self.max_window)
+
+
+class MarkerGraph:
+    """Abhängigkeits-DAG über ``composed_of`` (ATO → SEM → CLU → MEMA).
+
+    Wird einmal beim Laden kompiliert: Abhängigkeiten, Reverse-Listen
+    (wer hängt von mir ab?) und eine topologische Rangfolge. propagate()
+    besucht nur die Marker, deren Eingaben sich gerade geändert haben, in
+    Rangfolge – die Kosten hängen an der Treffermenge, nicht am Katalog.
+    """
+
+    def __init__(self, markers: Dict[str, Dict[str, Any]]):
+        deps: Dict[str, Tuple[str, ...]] = {}
+        rules: Dict[str, ActivationRule] = {}
+        unsupported: List[str] = []
+        for mid, marker in markers.items():
+            d = _marker_deps(marker)
+            if not d:
+                continue
+            rule = parse_activation(marker, d)
+            if rule is None:
+                unsupported.append(mid)
+                continue
+            deps[mid] = d
+            rules[mid] = rule
+
+        parents: Dict[str, List[str]] = {}
+        for mid, d in deps.items():
+            for child in d:
+                parents.setdefault(child, []).append(mid)
+
+        # Kahn: Blätter (ATO, Detector-Marker) zuerst
+        indeg = {mid: sum(1 for c in d if c in deps) for mid, d in deps.items()}
+        queue = deque(sorted(mid for mid, k in indeg.items() if k == 0))
+        order: List[str] = []
+        while queue:
+            mid = queue.popleft()
+            order.append(mid)
+            for p in parents.get(mid, ()):
+                indeg[p] -= 1
+                if indeg[p] == 0:
+                    queue.append(p)
+        if len(order) != len(deps):
+            cyclic = sorted(mid for mid, k in indeg.items() if k > 0)
+            raise ValueError(f"Zyklische composed_of-Abhängigkeit: {', '.join(cyclic)}")
+
+        self.deps = deps
+        self.rules = rules
+        self.parents: Dict[str, Tuple[str, ...]] = {k: tuple(v) for k, v in parents.items()}
+        self.order: Tuple[str, ...] = tuple(order)
+        self.rank: Dict[str, int] = {mid: i for i, mid in enumerate(order)}
+        self.unsupported: Tuple[str, ...] = tuple(unsupported)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @property
+    def max_window(self) -> int:
+        """Größtes Regel-Fenster (Nachrichten), mindestens 1."""
+        return max([r.window for r in self.rules.values() if r.window] or [1])
+
+    def propagate(self, seeds: Iterable[str], window: ConversationWindow,
+                  fired_now: Set[str]) -> List[str]:
+        """Wertet die von ``seeds`` abhängigen Marker in topologischer Reihenfolge aus.
+
+        window: Trefferzustand, gegen den die Regeln (je mit eigenem Fenster)
+        prüfen; neu gefeuerte Marker werden dort für die aktuelle Nachricht
+        eingetragen. fired_now: in dieser Nachricht bereits gefeuerte Marker
+        (werden nicht doppelt gemeldet).
+        Gibt die neu gefeuerten Marker in Rangfolge zurück.
+        """
+        heap: List[Tuple[int, str]] = []
+        queued: Set[str] = set()
+        rank, parents = self.rank, self.parents
+        for s in seeds:
+            for p in parents.get(s, ()):
+                if p not in queued:
+                    queued.add(p)
+                    heapq.heappush(heap, (rank[p], p))
+        out: List[str] = []
+        while heap:
+            _, mid = heapq.heappop(heap)
+            rule = self.rules[mid]
+            if mid in fired_now or not rule.satisfied(window.within(rule.window), self.deps[mid]):
+                continue
+            out.append(mid)
+            fired_now.add(mid)
+            window.add(mid)
+            for p in parents.get(mid, ()):
+                if p not in queued:
+                    queued.add(p)
+                    heapq.heappush(heap, (rank[p], p))
+        return out
+
+
+class EngineState:
+    """Kompilierter Engine-Zustand (Marker, Schemata, Fusion, Detektoren, Scanner, DAG).
+
+    Wird einmal aufgebaut und danach nicht mehr verändert. Reloads bauen einen
+    neuen Zustand und tauschen nur die Referenz ``MarkerEngine._state`` aus;
+    laufende analyze()-Aufrufe arbeiten auf dem Zustand weiter, mit dem sie
+    begonnen haben.
+    """
+
+    def __init__(self):
+        self.markers : Dict[str, Dict[str, Any]] = {}
+        self.schemas : Dict[str, Dict[str, Any]] = {}
+        self.active_schemas : List[Dict[str, Any]] = []
+        self.schema_priority : Dict[str, float] = {}
+        self.fusion_mode : str = "multiply"
+        self.fusion_table: Dict[str, float] = {}   # Marker-ID -> fusionierter Rohscore je Treffer
+        self.fusion_index: Dict[str, int] = {}
+        self.fusion_weights = None
+        self.detectors: Tuple[DetectorSpec, ...] = ()
+        self.plugins  : Dict[str, Any]           = {}
+        self.pattern_sources: Dict[str, Any] = {}  # ATO-ID -> Pattern(s) wie im YAML
+        self.pattern_scanner: Optional[PatternScanner] = None
+        self.marker_graph: Optional[MarkerGraph] = None
+        # Quelldatei -> (mtime_ns, size, sha1, geparster Inhalt); beim Reload
+        # werden nur Dateien mit geändertem Inhalt neu geparst
+        self.files: Dict[Path, Tuple[int, int, str, Any]] = {}
+
+
+def _state_attr(name: str):
+    """Lesezugriff auf ein Feld des aktuellen EngineState (rückwärtskompatible Attribute)."""
+    return property(lambda self: getattr(self._state, name))
+
+
 class MarkerEngine:
+    markers         = _state_attr("markers")
+    schemas         = _state_attr("schemas")
+    active_schemas  = _state_attr("active_schemas")
+    schema_priority = _state_attr("schema_priority")
+    fusion_mode     = _state_attr("fusion_mode")
+    fusion_table    = _state_attr("fusion_table")
+    detectors       = _state_attr("detectors")
+    plugins         = _state_attr("plugins")
+    pattern_scanner = _state_attr("pattern_scanner")
+    marker_graph    = _state_attr("marker_graph")
+
     def __init__(self,
                  marker_root: str = "markers",
                  schema_root: str = "schemata",
                  detect_registry: str = "DETECT_registry.json",
-                 plugin_root: str = "plugins"):
+                 plugin_root: str = "plugins",
+                 snapshot: Optional[str] = None,
+                 reload_interval: Optional[float] = None,
+                 preload_plugins: Optional[str] = None):
+        """``preload_plugins``: None – Plugins erst beim ersten Treffer importieren,
+        "schemas" – nur die von aktiven Schemata referenzierten sofort laden,
+        "all" – alle sofort laden (altes Verhalten)."""
+
+        # Konstruktor-Argumente, damit Batch-Worker die Engine selbst aufbauen
+        # (ohne Hot-Reload – Worker leben nur für einen Batch)
+        self._init_kwargs = dict(marker_root=marker_root, schema_root=schema_root,
+                                 detect_registry=detect_registry, plugin_root=plugin_root,
+                                 snapshot=snapshot, preload_plugins=preload_plugins)
 
         self.marker_path   = Path(marker_root)
         self.schema_path   = Path(schema_root)
         self.plugin_root   = Path(plugin_root)
         self.detect_registry = Path(detect_registry)
+        self.snapshot_path = Path(snapshot) if snapshot else None
+        if preload_plugins not in (None, "schemas", "all"):
+            raise ValueError(f"preload_plugins: unbekannter Modus {preload_plugins!r}")
+        self.preload_plugins = preload_plugins
 
-        # interne Caches
-        self.markers : Dict[str, Dict[str, Any]] = {}
-        self.schemas : Dict[str, Dict[str, Any]] = {}
-        self.active_schemas : List[Dict[str, Any]] = []
-        self.schema_priority : Dict[str, float] = {}
-        self.fusion_mode : str = "multiply"
-        self.detectors: List[Dict[str, Any]]     = []
-        self.plugins  : Dict[str, Any]           = {}
+        self._state = EngineState()
+        self.snapshot_used = False
+        self.reload_error: Optional[BaseException] = None
+        self._reloader: Optional[Tuple[threading.Thread, threading.Event]] = None
+
+        digest = self._source_digest() if self.snapshot_path else None
+        state = self._load_snapshot(digest) if digest else None
+        if state is not None:
+            self.snapshot_used = True
+        else:
+            state = self._build_state()
+            if digest:
+                self._write_snapshot(state, digest)
+        self._preload(state)
+        self._state = state
 
-        self._load_markers()
-        self._load_schemata()
-        self._load_detectors()
+        if reload_interval:
+            self.start_reload(reload_interval)
 
     # ----------------------------------------------------------
     # Loader
     # ----------------------------------------------------------
-    def _load_markers(self):
+    def _build_state(self, prev: Optional[EngineState] = None) -> EngineState:
+        """Baut einen vollständigen Zustand aus den Quelldateien.
+
+        Dateien, deren Inhalt sich gegenüber ``prev`` nicht geändert hat,
+        werden nicht neu geparst; unveränderte ATO-Patterns übernehmen auch
+        den kompilierten Scanner.
+        """
+        st = EngineState()
+        cache = prev.files if prev is not None else {}
+        self._load_markers(st, cache)
+        if prev is not None and prev.pattern_sources == st.pattern_sources:
+            st.pattern_scanner = prev.pattern_scanner
+        else:
+            st.pattern_scanner = PatternScanner(st.pattern_sources, flags=re.IGNORECASE)
+        st.marker_graph = MarkerGraph(st.markers)
+        self._load_schemata(st, cache)
+        self._build_fusion_table(st)
+        self._load_detectors(st, cache)
+        return st
+
+    @staticmethod
+    def _parse(st: EngineState, cache: Dict[Path, Tuple[int, int, str, Any]],
+               path: Path, loader):
+        """``loader(path, raw_bytes)`` nur aufrufen, wenn sich der Inhalt geändert hat."""
+        fs = path.stat()
+        entry = cache.get(path)
+        if entry is not None and entry[0] == fs.st_mtime_ns and entry[1] == fs.st_size:
+            st.files[path] = entry
+            return entry[3]
+        raw = path.read_bytes()
+        digest = hashlib.sha1(raw).hexdigest()
+        data = entry[3] if entry is not None and entry[2] == digest else loader(path, raw)
+        st.files[path] = (fs.st_mtime_ns, fs.st_size, digest, data)
+        return data
+
+    def _load_markers(self, st: EngineState, cache):
         """Lädt alle Marker aus atomic/semantic/cluster/meta und prüft Präfix."""
         for sub in ["atomic", "semantic", "cluster", "meta"]:
             sub_path = self.marker_path / sub
             if not sub_path.exists():
                 continue
-            for file in sub_path.glob("*.yaml"):
-                data = yaml.safe_load(file.read_text("utf-8"))
+            for file in sorted(sub_path.glob("*.yaml")):
+                data = self._parse(st, cache, file, lambda p, raw: yaml.safe_load(raw.decode("utf-8")))
                 marker_id = data.get("id")
-                if marker_id and marker_id[:4] in PRFX_LEVELS:
-                    self.markers[marker_id] = data
+                if marker_id and marker_id.startswith(PRFX_LEVELS):
+                    st.markers[marker_id] = data
+        for marker_id, marker in st.markers.items():
+            if marker_id.startswith("ATO_") and "pattern" in marker:
+                st.pattern_sources[marker_id] = marker["pattern"]
 
-    def _load_schemata(self):
+    def prefilter_stats(self) -> Dict[str, Any]:
+        """Literal-Prefilter-Bilanz der ATO-Patterns (u.a. ``skip_ratio``)."""
+        return self.pattern_scanner.stats()
+
+    def _load_schemata(self, st: EngineState, cache):
         """Lädt alle Schemata + Master-Schema für Fusion/Prioritäten."""
-        for file in self.schema_path.glob("SCH_*.json"):
-            data = json.loads(file.read_text("utf-8"))
-            self.schemas[data["id"]] = data
+        def load_json(p, raw):
+            return json.loads(raw.decode("utf-8"))
+        for file in sorted(self.schema_path.glob("SCH_*.json")):
+            data = self._parse(st, cache, file, load_json)
+            st.schemas[data["id"]] = data
         master_path = self.schema_path / "MASTER_SCH_CORE.json"
         if master_path.exists():
-            master = json.loads(master_path.read_text("utf-8"))
-            self.active_schemas = [self.schemas[sch] for sch in master["active_schemata"]]
-            self.schema_priority = master.get("priority", {})
-            self.fusion_mode = master.get("fusion", "multiply")
+            master = self._parse(st, cache, master_path, load_json)
+            st.active_schemas = [st.schemas[sch] for sch in master["active_schemata"]]
+            st.schema_priority = master.get("priority", {})
+            st.fusion_mode = master.get("fusion", "multiply")
+
+    @staticmethod
+    def _build_fusion_table(st: EngineState):
+        """Fusionierten Score je Marker einmalig vorberechnen (Gewicht × bzw. + Prioritäten).
 
-    def _load_detectors(self):
-        """Lädt alle Detektoren aus Registry, inkl. optionaler Plugins."""
+        Der Faktor hängt nur vom Marker und vom Master-Schema ab; analyze()
+        schlägt ihn nur noch nach.
+        """
+        prios = [st.schema_priority.get(Path(sch["id"]).name + ".json", 1.0)
+                 for sch in st.active_schemas]
+        table: Dict[str, float] = {}
+        for marker_id, m in st.markers.items():
+            raw = 1.0 * m.get("scoring", {}).get("weight", 1.0)
+            for prio in prios:
+                if st.fusion_mode == "multiply":
+                    raw *= prio
+                elif st.fusion_mode == "sum":
+                    raw += prio
+            table[marker_id] = raw
+        st.fusion_table = table
+        st.fusion_index = {mid: i for i, mid in enumerate(table)}
+        st.fusion_weights = np.fromiter(table.values(), dtype=float, count=len(table)) if np is not None else None
+
+    def _load_detectors(self, st: EngineState, cache):
+        """Lädt alle Detektoren aus Registry, inkl. optionaler Plugins.
+
+        Regex-Detektoren werden hier einmalig gelesen und kompiliert; das
+        Ergebnis ist eine unveränderliche Tabelle, analyze() macht kein I/O.
+        """
         if not self.detect_registry.exists():
             raise FileNotFoundError("Detector-Registry nicht gefunden!")
-        reg = json.loads(self.detect_registry.read_text("utf-8"))
+        reg = self._parse(st, cache, self.detect_registry,
+                          lambda p, raw: json.loads(raw.decode("utf-8")))
+        table: List[DetectorSpec] = []
         for entry in reg:
-            self.detectors.append(entry)
-            if entry["module"] == "plugin":
+            module = entry.get("module")
+            if module == "regex":
+                fires_marker, pattern = self._parse(
+                    st, cache, Path(entry["file_path"]), self._compile_regex_spec)
+                table.append(DetectorSpec(
+                    id=entry["id"], module=module, file_path=entry["file_path"],
+                    fires_marker=fires_marker, pattern=pattern))
+            elif module == "plugin":
                 plugin_path = (self.plugin_root / Path(entry["file_path"]).name)
-                spec = importlib.util.spec_from_file_location(entry["id"], plugin_path)
-                mod  = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(mod)  # type: ignore
-                self.plugins[entry["id"]] = mod
+                st.plugins[entry["id"]] = self._parse(
+                    st, cache, plugin_path, lambda p, raw, pid=entry["id"]: LazyPlugin(pid, p))
+                table.append(DetectorSpec(id=entry["id"], module=module,
+                                          file_path=entry["file_path"]))
+            else:
+                table.append(DetectorSpec(id=entry.get("id", ""), module=module or "",
+                                          file_path=entry.get("file_path", "")))
+        st.detectors = tuple(table)
+
+    @staticmethod
+    def _compile_regex_spec(path: Path, raw: bytes) -> Tuple[str, Pattern]:
+        spec = json.loads(raw.decode("utf-8"))
+        return spec["fires_marker"], re.compile(spec["rule"]["pattern"], re.IGNORECASE)
+
+    @staticmethod
+    def _schema_plugin_refs(st: EngineState) -> Set[str]:
+        """IDs, die aktive Schemata unter ``detectors`` oder ``markers`` nennen."""
+        refs: Set[str] = set()
+        for sch in st.active_schemas:
+            refs.update(sch.get("detectors", []))
+            refs.update(sch.get("markers", []))
+        return refs
+
+    def _preload(self, st: EngineState):
+        """Plugins je nach ``preload_plugins`` vorab importieren."""
+        if self.preload_plugins is None:
+            return
+        refs = self._schema_plugin_refs(st) if self.preload_plugins == "schemas" else None
+        for plugin_id, plugin in st.plugins.items():
+            if refs is None or plugin_id in refs:
+                plugin.load()
+
+    def plugin_report(self) -> List[Dict[str, Any]]:
+        """Je Plugin: geladen?, gemessene Importzeit (ms), Datei – teuerste zuerst."""
+        rows = [{"id": pid,
+                 "file": str(plugin.path),
+                 "loaded": plugin.loaded,
+                 "import_ms": None if plugin.import_seconds is None
+                              else round(plugin.import_seconds * 1000, 3)}
+                for pid, plugin in self.plugins.items()]
+        rows.sort(key=lambda r: -(r["import_ms"] or 0.0))
+        return rows
+
+    # ----------------------------------------------------------
+    # Snapshot
+    # ----------------------------------------------------------
+    def _source_files(self) -> List[Path]:
+        """Alle Dateien, aus denen der geladene Zustand entsteht (sortiert)."""
+        files: List[Path] = []
+        for sub in ["atomic", "semantic", "cluster", "meta"]:
+            files.extend(sorted((self.marker_path / sub).glob("*.yaml")))
+        files.extend(sorted(self.schema_path.glob("SCH_*.json")))
+        files.append(self.schema_path / "MASTER_SCH_CORE.json")
+        files.append(self.detect_registry)
+        if self.detect_registry.exists():
+            for entry in json.loads(self.detect_registry.read_text("utf-8")):
+                if entry.get("module") == "regex":
+                    files.append(Path(entry["file_path"]))
+                elif entry.get("module") == "plugin":
+                    files.append(self.plugin_root / Path(entry["file_path"]).name)
+        return files
+
+    def _source_digest(self) -> str:
+        """Inhalts-Hash über alle Quelldateien; fehlende Dateien zählen mit."""
+        h = hashlib.sha1(f"v{SNAPSHOT_VERSION}".encode())
+        for path in self._source_files():
+            h.update(str(path).encode("utf-8") + b"\0")
+            try:
+                h.update(hashlib.sha1(path.read_bytes()).digest())
+            except FileNotFoundError:
+                h.update(b"-")
+        return h.hexdigest()
+
+    def _load_snapshot(self, digest: str) -> Optional[EngineState]:
+        """Liefert den Zustand aus dem Snapshot, wenn dessen Hash passt, sonst None.
+
+        Plugins kommen als ungeladene LazyPlugin-Platzhalter zurück. Der
+        Snapshot ist eine Pickle-Datei und darf nur aus vertrauenswürdiger
+        Quelle stammen.
+        """
+        try:
+            with open(self.snapshot_path, "rb") as fh:
+                snap = pickle.load(fh)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if not isinstance(snap, dict) or snap.get("digest") != digest:
+            return None
+        return snap["state"]
+
+    def _write_snapshot(self, state: EngineState, digest: str):
+        """Schreibt den Zustand atomar: tmp-Datei + os.replace."""
+        tmp = self.snapshot_path.with_name(self.snapshot_path.name + f".{os.getpid()}.tmp")
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "wb") as fh:
+            pickle.dump({"digest": digest, "state": state}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.snapshot_path)
+
+    # ----------------------------------------------------------
+    # Reload
+    # ----------------------------------------------------------
+    def _stale(self, st: EngineState) -> Tuple[bool, Dict[Path, Tuple[int, int, str, Any]]]:
+        """(geändert?, nur berührte Dateien) gegenüber ``st``.
+
+        Erst mtime/Größe vergleichen; nur bei Abweichung wird der Inhalt gehasht,
+        damit ein bloßes ``touch`` keinen Neuaufbau auslöst. Berührte Dateien
+        kommen mit neuem Fingerabdruck zurück; ``st`` selbst bleibt unverändert.
+        """
+        touched: Dict[Path, Tuple[int, int, str, Any]] = {}
+        current = [p for p in self._source_files() if p.exists()]
+        if set(current) != set(st.files):
+            return True, touched
+        for path in current:
+            mtime_ns, size, digest, data = st.files[path]
+            fs = path.stat()
+            if fs.st_mtime_ns == mtime_ns and fs.st_size == size:
+                continue
+            if hashlib.sha1(path.read_bytes()).hexdigest() != digest:
+                return True, touched
+            touched[path] = (fs.st_mtime_ns, fs.st_size, digest, data)
+        return False, touched
+
+    def refresh(self) -> bool:
+        """Prüft alle Quelldateien (Marker, Schemata, Registry, Specs, Plugins).
+
+        Bei Änderung wird ein neuer Zustand aufgebaut – nur geänderte Dateien
+        werden neu geparst – und per Referenztausch aktiviert. Leser nehmen
+        keinen Lock; ein laufendes analyze() endet auf dem alten Zustand.
+        Wurden Dateien nur berührt, bekommt eine flache Kopie des Zustands die
+        neuen Fingerabdrücke, damit nicht jedes Mal gehasht wird.
+        Gibt True zurück, wenn neu geladen wurde.
+        """
+        old = self._state
+        changed, touched = self._stale(old)
+        if not changed:
+            if touched:
+                new = copy.copy(old)
+                new.files = {**old.files, **touched}
+                self._state = new
+            return False
+        new = self._build_state(old)
+        self._preload(new)
+        self._state = new
+        if self.snapshot_path:
+            self._write_snapshot(new, self._source_digest())
+        return True
+
+    def start_reload(self, interval: float = 2.0):
+        """Startet einen Daemon-Thread, der alle ``interval`` Sekunden refresh() aufruft.
+
+        Fehler beim Neuaufbau (z.B. kaputtes YAML) lassen den alten Zustand
+        aktiv und landen in ``reload_error``.
+        """
+        if self._reloader is not None:
+            return
+        stop = threading.Event()
+
+        def poll():
+            while not stop.wait(interval):
+                try:
+                    self.refresh()
+                    self.reload_error = None
+                except Exception as exc:
+                    self.reload_error = exc
+
+        thread = threading.Thread(target=poll, name="MarkerEngine-reload", daemon=True)
+        self._reloader = (thread, stop)
+        thread.start()
+
+    def stop_reload(self):
+        """Beendet den Reload-Thread (falls gestartet) und wartet auf ihn."""
+        if self._reloader is None:
+            return
+        thread, stop = self._reloader
+        self._reloader = None
+        stop.set()
+        thread.join()
 
     # ----------------------------------------------------------
     # Haupt­methode
     # ----------------------------------------------------------
-    def analyze(self, text: str) -> Dict[str, Any]:
+    def _base_hits(self, text: str, st: EngineState) -> List[Dict[str, Any]]:
         hits: List[Dict[str, Any]] = []
 
         # 1) Detector-Registry anwenden (Präfix-Fire)
-        for det in self.detectors:
-            if det["module"] == "regex":
-                spec = json.loads(Path(det["file_path"]).read_text("utf-8"))
-                pattern = re.compile(spec["rule"]["pattern"], re.IGNORECASE)
-                if pattern.search(text):
-                    hits.append({"marker": spec["fires_marker"], "source": det["id"]})
-
-            elif det["module"] == "plugin":
-                plugin = self.plugins[det["id"]]
+        for det in st.detectors:
+            if det.module == "regex":
+                if det.pattern.search(text):
+                    hits.append({"marker": det.fires_marker, "source": det.id})
+
+            elif det.module == "plugin":
+                plugin = st.plugins[det.id]
                 result = plugin.run(text)
-                hits.extend({"marker": m, "source": det["id"]} for m in result.get("fires", []))
+                hits.extend({"marker": m, "source": det.id} for m in result.get("fires", []))
 
         # 2) Pattern-basierte Marker (nur Level 1, atomic)
-        for marker_id, marker in self.markers.items():
-            if marker_id.startswith("ATO_") and "pattern" in marker:
-                pats = marker["pattern"]
-                if isinstance(pats, str): pats = [pats]
-                for pat in pats:
-                    if re.search(pat, text, re.IGNORECASE):
-                        hits.append({"marker": marker_id, "source": "pattern"})
-                        break
-
-        # 3) Schema-Fusion (Scoring/Priorisierung)
-        final_scores: Dict[str, float] = {}
-        for hit in hits:
-            m = self.markers.get(hit["marker"])
-            if not m: continue
-            weight = m.get("scoring", {}).get("weight", 1.0)
-            raw = 1.0 * weight
-
-            for sch in self.active_schemas:
-                prio = self.schema_priority.get(Path(sch["id"]).name + ".json", 1.0)
-                if self.fusion_mode == "multiply":
-                    raw *= prio
-                elif self.fusion_mode == "sum":
-                    raw += prio
+        for marker_id in st.pattern_scanner.scan(text):
+            hits.append({"marker": marker_id, "source": "pattern"})
+        return hits
 
-            final_scores[hit["marker"]] = final_scores.get(hit["marker"], 0) + raw
+    def _compose(self, hits: List[Dict[str, Any]], window: ConversationWindow, st: EngineState):
+        """Zusammengesetzte Marker (SEM/CLU/MEMA) über den composed_of-DAG anhängen.
 
+        Nur Marker, deren Eingaben in dieser Nachricht gefeuert haben, werden
+        neu bewertet; ihre Regeln zählen im jeweiligen Fenster von ``window``.
+        """
+        fired_now: Set[str] = set()
+        for h in hits:
+            if h["marker"] not in fired_now:
+                fired_now.add(h["marker"])
+                window.add(h["marker"])
+        for marker_id in st.marker_graph.propagate(list(fired_now), window, fired_now):
+            hits.append({"marker": marker_id, "source": "composed"})
+
+    def analyze(self, text: str) -> Dict[str, Any]:
+        st = self._state  # ein Zustand pro Aufruf, auch wenn parallel neu geladen wird
+        hits = self._base_hits(text, st)
+
+        # 2b) composed_of-DAG, zustandslos: nur diese eine Nachricht
+        window = ConversationWindow(1)
+        window.advance()
+        self._compose(hits, window, st)
+
+        # 3) Schema-Fusion (Scoring/Priorisierung) – Tabellen-Lookup
         return {
             "timestamp": datetime.datetime.utcnow().isoformat(),
             "hits": hits,
-            "scores": final_scores
+            "scores": self.score_hits(hits, st)
         }
 
+    def stream(self, messages: Iterable[Tuple[str, str, Any]],
+               max_window: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Live-Analyse eines Gesprächs: (speaker, text, timestamp) rein, Ergebnis je Nachricht raus.
+
+        Composed-Marker werten ihre Regeln ("ANY 2 IN 30 messages", …) über
+        die letzten Nachrichten aus. Der Zustand ist ein ConversationWindow
+        über das größte Regel-Fenster (oder ``max_window``); Speicher und
+        Latenz je Nachricht bleiben konstant, egal wie lang das Gespräch wird.
+        Ein Reload greift ab der nächsten Nachricht; die Fenstergröße bleibt.
+        """
+        window = ConversationWindow(max_window or self.marker_graph.max_window)
+        for index, (speaker, text, timestamp) in enumerate(messages):
+            st = self._state
+            window.advance()
+            hits = self._base_hits(text, st)
+            self._compose(hits, window, st)
+            yield {
+                "index": index,
+                "speaker": speaker,
+                "timestamp": timestamp,
+                "hits": hits,
+                "scores": self.score_hits(hits, st),
+            }
+
+    def score_hits(self, hits: List[Dict[str, Any]],
+                   state: Optional[EngineState] = None) -> Dict[str, float]:
+        """Summiert die fusionierten Scores je Marker (unbekannte Marker zählen nicht).
+
+        Große Trefferlisten laufen über numpy.bincount; die Summationsreihenfolge
+        ist dieselbe wie in der Schleife, die Ergebnisse sind bitgleich.
+        """
+        st = state or self._state
+        table = st.fusion_table
+        if np is not None and len(hits) >= VECTOR_SCORE_MIN:
+            index = st.fusion_index
+            known = [h["marker"] for h in hits if h["marker"] in index]
+            if not known:
+                return {}
+            idx = np.fromiter((index[m] for m in known), dtype=np.intp, count=len(known))
+            sums = np.bincount(idx, weights=st.fusion_weights[idx], minlength=len(index))
+            return {m: float(sums[index[m]]) for m in dict.fromkeys(known)}
+
+        final_scores: Dict[str, float] = {}
+        for hit in hits:
+            raw = table.get(hit["marker"])
+            if raw is None: continue
+            final_scores[hit["marker"]] = final_scores.get(hit["marker"], 0) + raw
+        return final_scores
+
+    # ----------------------------------------------------------
+    # Batch
+    # ----------------------------------------------------------
+    def analyze_batch(self, texts: Iterable[str], workers: Optional[int] = None,
+                      chunksize: int = 256) -> Iterator[Dict[str, Any]]:
+        """analyze() für viele Texte; liefert die Ergebnisse als Stream in Eingabereihenfolge.
+
+        Jeder Worker-Prozess baut die Engine einmal im Initializer auf, pro Task
+        wandert nur ein Textblock (``chunksize`` Texte) über die Prozessgrenze.
+        Es sind höchstens ``2 * workers`` Blöcke gleichzeitig unterwegs, die
+        Eingabe darf also ein beliebig langer Iterator sein. Kleine Batches
+        (< BATCH_INPROCESS_MAX) und ``workers=1`` laufen im eigenen Prozess.
+        """
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, int(chunksize))
+        stream = iter(texts)
+        head = list(itertools.islice(stream, BATCH_INPROCESS_MAX))
+        if workers <= 1 or len(head) < BATCH_INPROCESS_MAX:
+            for text in itertools.chain(head, stream):
+                yield self.analyze(text)
+            return
+
+        stream = itertools.chain(head, stream)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_batch_worker_init,
+                                   initargs=(self._init_kwargs,))
+        try:
+            pending = deque()
+            while True:
+                block = list(itertools.islice(stream, chunksize))
+                if not block:
+                    break
+                pending.append(pool.submit(_batch_worker_analyze, block))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+# -----------------------------------------------------------------
+# Batch-Worker (Modulebene, damit sie per Pickle referenzierbar sind)
+# -----------------------------------------------------------------
+_BATCH_ENGINE: Optional[MarkerEngine] = None
+
+
+def _batch_worker_init(engine_kwargs: Dict[str, Any]):
+    global _BATCH_ENGINE
+    _BATCH_ENGINE = MarkerEngine(**engine_kwargs)
+
+
+def _batch_worker_analyze(texts: List[str]) -> List[Dict[str, Any]]:
+    return [_BATCH_ENGINE.analyze(t) for t in texts]
+
+
 # -----------------------------------------------------------------
 if __name__ == "__main__":
     eng = MarkerEngine()
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+pattern_scanner.py
+─────────────────────────────────────────────────────────────────
+Kompilierter Multi-Pattern-Scanner für Marker-Patterns.
+Fasst viele Einzel-Regexe zu wenigen kombinierten Automaten zusammen
+(Alternationen, zum Label-Routing als Binärbaum geteilt) und liefert die gefeuerten
+Marker-IDs eines Textes – mit exakt derselben Semantik wie eine Schleife
+über ``re.search(pat, text, flags)`` je Pattern.
+
+Optional (Standard) läuft davor ein Literal-Prefilter: aus jedem Pattern
+werden beim Laden Pflicht-Literale extrahiert ("immer", "nicht", …), ein
+Aho-Corasick-Durchlauf über den case-gefalteten Text liefert die Kandidaten,
+und nur diese gehen in die volle Regex-Engine.
+"""
+
+import hashlib
+import re
+from bisect import bisect_right
+from typing import Dict, FrozenSet, List, Mapping, Optional, Pattern, Sequence, Tuple, Union
+
+try:  # zusätzliche Groß-/Kleinschreibungs-Äquivalenzen der re-Engine (ı~i, ſ~s, …)
+    from re._casefix import _EXTRA_CASES
+except ImportError:  # pragma: no cover
+    try:  # Python < 3.11: dieselbe Tabelle unter anderem Namen
+        from sre_compile import _ignorecase_fixes as _EXTRA_CASES
+    except ImportError:
+        # unbekannt: Faltung wäre inexakt, required_literals liefert dann nichts
+        _EXTRA_CASES = None
+
+try:  # Python >= 3.11
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse  # type: ignore
+
+PatternSource = Union[str, Pattern]
+
+# führende globale Inline-Flags, z.B. "(?i)" oder "(?is)"
+_LEADING_FLAGS = re.compile(r"\A\(\?([aiLmsux]+)\)")
+_SCOPED_FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s"}
+
+
+_REPEATS = tuple(getattr(sre_parse, name) for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+                 if hasattr(sre_parse, name))
+_ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+
+# kürzere Pflicht-Literale filtern kaum und blähen den Automaten auf
+MIN_LITERAL_LEN = 2
+
+
+def _walk(parsed):
+    """Alle (opcode, argument)-Paare eines sre-Parsebaums, rekursiv."""
+    for op, av in parsed:
+        yield op, av
+        if op is sre_parse.BRANCH:
+            for alt in av[1]:
+                yield from _walk(alt)
+        elif op is sre_parse.SUBPATTERN:
+            yield from _walk(av[3])
+        elif op in _REPEATS:
+            yield from _walk(av[2])
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            yield from _walk(av[1])
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            yield from _walk(av)
+        elif op is sre_parse.GROUPREF_EXISTS:
+            yield from _walk(av[1])
+            if av[2] is not None:
+                yield from _walk(av[2])
+
+
+def _fragment(source: str, flags: int) -> Optional[str]:
+    """Pattern als eigenständig einbettbares Fragment, oder None.
+
+    None heißt: das Pattern muss separat laufen (Backreferences, eigene
+    benannte Gruppen, Verbose-Modus oder Flags ohne Scoped-Form).
+    """
+    parsed = sre_parse.parse(source, flags)
+    if parsed.state.groupdict:
+        return None
+    for op, _ in _walk(parsed):
+        if op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            return None
+    all_flags = parsed.state.flags
+    if all_flags & (re.VERBOSE | re.ASCII | re.LOCALE):
+        return None
+    body = source
+    while True:
+        m = _LEADING_FLAGS.match(body)
+        if not m:
+            break
+        body = body[m.end():]
+    scoped = "".join(ch for bit, ch in _SCOPED_FLAGS.items() if all_flags & bit)
+    return f"(?{scoped}:{body})" if scoped else f"(?:{body})"
+
+
+# Anker/Assertions, die am Nachrichtenrand anders urteilen als mitten im Puffer
+_EDGE_SENSITIVE = frozenset(getattr(sre_parse, name) for name in
+                            ("AT_BEGINNING", "AT_END", "AT_BEGINNING_STRING", "AT_END_STRING"))
+
+# Konstrukte ohne Backtracking – ein Match im Puffer ist keine Obermenge mehr
+_CORPUS_UNSAFE = frozenset(getattr(sre_parse, name) for name in
+                           ("ATOMIC_GROUP", "POSSESSIVE_REPEAT") if hasattr(sre_parse, name))
+
+# Trenner zwischen den Texten im Korpus-Puffer (siehe PatternScanner.scan_corpus)
+CORPUS_SEP = "\n"
+# ab so vielen Kandidaten prüft _corpus_candidates, ob sich die Puffer-Suche noch lohnt
+CORPUS_DENSE_MIN = 256
+
+
+def corpus_regex(source: str, flags: int) -> Optional[Pattern]:
+    """Variante eines Patterns zur Kandidatensuche im verketteten Korpus-Puffer.
+
+    Kompiliert mit MULTILINE, damit ``^``/``$`` an jedem Trenner (``\\n``)
+    greifen. Jeder Text, in dem das Original matcht, liefert dann auch im
+    Puffer einen Match, der in diesem Text beginnt (Obermenge, Kandidaten
+    werden anschließend je Text geprüft). None, wenn das nicht garantiert
+    ist: negative Lookarounds, Lookbehinds, atomare Gruppen und possessive
+    Quantoren (sie können den Trenner verschlucken, ohne zurückzugeben)
+    sowie ``\\A``/``\\Z`` und Anker mit lokal abgeschaltetem MULTILINE.
+    """
+    try:
+        parsed = sre_parse.parse(source, flags | re.MULTILINE)
+    except (re.error, RecursionError):
+        return None
+    for op, av in _walk(parsed):
+        if op is sre_parse.ASSERT_NOT or op in _CORPUS_UNSAFE:
+            return None
+        if op is sre_parse.ASSERT and av[0] < 0:  # Lookbehind
+            return None
+        if op is sre_parse.AT and av in _EDGE_SENSITIVE:
+            return None
+    try:
+        return re.compile(source, flags | re.MULTILINE)
+    except (re.error, OverflowError, RecursionError):
+        return None
+
+
+def _corpus_candidates(rx: Pattern, buf: str, starts: Sequence[int]):
+    """Indizes der Texte, in denen ``rx`` im Puffer einen Match beginnt (aufsteigend).
+
+    Nach jedem Kandidaten springt die Suche an den Anfang des nächsten
+    Texts – pro Text höchstens ein Treffer, der Rest läuft in C. Trifft das
+    Pattern fast überall (mehr als jeder zweite Text nach CORPUS_DENSE_MIN
+    Kandidaten), kommen die übrigen Texte ungefiltert; die Einzelprüfung ist
+    dann billiger als Suche + Offset-Abbildung.
+    """
+    n = len(starts)
+    search = rx.search
+    pos = 0
+    found = 0
+    while True:
+        m = search(buf, pos)
+        if m is None:
+            return
+        k = bisect_right(starts, m.start()) - 1
+        yield k
+        found += 1
+        if k + 1 >= n:
+            return
+        if found >= CORPUS_DENSE_MIN and 2 * found > k + 1:
+            yield from range(k + 1, n)
+            return
+        pos = starts[k + 1]
+
+
+# --------------------------------------------------------------
+# Literal-Prefilter
+# --------------------------------------------------------------
+class _CaseFold(dict):
+    """str.translate-Tabelle: Zeichen -> Repräsentant seiner IGNORECASE-Klasse.
+
+    Zwei Zeichen, die re mit IGNORECASE gleichsetzt, bekommen denselben
+    Repräsentanten (einfaches Lowercase, plus re._casefix-Sonderfälle).
+    Einträge werden bei Bedarf berechnet.
+    """
+
+    def __missing__(self, cp):
+        low = chr(cp).lower()[:1] or chr(cp)
+        lcp = ord(low)
+        rep = min((lcp,) + tuple((_EXTRA_CASES or {}).get(lcp, ())))
+        self[cp] = rep
+        return rep
+
+
+_FOLD_TABLE = _CaseFold()
+
+
+def fold(text: str) -> str:
+    """Case-Faltung passend zu re.IGNORECASE (für Text und Literale)."""
+    if text.isascii():
+        return text.lower()
+    return text.translate(_FOLD_TABLE)
+
+
+def _required(seq) -> Optional[FrozenSet[str]]:
+    """Disjunktion von Literalen, von denen mind. eines in jedem Match steckt.
+
+    Rückgabe None, wenn sich aus der Sequenz nichts Verlässliches ableiten lässt.
+    Gewählt wird der Faktor mit dem längsten kürzesten Literal.
+    """
+    factors: List[FrozenSet[str]] = []
+    run: List[str] = []
+
+    def flush():
+        if run:
+            factors.append(frozenset(["".join(run)]))
+            run.clear()
+
+    for op, av in seq:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is sre_parse.SUBPATTERN:
+            req = _required(av[3])
+        elif op in _REPEATS:
+            req = _required(av[2]) if av[0] >= 1 else None
+        elif op is sre_parse.BRANCH:
+            alts = [_required(alt) for alt in av[1]]
+            req = None if any(a is None for a in alts) else frozenset().union(*alts)
+        else:
+            req = None
+        if req:
+            factors.append(req)
+    flush()
+    if not factors:
+        return None
+    return max(factors, key=lambda f: (min(len(x) for x in f), -len(f)))
+
+
+def required_literals(source: str, flags: int = 0) -> Optional[FrozenSet[str]]:
+    """Gefaltete Pflicht-Literale eines Patterns (eines davon muss im Text stehen)."""
+    if _EXTRA_CASES is None:  # pragma: no cover
+        return None
+    try:
+        req = _required(sre_parse.parse(source, flags))
+    except (re.error, RecursionError):
+        return None
+    if not req or min(len(x) for x in req) < MIN_LITERAL_LEN:
+        return None
+    return frozenset(fold(x) for x in req)
+
+
+class LiteralPrefilter:
+    """Aho-Corasick-Automat über einer festen Literal-Liste.
+
+    ``find(folded)`` liefert die Indizes aller Literale, die im (bereits
+    gefalteten) Text vorkommen – in einem Durchlauf, überlappend.
+    Übergänge, die über Failure-Links aufgelöst werden, landen beim ersten
+    Gebrauch im Übergangs-Dict des Zustands (lazy DFA).
+    """
+
+    def __init__(self, literals: Sequence[str]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Tuple[int, ...]] = [()]
+        for lid, lit in enumerate(literals):
+            state = 0
+            for ch in lit:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = out[state] + (lid,)
+
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fnext = goto[f].get(ch, 0)
+                fail[nxt] = fnext if fnext != nxt else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self.literals = list(literals)
+
+    def _delta(self, state: int, ch: str) -> int:
+        goto, fail = self._goto, self._fail
+        s = state
+        while True:
+            nxt = goto[s].get(ch)
+            if nxt is not None:
+                break
+            if s == 0:
+                nxt = 0
+                break
+            s = fail[s]
+        goto[state][ch] = nxt
+        return nxt
+
+    def find(self, folded: str) -> set:
+        goto, out = self._goto, self._out
+        found: set = set()
+        state = 0
+        for ch in folded:
+            nxt = goto[state].get(ch)
+            state = self._delta(state, ch) if nxt is None else nxt
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class PatternScanner:
+    """Mehrere Patterns je Label -> ein Scan pro Text.
+
+    ``patterns`` bildet Label (Marker-ID) auf ein Pattern oder eine Liste von
+    Patterns ab; Strings werden mit ``flags`` kompiliert, bereits kompilierte
+    Patterns behalten ihre eigenen Flags. Ein Label feuert, sobald eines
+    seiner Patterns irgendwo im Text matcht.
+
+    Die kombinierbaren Patterns werden in Blöcke zu ``chunk_size`` Alternativen
+    gebündelt, jeder Block zusätzlich als Binärbaum kleinerer Alternationen.
+    Matcht ein Knoten nicht, ist für alle seine Patterns bewiesen, dass sie
+    nirgends matchen; nur bei einem Treffer wird in die Hälften abgestiegen.
+    Das hält das Ergebnis exakt, auch bei überlappenden Treffern, und kostet
+    bei wenigen Treffern nur O(Treffer · log chunk_size) zusätzliche Suchen.
+
+    Mit ``prefilter=True`` laufen Patterns mit Pflicht-Literalen nicht über
+    die Blöcke, sondern nur dann, wenn der Literal-Prefilter eines ihrer
+    Literale im Text gefunden hat. ``stats()`` meldet, wie viele
+    Regex-Auswertungen dadurch entfallen sind.
+    """
+
+    def __init__(self,
+                 patterns: Mapping[str, Union[PatternSource, Sequence[PatternSource]]],
+                 flags: int = re.IGNORECASE,
+                 chunk_size: int = 16,
+                 prefilter: bool = True):
+        self.labels: List[str] = []
+        self._compiled: List[Pattern] = []
+        self._owner: List[int] = []              # Pattern-Index -> Label-Index
+        fragments: List[Tuple[int, int, str]] = []   # (pattern_idx, flags, fragment)
+        standalone: List[int] = []
+        literal_ids: Dict[str, int] = {}
+        lit_patterns: List[List[int]] = []      # Literal-Index -> Pattern-Indizes
+
+        for label, pats in patterns.items():
+            if isinstance(pats, (str, Pattern)):
+                pats = [pats]
+            lab_idx = len(self.labels)
+            self.labels.append(label)
+            for pat in pats:
+                if isinstance(pat, Pattern):
+                    creg, src, pflags = pat, pat.pattern, pat.flags
+                else:
+                    creg, src, pflags = re.compile(pat, flags), pat, flags
+                if not isinstance(src, str):
+                    continue  # bytes-Patterns passen nicht auf Text
+                p_idx = len(self._compiled)
+                self._compiled.append(creg)
+                self._owner.append(lab_idx)
+                req = required_literals(src, pflags) if prefilter else None
+                if req:
+                    for lit in req:
+                        lid = literal_ids.setdefault(lit, len(literal_ids))
+                        if lid == len(lit_patterns):
+                            lit_patterns.append([])
+                        lit_patterns[lid].append(p_idx)
+                    continue
+                frag = _fragment(src, pflags)
+                if frag is None:
+                    standalone.append(p_idx)
+                else:
+                    fragments.append((p_idx, pflags & ~(re.IGNORECASE | re.MULTILINE | re.DOTALL), frag))
+
+        self._chunks: List[tuple] = []
+        self._standalone: Tuple[int, ...] = tuple(standalone)
+        self._build_chunks(fragments, max(1, int(chunk_size)))
+
+        self._prefilter: Optional[LiteralPrefilter] = (
+            LiteralPrefilter(list(literal_ids)) if literal_ids else None)
+        self._lit_patterns: Tuple[Tuple[int, ...], ...] = tuple(tuple(p) for p in lit_patterns)
+        self._n_gated = len({p for pats in lit_patterns for p in pats})
+        self._corpus_rx: Optional[Tuple[list, list]] = None   # lazy, siehe scan_corpus
+        self.reset_stats()
+
+    def _build_node(self, block, base_flags):
+        """Knoten (regex, Label-Indizes, Kinder); Blätter nutzen das Einzelpattern."""
+        labels = frozenset(self._owner[p_idx] for p_idx, _ in block)
+        if len(block) == 1:
+            return (self._compiled[block[0][0]], labels, ())
+        mid = len(block) // 2
+        children = (self._build_node(block[:mid], base_flags),
+                    self._build_node(block[mid:], base_flags))
+        alt = "|".join(frag for _, frag in block)
+        try:
+            creg = re.compile(alt, base_flags)
+        except (re.error, OverflowError, RecursionError):
+            creg = None   # Knoten überspringen, direkt in die Kinder
+        return (creg, labels, children)
+
+    def _build_chunks(self, fragments, chunk_size):
+        by_flags: Dict[int, List[Tuple[int, str]]] = {}
+        for p_idx, base_flags, frag in fragments:
+            by_flags.setdefault(base_flags, []).append((p_idx, frag))
+        for base_flags, items in by_flags.items():
+            for start in range(0, len(items), chunk_size):
+                self._chunks.append(self._build_node(items[start:start + chunk_size], base_flags))
+
+    # ----------------------------------------------------------
+    def _descend(self, node, text, fired):
+        creg, labels, children = node
+        if labels <= fired:
+            return
+        if creg is not None and creg.search(text) is None:
+            return
+        if not children:
+            fired |= labels
+            return
+        for child in children:
+            self._descend(child, text, fired)
+
+    def _gated(self, text: str, fired: set):
+        """Patterns mit Pflicht-Literalen: nur die Kandidaten des Prefilters prüfen."""
+        compiled, owner = self._compiled, self._owner
+        candidates: set = set()
+        lit_patterns = self._lit_patterns
+        for lid in self._prefilter.find(fold(text)):
+            candidates.update(lit_patterns[lid])
+        evaluated = 0
+        for p_idx in candidates:
+            lab = owner[p_idx]
+            if lab in fired:
+                continue
+            evaluated += 1
+            if compiled[p_idx].search(text):
+                fired.add(lab)
+        self._n_evaluated += evaluated
+
+    def fired_indices(self, text: str) -> set:
+        """Label-Indizes aller gefeuerten Labels."""
+        fired: set = set()
+        compiled, owner = self._compiled, self._owner
+        if self._prefilter is not None:
+            self._gated(text, fired)
+        self._n_texts += 1
+        for node in self._chunks:
+            self._descend(node, text, fired)
+        for p_idx in self._standalone:
+            lab = owner[p_idx]
+            if lab not in fired and compiled[p_idx].search(text):
+                fired.add(lab)
+        return fired
+
+    def scan(self, text: str) -> List[str]:
+        """Gefeuerte Labels (Menge), in Definitionsreihenfolge geliefert."""
+        labels = self.labels
+        return [labels[i] for i in sorted(self.fired_indices(text))]
+
+    def _corpus_regexes(self) -> Tuple[list, list]:
+        """Korpus-Varianten der Block-Wurzeln und Einzel-Patterns (None = je Text suchen)."""
+        if self._corpus_rx is None:
+            chunks = [corpus_regex(node[0].pattern, node[0].flags) if node[0] is not None else None
+                      for node in self._chunks]
+            standalone = [corpus_regex(self._compiled[p].pattern, self._compiled[p].flags)
+                          for p in self._standalone]
+            self._corpus_rx = (chunks, standalone)
+        return self._corpus_rx
+
+    def scan_corpus(self, texts: Sequence[str]) -> List[List[str]]:
+        """scan() für viele Texte in einem Durchgang; ein Ergebnis je Text, gleiche Reihenfolge.
+
+        Die Texte werden mit CORPUS_SEP zu einem Puffer verkettet, ``starts``
+        hält die Offsets, ``bisect`` bildet Fundstellen auf Texte ab. Der
+        Blöcke und Einzel-Patterns ohne Pflicht-Literal suchen je einmal im
+        Puffer und springen nach jedem Kandidaten zum nächsten Text; Kandidaten
+        werden im Text selbst geprüft. Patterns mit Pflicht-Literalen laufen
+        weiter über den Prefilter je Text – ein Aho-Corasick-Durchlauf kostet
+        unabhängig von der Literalzahl, ``str.find`` je Literal über den
+        Puffer dagegen nicht. Das Ergebnis ist identisch zu
+        ``[scan(t) for t in texts]``.
+        """
+        texts = list(texts)
+        n = len(texts)
+        if not n:
+            return []
+        starts: List[int] = []
+        pos = 0
+        for text in texts:
+            starts.append(pos)
+            pos += len(text) + len(CORPUS_SEP)
+        buf = CORPUS_SEP.join(texts)
+        fired: Dict[int, set] = {}     # nur Texte mit Treffern
+        compiled, owner = self._compiled, self._owner
+
+        if self._prefilter is not None:
+            for k, text in enumerate(texts):
+                got: set = set()
+                self._gated(text, got)
+                if got:
+                    fired[k] = got
+        self._n_texts += n
+
+        chunk_rx, standalone_rx = self._corpus_regexes()
+        for node, rx in zip(self._chunks, chunk_rx):
+            ks = _corpus_candidates(rx, buf, starts) if rx is not None else range(n)
+            for k in ks:
+                got = fired.setdefault(k, set())
+                self._descend(node, texts[k], got)
+        for p_idx, rx in zip(self._standalone, standalone_rx):
+            lab = owner[p_idx]
+            ks = _corpus_candidates(rx, buf, starts) if rx is not None else range(n)
+            for k in ks:
+                got = fired.get(k)
+                if (got is None or lab not in got) and compiled[p_idx].search(texts[k]):
+                    fired.setdefault(k, set()).add(lab)
+
+        labels = self.labels
+        return [[labels[i] for i in sorted(fired[k])] if k in fired else [] for k in range(n)]
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+    def fingerprint(self) -> str:
+        """Stabiler Hash über Labels, Patterns und Flags – für Caches, die Treffer speichern."""
+        h = hashlib.sha1()
+        for owner, rx in zip(self._owner, self._compiled):
+            h.update(f"{self.labels[owner]}\0{rx.pattern}\0{rx.flags}\n".encode("utf-8", "surrogatepass"))
+        return h.hexdigest()
+
+    # ----------------------------------------------------------
+    def reset_stats(self):
+        self._n_texts = 0
+        self._n_evaluated = 0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Prefilter-Bilanz seit dem letzten reset_stats().
+
+        ``skipped`` zählt Regex-Auswertungen, die eine naive Schleife über alle
+        Patterns gemacht hätte und die der Prefilter eingespart hat;
+        ``skip_ratio`` bezieht sich auf alle Patterns × Texte.
+        """
+        total = self._n_texts * len(self._compiled)
+        skipped = self._n_texts * self._n_gated - self._n_evaluated
+        return {
+            "texts": self._n_texts,
+            "patterns": len(self._compiled),
+            "prefiltered_patterns": self._n_gated,
+            "literals": len(self._prefilter.literals) if self._prefilter else 0,
+            "regex_evaluations": total - skipped,
+            "skipped": skipped,
+            "skip_ratio": (skipped / total) if total else 0.0,
+        }
+
+
+def scan_loop(patterns: Mapping[str, Union[str, Sequence[str]]], text: str,
+              flags: int = re.IGNORECASE) -> List[str]:
+    """Referenz: die klassische Schleife über alle Patterns (für Vergleich/Benchmark)."""
+    out = []
+    for label, pats in patterns.items():
+        if isinstance(pats, str):
+            pats = [pats]
+        for pat in pats:
+            if re.search(pat, text, flags):
+                out.append(label)
+                break
+    return out
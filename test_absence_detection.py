@@ -75,5 +75,137 @@ def test_absence_detection():
     print(f"\n✅ Gesamtergebnis: {len(all_hits)} Hits ({len(hits)} original + {len(synthetic_hits)} synthetisch)")
     return all_hits
 
+def _reference_window(i, j, seg_msgs, seg_hits, P, E_SET):
+    """Ursprüngliche Set/Counter-Auswertung eines Fensters (Referenz für die Bitmasken)"""
+    from collections import Counter
+    if sum(h["marker"] in E_SET for h in seg_hits) < P["min_E"]:
+        return []
+    if sum(len(m["text"].split()) for m in seg_msgs) < P["min_tokens"]:
+        return []
+    ok = lambda c: c == 0 if P["strict_zero"] else c <= P["tolerant_max"]
+    out = [{"i": j-1, "speaker": "WINDOW", "marker": "CONFLICT_CONTEXT"}]
+    mcount = Counter(h["marker"] for h in seg_hits)
+    out += [{"i": j-1, "speaker": "BOTH", "marker": f"MEMA_ABSENCE_OF_{name.upper()}_IN_CONFLICT"}
+            for name, s in P["ABS"].items() if ok(sum(mcount[m] for m in s))]
+    if P["per_speaker"]:
+        part = Counter(m["speaker"] for m in seg_msgs)
+        for spk in dict.fromkeys(h["speaker"] for h in seg_hits):
+            if part.get(spk, 0) < P["min_participation"]:
+                continue
+            scount = Counter(h["marker"] for h in seg_hits if h["speaker"] == spk)
+            out += [{"i": j-1, "speaker": spk, "marker": f"MEMA_SPKR_ABSENCE_OF_{name.upper()}_IN_CONFLICT"}
+                    for name, s in P["ABS"].items() if ok(sum(scount[m] for m in s))]
+    return out
+
+
+def _columns(hits):
+    """Hit-Dicts als Spalten (i/spk/mk + speakers/markers), wie analyze_chat.HitTable."""
+    import numpy as np
+    from types import SimpleNamespace
+    speakers, markers = {}, {}
+    return SimpleNamespace(
+        i=np.array([h["i"] for h in hits], dtype=np.int32),
+        spk=np.array([speakers.setdefault(h["speaker"], len(speakers)) for h in hits], dtype=np.int32),
+        mk=np.array([markers.setdefault(h["marker"], len(markers)) for h in hits], dtype=np.int32),
+        speakers=list(speakers), markers=list(markers))
+
+
+def test_prefix_counts_match_block_windows():
+    """AbsenceCounts liefert exakt die Hits der klassischen Blockfenster-Schleife"""
+    import random
+    from DETECT_absence_meta import (_collect_by_window, _window_bounds, absence_params, evaluate_absence_window,
+                                     AbsenceBitCounts, AbsenceCounts)
+
+    rng = random.Random(2)
+    E_SET = {"ATO_E", "ATO_INSULT"}
+    tag_index = {"insult": {"ATO_INSULT"}, "threat": {"ATO_THREAT"}}
+    for strict in (True, False):
+        cfg = {"window": {"messages": 6}, "gating_conflict": {"min_E_hits": 2},
+               "absence_sets": {"derogation": {"tags": ["insult"]}, "threat": {"tags": ["threat"], "ids": ["ATO_INSULT"]}},
+               "policy": {"strict_zero": strict, "tolerant_max": 1, "min_tokens": 8}}
+        P = absence_params(cfg, tag_index)
+        for _ in range(60):
+            n = rng.randint(0, 40)
+            msgs = [{"i": k, "speaker": rng.choice("ABC"), "text": " ".join(["wort"] * rng.randint(0, 4))}
+                    for k in range(n)]
+            hits = sorted(({"i": rng.randrange(-1, n + 1), "speaker": rng.choice("ABCD"),
+                            "marker": rng.choice(["ATO_E", "ATO_INSULT", "ATO_THREAT", "ATO_X"])}
+                           for _ in range(rng.randint(0, 3 * n + 1))), key=lambda h: h["i"])
+            ref = [x for i, j, sm, sh in _collect_by_window(msgs, hits, P["window"])
+                   for x in _reference_window(i, j, sm, sh, P, E_SET)]
+            assert detect_absence_meta(msgs, hits, cfg, tag_index, {}, E_SET) == ref
+            # dieselben Hits spaltenweise (wie analyze_chat.HitTable), ohne Hit-Dicts
+            cols = _columns(hits)
+            assert detect_absence_meta(msgs, cols, cfg, tag_index, {}, E_SET) == ref
+            assert [x for i, j in _window_bounds(n, P["window"])
+                    for x in AbsenceBitCounts(msgs, cols, P, E_SET).evaluate(i, j)] == ref
+            counts = AbsenceCounts(msgs, hits, P, E_SET)
+            bits = AbsenceBitCounts(msgs, hits, P, E_SET)   # Variante für viele Sets, gleiche Ergebnisse
+            for i in range(0, n, 3):   # beliebige (auch überlappende) Fenster
+                j = min(n, i + 7)
+                seg = [h for h in hits if i <= h["i"] < j]
+                ref = _reference_window(i, j, msgs[i:j], seg, P, E_SET)
+                assert counts.evaluate(i, j) == evaluate_absence_window(i, j, msgs[i:j], seg, P, E_SET) == ref
+                assert bits.evaluate(i, j) == ref
+            # unsortierte Hits: Rückfall auf die Blockfenster-Schleife
+            rng.shuffle(hits)
+            ref = [x for i, j, sm, sh in _collect_by_window(msgs, hits, P["window"])
+                   for x in _reference_window(i, j, sm, sh, P, E_SET)]
+            assert detect_absence_meta(msgs, hits, cfg, tag_index, {}, E_SET) == ref
+            assert detect_absence_meta(msgs, _columns(hits), cfg, tag_index, {}, E_SET) == ref
+
+
+def test_marker_bits_many_groups():
+    """Marker in mehreren Sets, leere Sets, unbekannte Marker; viele Gruppen in einer Summe"""
+    from DETECT_absence_meta import MarkerBits
+    sets = {f"g{k}": {f"ATO_{k}", f"ATO_{k + 1}"} for k in range(40)}
+    sets["leer"] = set()
+    bits = MarkerBits(sets, E_SET={"ATO_0", "ATO_E"})
+    counts = bits.counts(["ATO_1", "ATO_1", "ATO_E", "ATO_UNBEKANNT"])
+    assert counts.tolist() == [2, 2] + [0] * 39 + [1]
+    assert bits.member.shape == (len(bits.bit) + 1, len(sets) + 1)   # Sets + E, keine tote Spalte
+    P = {"strict_zero": True, "tolerant_max": 1}
+    assert bits.absent(counts, P) == [f"g{k}" for k in range(2, 40)] + ["leer"]
+    assert bits.absent(counts, dict(P, strict_zero=False)) == bits.absent(counts, P)
+    assert bits.absent(counts - 1, dict(P, strict_zero=False)) == list(sets)
+
+    # ab BITS_MIN_SETS Sets wählt build() die Bitmatrix, darunter die Listen-Variante
+    from DETECT_absence_meta import BITS_MIN_SETS, AbsenceBitCounts, AbsenceCounts
+    msgs = [{"i": 0, "speaker": "A", "text": "x"}]
+    few = {"ABS": {f"g{k}": set() for k in range(BITS_MIN_SETS - 1)}}
+    many = {"ABS": {f"g{k}": set() for k in range(BITS_MIN_SETS)}}
+    assert type(AbsenceCounts.build(msgs, [], few, set())) is AbsenceCounts
+    assert type(AbsenceCounts.build(msgs, [], many, set())) is AbsenceBitCounts
+
+
+
+def test_online_detector_matches_offline_windows():
+    """push() je Nachricht liefert dieselben Hits wie detect_absence_meta, Block- und gleitend"""
+    import random
+    from DETECT_absence_meta import OnlineAbsenceDetector
+
+    rng = random.Random(4)
+    E_SET = {"ATO_E"}
+    tag_index = {"insult": {"ATO_INSULT"}}
+    for step in (None, 2, 5, 9):
+        cfg = {"window": {"messages": 5, "step": step}, "gating_conflict": {"min_E_hits": 2},
+               "absence_sets": {"derogation": {"tags": ["insult"]}}, "policy": {"min_tokens": 4}}
+        for _ in range(40):
+            n = rng.randint(0, 30)
+            msgs = [{"i": k, "speaker": rng.choice("AB"), "text": "ein paar worte"} for k in range(n)]
+            per_msg = [[{"i": k, "speaker": m["speaker"], "marker": rng.choice(["ATO_E", "ATO_INSULT", "ATO_X"])}
+                        for _ in range(rng.randint(0, 2))] for k, m in enumerate(msgs)]
+            hits = [h for hs in per_msg for h in hs]
+            det = OnlineAbsenceDetector(cfg, tag_index, E_SET)
+            online = []
+            for m, hs in zip(msgs, per_msg):
+                got = det.push(m, hs)
+                assert all(h["i"] == m["i"] for h in got)   # sofort beim Schließen des Fensters
+                online += got
+            online += det.finish()
+            assert online == detect_absence_meta(msgs, hits, cfg, tag_index, {}, E_SET)
+            assert len(det._buf) <= 5
+
+
 if __name__ == "__main__":
     test_absence_detection()
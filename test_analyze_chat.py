@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests für analyze_chat.py (Ressourcen-Laden, Matching, HitTable, Fenster, Charts, Report, Themen, Batch, Streaming, Inkrementell)
+"""
+
+import base64
+import json
+import zipfile
+
+import yaml
+
+import analyze_chat
+from analyze_chat import ZipIndex
+
+
+def _write_zip(path, members):
+    with zipfile.ZipFile(path, "w") as z:
+        for name, data in members.items():
+            z.writestr(name, data)
+
+
+def test_zip_index_parses_once_and_uses_disk_cache(tmp_path, monkeypatch):
+    zp = tmp_path / "markers.zip"
+    cache = tmp_path / "cache"
+    _write_zip(zp, {
+        "m/ATO_A.yaml": yaml.safe_dump({"id": "ATO_A", "pattern": "immer"}),
+        "m/ATO_B.yml": yaml.safe_dump({"id": "ATO_B", "pattern": "nie"}),
+        "m/empty.yaml": "",
+        "weights.json": '{"marker_weights": {"ATO_A": 2.0}}',
+    })
+    with ZipIndex(zp, cache) as z:
+        docs = z.yaml_docs()
+        assert [d["id"] for d in docs] == ["ATO_A", "ATO_B"]
+        assert z.yaml_docs() is docs
+        assert z.text("weights.json") == '{"marker_weights": {"ATO_A": 2.0}}'
+
+    # zweiter Lauf: kein YAML-Parsing mehr
+    def boom(*a, **kw):
+        raise AssertionError("YAML wurde erneut geparst")
+    monkeypatch.setattr(analyze_chat.yaml, "safe_load", boom)
+    with ZipIndex(zp, cache) as z:
+        assert [d["id"] for d in z.yaml_docs()] == ["ATO_A", "ATO_B"]
+    monkeypatch.undo()
+
+    # geändertes Archiv -> anderer Schlüssel -> neu parsen
+    _write_zip(zp, {"m/ATO_C.yaml": yaml.safe_dump({"id": "ATO_C", "pattern": "doch"})})
+    with ZipIndex(zp, cache) as z:
+        assert [d["id"] for d in z.yaml_docs()] == ["ATO_C"]
+
+    # andere Cache-Formatversion -> alter Eintrag wird ignoriert
+    calls = []
+    monkeypatch.setattr(analyze_chat, "PARSE_CACHE_VERSION", analyze_chat.PARSE_CACHE_VERSION + 1)
+    monkeypatch.setattr(analyze_chat.yaml, "safe_load", lambda data: calls.append(data) or {"id": "X"})
+    with ZipIndex(zp, cache) as z:
+        assert [d["id"] for d in z.yaml_docs()] == ["X"]
+    assert len(calls) == 1
+
+
+def test_zip_cache_is_opt_in():
+    ap = analyze_chat.build_arg_parser()
+    base = ["--input", "chat.txt"]
+    resolve = lambda argv: analyze_chat.parse_cache_dir(ap.parse_args(argv))
+    assert resolve(base) is None
+    assert resolve(base + ["--cache"]) == analyze_chat.PARSE_CACHE_DIR
+    assert str(resolve(base + ["--cache-dir", "c"])) == "c"
+    assert resolve(base + ["--cache", "--no-cache"]) is None
+
+
+def test_zip_index_missing_archive(tmp_path):
+    with ZipIndex(tmp_path / "fehlt.zip", tmp_path / "cache") as z:
+        assert z.names == []
+        assert z.yaml_docs() == []
+        assert z.text("weights.json") is None
+
+
+def test_match_markers_one_hit_per_message_and_marker():
+    import re
+    msgs = analyze_chat.chunk_messages("A: immer immer\nB: nichts\nA: nie und immer\nB: ?!?!")
+    markers = {"ATO_ABS": re.compile(r"\bimmer\b|\bnie\b", re.I),
+               "ATO_PUNCT": re.compile(r"[!?]{3,}")}
+    assert analyze_chat.match_markers(msgs, markers) == [
+        {"i": 0, "speaker": "A", "marker": "ATO_ABS"},
+        {"i": 2, "speaker": "A", "marker": "ATO_ABS"},
+        {"i": 3, "speaker": "B", "marker": "ATO_PUNCT"},
+    ]
+
+
+def test_window_index_matches_per_window_filter():
+    import random
+    rng = random.Random(4)
+    E_SET, D_SET = {"ATO_E1", "ATO_E2"}, {"ATO_D1"}
+    markers = ["ATO_E1", "ATO_E2", "ATO_D1", "ATO_X"]
+    n = 97
+    hits = [{"i": rng.randrange(-2, n + 2), "speaker": "A", "marker": rng.choice(markers)}
+            for _ in range(400)]
+    idx = analyze_chat.WindowIndex(n, hits, E_SET, D_SET)
+    for win, step in [(10, None), (7, 3), (20, 1), (200, None)]:
+        for i, j, e, d in idx.windows(win, step):
+            seg = [h for h in hits if i <= h["i"] < j]
+            assert e == sum(1 for h in seg if h["marker"] in E_SET)
+            assert d == sum(1 for h in seg if h["marker"] in D_SET)
+            assert idx.count("ATO_X", i, j) == sum(1 for h in seg if h["marker"] == "ATO_X")
+
+
+def test_rolling_windows_step():
+    assert list(analyze_chat.rolling_windows(10, 4)) == [(0, 4), (4, 8), (8, 10)]
+    assert list(analyze_chat.rolling_windows(10, 4, step=3)) == [(0, 4), (3, 7), (6, 10)]
+    assert list(analyze_chat.rolling_windows(0, 4)) == []
+
+
+THEMES = {"themes": {
+    "konflikt": {"label": "Konflikt", "narratives": {"streit": 0.6}, "primary_axes": {"Defensive": 0.4}},
+    "ausgleich": {"label": "Ausgleich", "narratives": {"fehlt": 1.0}, "primary_axes": {"Deeskalation": 0.8}},
+    "leer": None,
+}}
+TO_NARR = {"ATO_E": "streit", "ATO_X": "streit"}
+TO_PRIMARY = {"ATO_E": "Defensive", "ATO_D": "Deeskalation", "ATO_Q": "Misstrauen"}
+
+
+def _theme_reference(counts):
+    """Alte Schleifen-Variante von theme_resonance() als Referenz."""
+    from collections import Counter
+    narr, prim = Counter(), Counter()
+    for mid, c in counts.items():
+        if mid in TO_NARR: narr[TO_NARR[mid]] += c
+        if mid in TO_PRIMARY: prim[TO_PRIMARY[mid]] += c
+    total = sum(narr.values()) + sum(prim.values()) or 1
+    scores = {}
+    for key, cfg in THEMES["themes"].items():
+        cfg = cfg or {}
+        scores[key] = (sum(w * narr[n] / total for n, w in (cfg.get("narratives") or {}).items())
+                       + sum(w * prim[a] / total for a, w in (cfg.get("primary_axes") or {}).items()))
+    return scores, {k: v / total for k, v in narr.items()}, {k: v / total for k, v in prim.items()}
+
+
+def test_theme_matrix_matches_loop_and_window_trajectory():
+    import math
+    import random
+    from collections import Counter
+    rng = random.Random(6)
+    n = 61
+    hits = [{"i": rng.randrange(n), "speaker": "A", "marker": rng.choice(["ATO_E", "ATO_D", "ATO_X", "ATO_Q", "ATO_Z"])}
+            for _ in range(150)]
+    TM = analyze_chat.ThemeMatrix(THEMES, TO_NARR, TO_PRIMARY, ["Misstrauen"])
+    res = TM.resonance(analyze_chat.HitTable.of(hits))
+    scores, narr, prim = _theme_reference(Counter(h["marker"] for h in hits))
+    assert res["theme_key"] == "konflikt" and res["theme_label"] == "Konflikt"
+    assert res["narr_score"] == narr and res["prim_score"] == prim
+    # Schlüsselreihenfolge wie in der Schleife: erster Treffer zuerst, nicht Achsenreihenfolge
+    assert list(res["prim_score"]) == list(prim)
+    first = TM.resonance([{"marker": "ATO_Q"}, {"marker": "ATO_D"}, {"marker": "ATO_E"}])
+    assert list(first["prim_score"]) == ["Misstrauen", "Deeskalation", "Defensive"]
+    assert all(math.isclose(res["theme_scores"][k], v, abs_tol=1e-12) for k, v in scores.items())
+
+    idx = analyze_chat.WindowIndex(n, hits, set(), set())
+    for win, step in [(10, None), (7, 3)]:
+        traj = TM.trajectory(idx.category_counts(TM.feature_lookup(idx.markers), TM.n_features, win, step))
+        assert [(i, j) for i, j, _ in traj] == list(analyze_chat.rolling_windows(n, win, step))
+        for i, j, sc in traj:
+            ref, _, _ = _theme_reference(Counter(h["marker"] for h in hits if i <= h["i"] < j))
+            assert all(math.isclose(sc[k], v, abs_tol=1e-12) for k, v in ref.items())
+
+    # ohne Themen: stärkste Primärachse, ohne Treffer: Unbestimmt
+    TM = analyze_chat.ThemeMatrix({}, TO_NARR, TO_PRIMARY)
+    assert TM.resonance([{"marker": "ATO_D"}] * 2 + [{"marker": "ATO_Q"}])["theme_key"] == "Deeskalation"
+    # Gleichstand: die zuerst getroffene Achse gewinnt
+    assert TM.resonance([{"marker": "ATO_Q"}, {"marker": "ATO_D"}])["theme_key"] == "Misstrauen"
+    assert TM.resonance([{"marker": "ATO_D"}, {"marker": "ATO_Q"}])["theme_key"] == "Deeskalation"
+    assert TM.resonance([])["theme_key"] == "Unbestimmt"
+
+
+def test_chart_specs_render_serial_pooled_and_client_side():
+    specs = {
+        "ed": analyze_chat.spec_ed_bars(3, 5),
+        "tops:A": analyze_chat.spec_top_markers("A", [{"marker": "ATO_X"}] * 2, {"ATO_X": "X"}),
+        "empty": analyze_chat.spec_donut({}, "leer"),
+    }
+    serial = analyze_chat.render_charts(specs, "svg", jobs=1)
+    assert serial["empty"] is None
+    assert base64.b64decode(serial["ed"]).lstrip().startswith(b"<?xml")
+    pooled = analyze_chat.render_charts(specs, "png", jobs=2)
+    assert list(pooled) == list(specs) and pooled["ed"] == analyze_chat.render_chart(specs["ed"])
+
+    html = analyze_chat.render_html_report(
+        "<html><body><img src='{{img:ed}}'/></body></html>",
+        {"images": {"ed": ""}, "image_format": "spec", "chart_specs": {"ed": specs["ed"]}})
+    assert "<img src='#chart:ed'/>" in html
+    assert 'id="chart-specs">' in html and html.endswith("</body></html>")
+
+
+def test_batch_mode_writes_per_chat_results_and_summary(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "report_template.html").write_text("<html><body>{{text:overview}}</body></html>")
+    _write_zip(tmp_path / "markers.zip", {
+        "m/ATO_ABS.yaml": yaml.safe_dump({"id": "ATO_ABS", "pattern": r"\bimmer\b"}),
+    })
+    chats = tmp_path / "chats"
+    (chats / "team").mkdir(parents=True)
+    (chats / "a.txt").write_text("A: immer\nB: nie\nA: immer wieder")
+    (chats / "team" / "b.txt").write_text("C: hallo\nD: immer")
+    args = analyze_chat.build_arg_parser().parse_args([
+        "--input-dir", str(chats), "--glob", "**/*.txt", "-o", "out", "-j", "1",
+        "--zip-markers", "markers.zip", "--zip-schema", "fehlt.zip", "--zip-detectors", "fehlt.zip",
+        "--no-cache", "--charts", "spec"])
+    summary = analyze_chat.run_batch(args)
+    assert summary["chats"] == 2 and summary["failed"] == 0
+    assert summary["messages"] == 5 and summary["top_markers"] == {"ATO_ABS": 3}
+    assert [r["chat"] for r in summary["per_chat"]] == [str(chats / "a.txt"), str(chats / "team" / "b.txt")]
+    assert len(json.loads((tmp_path / "out" / "team" / "b" / "results.json").read_text())["hits"]) == 1
+    assert (tmp_path / "out" / "corpus_summary.json").exists()
+
+
+def _absence_chat(tmp_path, monkeypatch, n=157, seed=8):
+    """Kleines Setup mit Absence-Treffern: (args, Resources, Chat-Zeilen)."""
+    import random
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "report_template.html").write_text("<html><body>{{text:overview}}</body></html>")
+    _write_zip(tmp_path / "markers.zip", {
+        "m/ATO_E.yaml": yaml.safe_dump({"id": "ATO_E", "pattern": r"\bimmer\b"}),
+        "m/ATO_D.yaml": yaml.safe_dump({"id": "ATO_D", "pattern": r"\bsorry\b"}),
+        "m/ATO_X.yaml": yaml.safe_dump({"id": "ATO_X", "pattern": r"\bidiot\b"}),
+    })
+    rng = random.Random(seed)
+    words = ["immer", "sorry", "idiot", "und", "dann", "ja"]
+    lines = [f"{rng.choice('AB')}: " + " ".join(rng.choice(words) for _ in range(rng.randint(1, 6)))
+             for _ in range(n)]
+    args = analyze_chat.build_arg_parser().parse_args([
+        "-i", "chat.txt", "--zip-markers", "markers.zip", "--zip-schema", "fehlt.zip",
+        "--zip-detectors", "fehlt.zip", "--no-cache", "--charts", "spec", "--window", "9", "--step", "4"])
+    R = analyze_chat.load_resources(args)
+    R.ed_sets = {"ATO_E"}, {"ATO_D", "MEMA_ABSENCE_OF_INSULT_IN_CONFLICT"}
+    R.marker_to_primary = dict(TO_PRIMARY, MEMA_ABSENCE_OF_INSULT_IN_CONFLICT="Deeskalation")
+    R.marker_to_narr, R.themes_map = TO_NARR, THEMES
+    R.weights = {"marker_weights": {"ATO_E": 2.5, "ATO_X": 0.5}}
+    R.compile_tables()
+    R.absence_config = {"window": {"messages": 7}, "gating_conflict": {"min_E_hits": 2},
+                        "policy": {"min_tokens": 3}, "absence_sets": {"insult": {"ids": ["ATO_X"]}}}
+    return args, R, lines
+
+
+def test_stream_mode_matches_in_memory_analysis(tmp_path, monkeypatch):
+    args, R, lines = _absence_chat(tmp_path, monkeypatch)
+    (tmp_path / "chat.txt").write_text("\r\n".join(lines) + "\n\n  \n")
+
+    monkeypatch.setattr(analyze_chat, "STREAM_BATCH", 10)
+    full = analyze_chat.analyze_one((tmp_path / "chat.txt").read_text(), R, tmp_path / "full", args)
+    args.stream = True
+    streamed = analyze_chat.analyze_stream(tmp_path / "chat.txt", R, tmp_path / "stream", args)
+
+    a = json.loads((tmp_path / "full" / "results.json").read_text())
+    b = json.loads((tmp_path / "stream" / "results.json").read_text())
+    assert any(h["marker"].startswith("MEMA_") for h in a["hits"])
+    for key in ("prim_counts", "E", "D", "theme", "theme_trajectory"):
+        assert a[key] == b[key], key
+    assert len(a["theme_trajectory"]) == 38
+    assert b["n_messages"] == len(a["messages"]) == 157
+    assert abs(a["weighted_sum"] - b["weighted_sum"]) < 1e-9
+    key = lambda h: (h["i"], h["speaker"], h["marker"])
+    lines = (tmp_path / "stream" / "hits.ndjson").read_text().splitlines()
+    assert sorted(map(json.loads, lines), key=key) == sorted(a["hits"], key=key)
+    assert (json.loads((tmp_path / "full" / "charts.json").read_text())
+            == json.loads((tmp_path / "stream" / "charts.json").read_text()))
+    drop = ("report", "results", "reused_messages")
+    assert {k: v for k, v in full.items() if k not in drop} == {k: v for k, v in streamed.items() if k not in drop}
+
+    # gleitende Absence-Fenster (window.step) im Online-Detektor
+    R.absence_config["window"]["step"] = 3
+    analyze_chat.analyze_one((tmp_path / "chat.txt").read_text(), R, tmp_path / "full3", args)
+    analyze_chat.analyze_stream(tmp_path / "chat.txt", R, tmp_path / "stream3", args)
+    a = json.loads((tmp_path / "full3" / "results.json").read_text())["hits"]
+    b = [json.loads(x) for x in (tmp_path / "stream3" / "hits.ndjson").read_text().splitlines()]
+    assert sorted(b, key=key) == sorted(a, key=key) and len(b) > len(lines)   # mehr Fenster als Blöcke
+
+
+def test_hit_table_groupbys_match_dict_hits():
+    import random
+    from collections import Counter
+    rng = random.Random(9)
+    hits = [{"i": k // 2, "speaker": rng.choice("ABC"), "marker": rng.choice(["ATO_E", "ATO_D", "ATO_X", "SEM_Y"])}
+            for k in range(300)]
+    t = analyze_chat.HitTable.of(hits)
+    assert t.nbytes == 12 * len(hits)
+    assert t.to_dicts() == hits
+    assert list(t.marker_counts().items()) == list(Counter(h["marker"] for h in hits).items())
+    per = t.speaker_marker_counts()
+    ref = {s: Counter(h["marker"] for h in hl) for s, hl in analyze_chat.hits_by_speaker(hits).items()}
+    assert list(per) == list(ref) and all(list(per[s].items()) == list(ref[s].items()) for s in ref)
+    assert t.speaker_groups() == dict(analyze_chat.hits_by_speaker(hits))
+    assert analyze_chat.ed_counts(t, {"ATO_E"}, {"ATO_D", "SEM_Y"}) == (
+        sum(h["marker"] == "ATO_E" for h in hits), sum(h["marker"] in ("ATO_D", "SEM_Y") for h in hits))
+    w = {"marker_weights": {"ATO_E": 2.5, "ATO_X": 0.1}}
+    assert abs(analyze_chat.weighted_sum(t, w) - sum(w["marker_weights"].get(h["marker"], 1.0) for h in hits)) < 1e-9
+    t2 = t.concat([{"i": 150, "speaker": "WINDOW", "marker": "CONFLICT_CONTEXT"}])
+    assert t2.to_dicts() == hits + [{"i": 150, "speaker": "WINDOW", "marker": "CONFLICT_CONTEXT"}]
+
+
+def _sample_results():
+    msgs = analyze_chat.chunk_messages("A: immer\nB: ok\nA: nie")
+    hits = analyze_chat.HitTable.of([{"i": 0, "speaker": "A", "marker": "ATO_ABS"},
+                                     {"i": 2, "speaker": "A", "marker": "ATO_ABS"}])
+    return {"E": 2, "D": 0}, msgs, hits
+
+
+def test_marker_tables_match_dict_helpers():
+    import random
+    from collections import Counter
+    rng = random.Random(12)
+    hits = [{"i": k, "speaker": "A", "marker": rng.choice(["ATO_E", "ATO_D", "ATO_X", "ATO_Q", "ATO_NEU"])}
+            for k in range(200)]
+    weights = {"marker_weights": {"ATO_E": 2.5, "ATO_X": 0.1, "ATO_D2": 3.0, "ATO_D3": 3.0}}
+    E_SET, D_SET = {"ATO_E", "ATO_Q"}, {"ATO_D", "ATO_D2", "ATO_D3", "ATO_D4"}
+    T = analyze_chat.MarkerTables(["ATO_E", "ATO_D", "ATO_X", "ATO_Q"], weights["marker_weights"], TO_PRIMARY,
+                                  ["Misstrauen"], TO_NARR, E_SET, D_SET)
+    for h in (analyze_chat.HitTable.of(hits), hits, Counter(h["marker"] for h in hits)):
+        prim = T.primary_counts(h)
+        ref = analyze_chat.compute_primary_counts(hits, TO_PRIMARY)
+        assert list(prim.items()) == list(ref.items())
+        assert T.ed(h) == analyze_chat.ed_counts(hits, E_SET, D_SET)
+        assert abs(T.weighted_sum(h) - analyze_chat.weighted_sum(hits, weights)) < 1e-9
+    assert T.d_candidates == ("ATO_D2", "ATO_D3", "ATO_D", "ATO_D4")
+    assert not T.weight.flags.writeable and T.weight[-1] == 1.0 and T.axis[T.code["ATO_X"]] == -1
+    assert T.E_SET == frozenset(E_SET) and isinstance(T.D_SET, frozenset)
+
+    # Vorschläge ohne balance-Eintrag bekommen je eine eigene Liste
+    from types import SimpleNamespace
+    R = SimpleNamespace(actions_map={}, tables=T, marker_labels={})
+    tips = analyze_chat.build_objective_tips({"A": hits}, R)["A"]
+    assert sorted(t["problem_marker"] for t in tips) == ["ATO_E", "ATO_Q"]
+    tips[0]["suggest_markers"].append("ATO_X")
+    assert tips[1]["suggest_markers"] == ["ATO_D2", "ATO_D3", "ATO_D"]
+
+
+def test_write_results_json_and_compressed_ndjson(tmp_path):
+    import gzip
+    summary, msgs, hits = _sample_results()
+    (path,) = analyze_chat.write_results(tmp_path, summary, msgs, hits)
+    dump = json.loads(path.read_text())
+    assert dump["messages"] == msgs and dump["hits"] == hits.to_dicts() and dump["E"] == 2
+    assert dump["per_speaker"] == {"A": hits.to_dicts()}
+
+    paths = analyze_chat.write_results(tmp_path, summary, msgs, hits, fmt="ndjson",
+                                       compress="gzip", omit_texts=True)
+    assert [p.name for p in paths] == ["summary.json", "hits.ndjson.gz", "messages.ndjson.gz"]
+    with gzip.open(paths[1], "rt") as fh:
+        assert [json.loads(line) for line in fh] == hits.to_dicts()
+    with gzip.open(paths[2], "rt") as fh:
+        assert [json.loads(line) for line in fh] == [{"i": m["i"], "speaker": m["speaker"]} for m in msgs]
+    assert json.loads(paths[0].read_text())["n_hits"] == 2
+
+
+def test_write_results_json_from_columns_is_byte_identical(tmp_path):
+    # Spalten-Writer gegen json.dump über das Dict-Layout (Sonderzeichen, leere Listen, Zusammenfassung)
+    msgs = analyze_chat.chunk_messages('O\'Neil: "immer" \\ ä\nB: ok\nO\'Neil: nie')
+    dicts = [{"i": 0, "speaker": "O'Neil", "marker": "ATO_ABS"}, {"i": 1, "speaker": "B", "marker": "ATO_\u00e4"},
+             {"i": 2, "speaker": "O'Neil", "marker": "ATO_ABS"}, {"i": 2, "speaker": "WINDOW", "marker": "X"}]
+    summary = {"E": 2, "weighted_sum": 0.1 + 0.2, "theme": {"prim_score": {"Ä": 1.0}, "leer": {}},
+               "theme_trajectory": []}
+    for hits_in in (dicts, []):
+        hits = analyze_chat.HitTable.of(hits_in)
+        (path,) = analyze_chat.write_results(tmp_path, summary, msgs, hits)
+        ref = json.dumps({"messages": msgs, "hits": hits.to_dicts(), "per_speaker": hits.speaker_groups(),
+                          **summary}, ensure_ascii=False, indent=2)
+        assert path.read_text(encoding="utf-8") == ref
+    (path, hits_path, _) = analyze_chat.write_results(tmp_path, summary, msgs, analyze_chat.HitTable.of(dicts),
+                                                      fmt="ndjson")
+    assert hits_path.read_text(encoding="utf-8") == "".join(
+        json.dumps(h, ensure_ascii=False) + "\n" for h in dicts)
+
+
+def test_write_results_columnar(tmp_path):
+    import pytest
+    pytest.importorskip("pyarrow")
+    import pandas as pd
+    summary, msgs, hits = _sample_results()
+    for fmt, read in (("parquet", pd.read_parquet), ("arrow", pd.read_feather)):
+        _, hits_path, msgs_path = analyze_chat.write_results(tmp_path, summary, msgs, hits, fmt=fmt)
+        df = read(hits_path)
+        assert df.astype({"speaker": str, "marker": str}).to_dict("records") == hits.to_dicts()
+        assert read(msgs_path)["text"].tolist() == [m["text"] for m in msgs]
+
+
+def test_single_pass_renderer_and_sidecar_images(tmp_path):
+    tpl = ("<html><body><h1>{{title}}</h1>{{text:profiles}}<img src='{{img:ed}}'/>"
+           "{{table:t}}{{list:l}}{{unknown}}</body></html>")
+    ctx = {"title": "T", "images": {"ed": "QUJD", "tops:A": "REVG"},
+           "text": {"profiles": "<img src='{{img:tops:A}}'/>{{text:profiles}}"},
+           "tables": {"t": "<table/>"}, "lists": {"l": ["<x>"]}}
+    assert analyze_chat.render_html_report(tpl, ctx) == (
+        "<html><body><h1>T</h1><img src='data:image/png;base64,REVG'/>{{text:profiles}}"
+        "<img src='data:image/png;base64,QUJD'/><table/><ul><li>&lt;x&gt;</li></ul>{{unknown}}</body></html>")
+
+    urls = analyze_chat.write_sidecar_images(tmp_path, {"tops:Anna B": b"png", "leer": None}, "png")
+    assert urls["leer"] == "" and urls["tops:Anna B"].startswith("img/tops_Anna_B-")
+    assert (tmp_path / urls["tops:Anna B"]).read_bytes() == b"png"
+    html = analyze_chat.render_html_report("<img src='{{img:tops:Anna B}}'/>",
+                                           {"images": urls, "image_format": "url"})
+    assert html == f"<img src='{urls['tops:Anna B']}'/>"
+
+
+def test_report_escapes_speaker_names_and_renders_serially(tmp_path, monkeypatch):
+    args, R, lines = _absence_chat(tmp_path, monkeypatch, n=40)
+    (tmp_path / "report_template.html").write_text("<html><body>{{text:profiles}}</body></html>")
+    lines = [l.replace("A: ", "O'Neil: ", 1) for l in lines]
+    analyze_chat.analyze_one("\n".join(lines), R, tmp_path / "spec", args)
+    html = (tmp_path / "spec" / "report.html").read_text()
+    assert "src='#chart:tops:0'" in html and "alt='Top O&#x27;Neil'" in html
+    assert "chart:tops:O'" not in html
+    assert {"tops:0", "tops:1"} <= set(json.loads((tmp_path / "spec" / "charts.json").read_text()))
+
+    # ohne --jobs kein Prozess-Pool
+    def no_pool(*a, **kw):
+        raise AssertionError("Prozess-Pool ohne --jobs gestartet")
+    monkeypatch.setattr(analyze_chat, "ProcessPoolExecutor", no_pool)
+    args.charts = "svg"
+    analyze_chat.analyze_one("\n".join(lines), R, tmp_path / "svg", args)
+    assert "src='data:image/svg+xml;base64," in (tmp_path / "svg" / "report.html").read_text()
+
+
+def test_incremental_rerun_matches_full_analysis(tmp_path, monkeypatch):
+    args, R, lines = _absence_chat(tmp_path, monkeypatch, n=200)
+    chat = tmp_path / "chat.txt"
+    parsed = []
+    iter_messages = analyze_chat.iter_messages
+
+    def counting(lines, start=0):
+        for m in iter_messages(lines, start):
+            parsed.append(m["i"])
+            yield m
+    monkeypatch.setattr(analyze_chat, "iter_messages", counting)
+
+    def run(incremental):
+        args.incremental = incremental
+        out = tmp_path / ("inc" if incremental else "full")
+        del parsed[:]
+        info = analyze_chat.analyze_stream(chat, R, out, args)
+        return (info, list(parsed), json.loads((out / "results.json").read_text()),
+                (out / "hits.ndjson").read_text())
+
+    def check(text, reused, new):
+        chat.write_text(text)
+        info, seen, inc, inc_hits = run(True)
+        _, _, full, full_hits = run(False)
+        # nur der neue Teil wird gelesen und ausgewertet
+        assert info["reused_messages"] == reused and seen == list(range(reused, reused + new))
+        assert inc == full and inc_hits == full_hits
+
+    body = "\n".join(lines[:150]) + "\n"
+    check(body, 0, 150)
+    body += "\n".join(lines[150:153]) + "\n"                     # mitten im Fenster angehängt
+    check(body, 150, 3)
+    check(body + "A: immer", 153, 1)                             # letzte Zeile noch unvollständig
+    body += "A: immer idiot und dann\n"                          # ... und später ergänzt
+    check(body, 153, 1)
+    body += "\n".join(lines[154:200]) + "\n"
+    check(body, 154, 46)
+    assert any('"MEMA_' in h for h in (tmp_path / "full" / "hits.ndjson").read_text().splitlines())
+    check(body, 200, 0)                                          # nichts Neues
+
+    # Änderung in der Historie -> Präfix-Digest passt nicht -> voller Lauf
+    check(body.replace(lines[100], "A: immer immer", 1), 0, 200)
+
+    # anderes Marker-Set -> Zustand verworfen
+    R.marker_scanner = analyze_chat.PatternScanner({"ATO_E": r"\bimmer\b"})
+    check(body, 0, 200)
+
+    # gleitende Absence-Fenster: neuer Fingerprint, danach wieder nur der Rest
+    R.absence_config["window"]["step"] = 3
+    check("\n".join(lines[:150]) + "\n", 0, 150)
+    check(body, 150, 50)
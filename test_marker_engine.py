@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests für den MarkerEngine-Kern (marker_engine_core.py)
+"""
+
+import json
+import os
+
+import yaml
+
+from marker_engine_core import MarkerEngine
+
+
+def _write_engine_tree(root):
+    """Minimaler Marker-/Schema-/Registry-Baum für die Engine."""
+    atomic = root / "markers" / "atomic"
+    atomic.mkdir(parents=True)
+    (root / "schemata").mkdir()
+    (root / "plugins").mkdir()
+    (atomic / "ATO_ABSOLUTE_WORDING.yaml").write_text(yaml.safe_dump({
+        "id": "ATO_ABSOLUTE_WORDING",
+        "pattern": [r"\bimmer\b", r"\bnie\b"],
+        "scoring": {"weight": 1.5},
+    }), encoding="utf-8")
+    (atomic / "ATO_DETAIL_REQUEST.yaml").write_text(yaml.safe_dump({
+        "id": "ATO_DETAIL_REQUEST",
+        "pattern": r"mehr details",
+    }), encoding="utf-8")
+    spec_path = root / "DET_UNCERTAINTY.json"
+    spec_path.write_text(json.dumps({
+        "fires_marker": "ATO_DETAIL_REQUEST",
+        "rule": {"pattern": r"nicht sicher"},
+    }), encoding="utf-8")
+    registry = root / "DETECT_registry.json"
+    registry.write_text(json.dumps([
+        {"id": "DET_UNCERTAINTY", "module": "regex", "file_path": str(spec_path)},
+    ]), encoding="utf-8")
+    return spec_path
+
+
+def _engine(root):
+    return MarkerEngine(marker_root=str(root / "markers"),
+                        schema_root=str(root / "schemata"),
+                        detect_registry=str(root / "DETECT_registry.json"),
+                        plugin_root=str(root / "plugins"))
+
+
+def test_analyze_uses_precompiled_detectors(tmp_path):
+    spec_path = _write_engine_tree(tmp_path)
+    eng = _engine(tmp_path)
+
+    # Nach dem Laden darf analyze() die Spec-Datei nicht mehr brauchen
+    spec_path.unlink()
+    res = eng.analyze("Ich bin mir nicht sicher, du bist immer so.")
+
+    assert {"marker": "ATO_DETAIL_REQUEST", "source": "DET_UNCERTAINTY"} in res["hits"]
+    assert {"marker": "ATO_ABSOLUTE_WORDING", "source": "pattern"} in res["hits"]
+
+
+def test_refresh_rebuilds_only_on_content_change(tmp_path):
+    spec_path = _write_engine_tree(tmp_path)
+    eng = _engine(tmp_path)
+    table = eng.detectors
+    published = eng._state
+    files_before = dict(published.files)
+
+    # Nur mtime geändert -> Hash gleich -> kein Neuaufbau
+    st = spec_path.stat()
+    os.utime(spec_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    assert eng.refresh() is False
+    assert eng.detectors is table
+    # der veröffentlichte Zustand bleibt unangetastet, nur die Kopie kennt die neue mtime
+    assert published.files == files_before
+    assert eng._state.files[spec_path][0] == spec_path.stat().st_mtime_ns
+
+    spec_path.write_text(json.dumps({
+        "fires_marker": "ATO_DETAIL_REQUEST",
+        "rule": {"pattern": r"keine ahnung"},
+    }), encoding="utf-8")
+    assert eng.refresh() is True
+    assert eng.detectors is not table
+    assert eng.detectors[0].pattern.pattern == "keine ahnung"
+
+
+def test_analyze_batch_streams_in_input_order(tmp_path, monkeypatch):
+    import marker_engine_core
+    _write_engine_tree(tmp_path)
+    eng = _engine(tmp_path)
+    texts = ["immer", "nichts", "mehr details bitte", "nie", "ich bin nicht sicher"] * 20
+
+    expected = [eng.analyze(t)["hits"] for t in texts]
+    # kleiner Batch -> im Prozess
+    assert [r["hits"] for r in eng.analyze_batch(texts, workers=4)] == expected
+    # Pool-Pfad erzwingen
+    monkeypatch.setattr(marker_engine_core, "BATCH_INPROCESS_MAX", 10)
+    got = [r["hits"] for r in eng.analyze_batch(iter(texts), workers=2, chunksize=7)]
+    assert got == expected
+
+
+def _write_composed_markers(root):
+    """SEM/CLU/MEMA-Kette über composed_of auf den ATO-Markern aus _write_engine_tree."""
+    for sub, data in [
+        ("semantic", {"id": "SEM_ABSOLUTE_DEMAND",
+                      "composed_of": ["ATO_ABSOLUTE_WORDING", "ATO_DETAIL_REQUEST"],
+                      "activation": {"rule": "ANY 2 IN 30 messages"}}),
+        ("semantic", {"id": "SEM_ABSOLUTE_ONLY",
+                      "composed_of": ["ATO_ABSOLUTE_WORDING"],
+                      "activation": {"rule": "ANY 1"}}),
+        ("cluster", {"id": "CLU_PRESSURE",
+                     "composed_of": ["SEM_ABSOLUTE_DEMAND", "SEM_ABSOLUTE_ONLY"],
+                     "activation": {"rule": "AT_LEAST 2 DISTINCT SEMs IN 5 messages"}}),
+        ("meta", {"id": "MEMA_PRESSURE_PATTERN",
+                  "composed_of": ["CLU_PRESSURE"],
+                  "activation": {"rule": "ANY 1"}}),
+    ]:
+        d = root / "markers" / sub
+        d.mkdir(exist_ok=True)
+        (d / f"{data['id']}.yaml").write_text(yaml.safe_dump(data), encoding="utf-8")
+
+
+def test_composed_markers_fire_through_dag(tmp_path):
+    _write_engine_tree(tmp_path)
+    _write_composed_markers(tmp_path)
+    eng = _engine(tmp_path)
+    assert eng.marker_graph.order.index("SEM_ABSOLUTE_DEMAND") < eng.marker_graph.order.index("CLU_PRESSURE")
+
+    res = eng.analyze("Du willst immer mehr Details.")
+    composed = [h["marker"] for h in res["hits"] if h["source"] == "composed"]
+    assert composed == ["SEM_ABSOLUTE_DEMAND", "SEM_ABSOLUTE_ONLY", "CLU_PRESSURE", "MEMA_PRESSURE_PATTERN"]
+
+    res = eng.analyze("Das ist immer so.")
+    composed = [h["marker"] for h in res["hits"] if h["source"] == "composed"]
+    assert composed == ["SEM_ABSOLUTE_ONLY"]
+
+
+def test_composed_cycle_is_rejected():
+    import pytest
+    from marker_engine_core import MarkerGraph
+    with pytest.raises(ValueError):
+        MarkerGraph({"SEM_A": {"composed_of": ["SEM_B"]}, "SEM_B": {"composed_of": ["SEM_A"]}})
+
+
+def test_fusion_table_scores_match_schema_fusion(tmp_path):
+    _write_engine_tree(tmp_path)
+    schemata = tmp_path / "schemata"
+    for sid in ("SCH_DEFAULT", "SCH_BEZIEHUNG"):
+        (schemata / f"{sid}.json").write_text(json.dumps({"id": sid}), encoding="utf-8")
+    (schemata / "MASTER_SCH_CORE.json").write_text(json.dumps({
+        "active_schemata": ["SCH_DEFAULT", "SCH_BEZIEHUNG"],
+        "priority": {"SCH_DEFAULT.json": 0.5, "SCH_BEZIEHUNG.json": 0.7},
+        "fusion": "multiply",
+    }), encoding="utf-8")
+    eng = _engine(tmp_path)
+    assert eng.fusion_table["ATO_ABSOLUTE_WORDING"] == 1.5 * 0.5 * 0.7
+
+    hits = [{"marker": m} for m in ["ATO_ABSOLUTE_WORDING", "ATO_DETAIL_REQUEST", "ATO_UNKNOWN"] * 40]
+    expected = {}
+    for h in hits:
+        if h["marker"] in eng.fusion_table:
+            expected[h["marker"]] = expected.get(h["marker"], 0) + eng.fusion_table[h["marker"]]
+    # großer Batch (vektorisiert) und kleiner Batch (Schleife) liefern dasselbe
+    assert eng.score_hits(hits) == expected
+    assert eng.score_hits(hits[:3]) == {"ATO_ABSOLUTE_WORDING": 1.5 * 0.5 * 0.7,
+                                        "ATO_DETAIL_REQUEST": 1.0 * 0.5 * 0.7}
+
+
+def test_stream_evaluates_composed_rules_over_message_window(tmp_path):
+    _write_engine_tree(tmp_path)
+    _write_composed_markers(tmp_path)
+    eng = _engine(tmp_path)
+
+    convo = [("A", "Das ist immer so.", 0), ("B", "Ich will mehr Details.", 1)]
+    convo += [("A", "ok", 2 + k) for k in range(30)]
+    convo += [("B", "Noch mehr Details.", 40)]
+    out = list(eng.stream(iter(convo)))
+
+    composed = [[h["marker"] for h in r["hits"] if h["source"] == "composed"] for r in out]
+    assert composed[0] == ["SEM_ABSOLUTE_ONLY"]
+    # ANY 2 IN 30 messages: ATO aus Nachricht 0 + ATO aus Nachricht 1
+    assert composed[1] == ["SEM_ABSOLUTE_DEMAND", "CLU_PRESSURE", "MEMA_PRESSURE_PATTERN"]
+    # nach 30 Füllnachrichten ist Nachricht 0 aus dem Fenster gefallen
+    assert composed[-1] == []
+    assert out[-1]["speaker"] == "B" and out[-1]["index"] == len(convo) - 1
+
+
+def test_snapshot_is_reused_and_rebuilt_on_source_change(tmp_path):
+    _write_engine_tree(tmp_path)
+    _write_composed_markers(tmp_path)
+    snap = tmp_path / "engine.snapshot"
+
+    def build():
+        return MarkerEngine(marker_root=str(tmp_path / "markers"),
+                            schema_root=str(tmp_path / "schemata"),
+                            detect_registry=str(tmp_path / "DETECT_registry.json"),
+                            plugin_root=str(tmp_path / "plugins"),
+                            snapshot=str(snap))
+
+    text = "Du willst immer mehr Details, ich bin nicht sicher."
+    first = build()
+    assert not first.snapshot_used and snap.exists()
+    second = build()
+    assert second.snapshot_used
+    assert second.analyze(text)["hits"] == first.analyze(text)["hits"]
+    assert second.fusion_table == first.fusion_table
+
+    atomic = tmp_path / "markers" / "atomic"
+    (atomic / "ATO_DETAIL_REQUEST.yaml").write_text(yaml.safe_dump({
+        "id": "ATO_DETAIL_REQUEST", "pattern": r"genauer",
+    }), encoding="utf-8")
+    third = build()
+    assert not third.snapshot_used
+    assert {"marker": "ATO_DETAIL_REQUEST", "source": "pattern"} not in third.analyze(text)["hits"]
+    assert build().snapshot_used
+
+
+def test_refresh_reparses_only_changed_files_and_swaps_state(tmp_path):
+    _write_engine_tree(tmp_path)
+    _write_composed_markers(tmp_path)
+    eng = _engine(tmp_path)
+    old_state = eng._state
+    unchanged = eng.markers["ATO_ABSOLUTE_WORDING"]
+
+    (tmp_path / "markers" / "atomic" / "ATO_DETAIL_REQUEST.yaml").write_text(yaml.safe_dump({
+        "id": "ATO_DETAIL_REQUEST", "pattern": r"genauer",
+    }), encoding="utf-8")
+    assert eng.refresh() is True
+    assert eng._state is not old_state
+    # unveränderte Datei: dasselbe geparste Objekt, kein neues safe_load
+    assert eng.markers["ATO_ABSOLUTE_WORDING"] is unchanged
+    assert eng.markers["ATO_DETAIL_REQUEST"]["pattern"] == "genauer"
+    # der alte Zustand bleibt intakt für laufende Aufrufe
+    assert old_state.pattern_sources["ATO_DETAIL_REQUEST"] == "mehr details"
+    assert eng.refresh() is False
+
+
+def test_background_reload_picks_up_new_marker(tmp_path):
+    import time
+    _write_engine_tree(tmp_path)
+    eng = MarkerEngine(marker_root=str(tmp_path / "markers"),
+                       schema_root=str(tmp_path / "schemata"),
+                       detect_registry=str(tmp_path / "DETECT_registry.json"),
+                       plugin_root=str(tmp_path / "plugins"),
+                       reload_interval=0.01)
+    try:
+        assert "ATO_NEW" not in eng.markers
+        (tmp_path / "markers" / "atomic" / "ATO_NEW.yaml").write_text(yaml.safe_dump({
+            "id": "ATO_NEW", "pattern": r"\bneu\b",
+        }), encoding="utf-8")
+        deadline = time.time() + 5
+        while "ATO_NEW" not in eng.markers and time.time() < deadline:
+            time.sleep(0.01)
+        assert {"marker": "ATO_NEW", "source": "pattern"} in eng.analyze("alles neu")["hits"]
+        assert eng.reload_error is None
+    finally:
+        eng.stop_reload()
+
+
+def _write_plugins(root):
+    """Zwei Plugins; jedes vermerkt seinen Import in imports.log."""
+    log = root / "imports.log"
+    for pid, word in [("DET_PLUGIN_SORRY", "sorry"), ("DET_PLUGIN_LATER", "später")]:
+        (root / "plugins" / f"{pid}.py").write_text(
+            f"open({str(log)!r}, 'a').write({pid!r} + '\\n')\n"
+            f"def run(text):\n"
+            f"    return {{'fires': ['ATO_DETAIL_REQUEST'] if {word!r} in text else []}}\n",
+            encoding="utf-8")
+    registry = root / "DETECT_registry.json"
+    reg = json.loads(registry.read_text("utf-8"))
+    reg += [{"id": "DET_PLUGIN_SORRY", "module": "plugin", "file_path": "DET_PLUGIN_SORRY.py"},
+            {"id": "DET_PLUGIN_LATER", "module": "plugin", "file_path": "DET_PLUGIN_LATER.py"}]
+    registry.write_text(json.dumps(reg), encoding="utf-8")
+    return log
+
+
+def test_plugins_import_lazily_and_report_cost(tmp_path):
+    _write_engine_tree(tmp_path)
+    log = _write_plugins(tmp_path)
+    eng = _engine(tmp_path)
+    assert not log.exists()
+    assert [r["loaded"] for r in eng.plugin_report()] == [False, False]
+
+    res = eng.analyze("sorry, später")
+    assert {"marker": "ATO_DETAIL_REQUEST", "source": "DET_PLUGIN_SORRY"} in res["hits"]
+    assert sorted(log.read_text().split()) == ["DET_PLUGIN_LATER", "DET_PLUGIN_SORRY"]
+    assert all(r["loaded"] and r["import_ms"] >= 0 for r in eng.plugin_report())
+
+
+def test_preload_only_schema_referenced_plugins(tmp_path):
+    _write_engine_tree(tmp_path)
+    log = _write_plugins(tmp_path)
+    schemata = tmp_path / "schemata"
+    (schemata / "SCH_DEFAULT.json").write_text(json.dumps({
+        "id": "SCH_DEFAULT", "detectors": ["DET_PLUGIN_SORRY"]}), encoding="utf-8")
+    (schemata / "MASTER_SCH_CORE.json").write_text(json.dumps({
+        "active_schemata": ["SCH_DEFAULT"]}), encoding="utf-8")
+    eng = MarkerEngine(marker_root=str(tmp_path / "markers"),
+                       schema_root=str(schemata),
+                       detect_registry=str(tmp_path / "DETECT_registry.json"),
+                       plugin_root=str(tmp_path / "plugins"),
+                       preload_plugins="schemas")
+    assert log.read_text().split() == ["DET_PLUGIN_SORRY"]
+    assert {r["id"]: r["loaded"] for r in eng.plugin_report()} == {
+        "DET_PLUGIN_SORRY": True, "DET_PLUGIN_LATER": False}
+
+
+def test_unreferenced_plugins_still_run_with_schema(tmp_path):
+    _write_engine_tree(tmp_path)
+    log = _write_plugins(tmp_path)
+    schemata = tmp_path / "schemata"
+    (schemata / "SCH_DEFAULT.json").write_text(json.dumps({
+        "id": "SCH_DEFAULT", "detectors": ["DET_PLUGIN_SORRY"]}), encoding="utf-8")
+    (schemata / "MASTER_SCH_CORE.json").write_text(json.dumps({
+        "active_schemata": ["SCH_DEFAULT"]}), encoding="utf-8")
+    eng = _engine(tmp_path)
+    # ohne preload_plugins wird nichts vorab importiert
+    assert not log.exists()
+
+    res = eng.analyze("sorry, später")
+    # DET_PLUGIN_LATER nennt kein Schema – er läuft trotzdem und wird erst jetzt importiert
+    assert {h["source"] for h in res["hits"] if h["source"].startswith("DET_PLUGIN")} == {
+        "DET_PLUGIN_SORRY", "DET_PLUGIN_LATER"}
+    assert sorted(log.read_text().split()) == ["DET_PLUGIN_LATER", "DET_PLUGIN_SORRY"]
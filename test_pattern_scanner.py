@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test des PatternScanners gegen die klassische Einzel-Pattern-Schleife
+"""
+
+import random
+import re
+import sys
+
+import pytest
+
+from pattern_scanner import PatternScanner, required_literals, scan_loop
+
+# Sonderfälle: überlappende Treffer, Inline-Flags, Backreferences,
+# eigene benannte Gruppen, Leer-Matches, Umlaute/ß
+PATTERNS = {
+    "ATO_LONG": r"mehr details",
+    "ATO_SHORT": r"details",
+    "ATO_ABSOLUTE": [r"(?i)\bimmer\b", r"\bnie(mals)?\b"],
+    "ATO_REPEAT": r"\b(\w+) \1\b",
+    "ATO_DOTALL": r"(?s)aber.+doch",
+    "ATO_NAMED": r"(?P<who>du|ihr) bist",
+    "ATO_OPTIONAL": r"x*",
+    "ATO_SHARP_S": r"straße",
+    "ATO_NEVER": r"\bzzqx\b",
+}
+
+TEXTS = [
+    "Ich brauche mehr Details.",
+    "Das machst du IMMER so, nie anders.",
+    "ja ja, schon klar",
+    "Aber\nvielleicht doch",
+    "du bist so",
+    "STRASSE oder Straße?",
+    "",
+]
+
+
+def test_scanner_matches_loop_on_edge_cases():
+    scanner = PatternScanner(PATTERNS, chunk_size=3)
+    for text in TEXTS:
+        assert scanner.scan(text) == scan_loop(PATTERNS, text), text
+
+
+def test_scanner_matches_loop_on_random_texts():
+    rng = random.Random(3)
+    words = ["mehr", "details", "immer", "nie", "niemals", "aber", "doch", "du", "bist",
+             "ja", "straße", "und", "x", "\n"]
+    for chunk_size in (1, 2, 5, 16):
+        scanner = PatternScanner(PATTERNS, chunk_size=chunk_size)
+        for _ in range(300):
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 10)))
+            assert scanner.scan(text) == scan_loop(PATTERNS, text), text
+
+
+def test_scanner_accepts_compiled_patterns():
+    compiled = {mid: re.compile(p, re.IGNORECASE) for mid, p in
+                [("ATO_A", r"\bgrenze\b"), ("ATO_B", r"respekt")]}
+    scanner = PatternScanner(compiled)
+    assert scanner.scan("Bitte Grenze respektieren") == ["ATO_A", "ATO_B"]
+    assert scanner.scan("nichts") == []
+
+
+def test_required_literals():
+    assert required_literals(r"(?i)\bzeitplan\b") == {"zeitplan"}
+    assert required_literals(r"\b(aber|trotzdem|dennoch)\b") == {"aber", "trotzdem", "dennoch"}
+    assert required_literals(r"\bMehr\s+Details\b", re.IGNORECASE) == {"details"}
+    # optionale Teile und zu kurze Literale liefern keine Pflicht
+    assert required_literals(r"(immer)?\w+") is None
+    assert required_literals(r"\b(äh|hm+)\b") is None
+
+
+def test_prefilter_is_exact_for_ignorecase_specials():
+    # re.IGNORECASE setzt ı~i, İ~i, ſ~s, K (Kelvin)~k gleich – der Prefilter muss mitziehen
+    patterns = {"ATO_KISS": r"kiss", "ATO_DOTLESS": r"ıch", "ATO_LONG_S": r"ſtop",
+                "ATO_UMLAUT": r"größe", "ATO_GREEK": r"σοφία"}
+    scanner = PatternScanner(patterns)
+    for text in ["KİSS", "kıſſ", "ICH", "İch", "STOP", "GRÖSSE", "GRÖẞE", "ΣΟΦΊΑ"]:
+        assert scanner.scan(text) == scan_loop(patterns, text), text
+    rng = random.Random(11)
+    chars = ["k", "K", "K", "i", "I", "ı", "İ", "s", "S", "ſ", "c", "h", "t", "o", "p",
+             "g", "r", "ö", "Ö", "ß", "ẞ", "e", "σ", "ς", "Σ", "ο", "φ", "ί", "α"]
+    for _ in range(2000):
+        text = "".join(rng.choice(chars) for _ in range(rng.randint(0, 12)))
+        assert scanner.scan(text) == scan_loop(patterns, text), repr(text)
+
+
+def test_prefilter_stats_report_skipped_evaluations():
+    scanner = PatternScanner(PATTERNS)
+    for text in TEXTS:
+        scanner.scan(text)
+    st = scanner.stats()
+    assert st["texts"] == len(TEXTS)
+    assert st["skipped"] > 0
+    assert 0.0 < st["skip_ratio"] < 1.0
+    assert st["regex_evaluations"] + st["skipped"] == st["texts"] * st["patterns"]
+
+
+def test_scan_corpus_matches_per_text_scan():
+    # Anker, Lookarounds, \s über Nachrichtengrenzen, Leer-Matches
+    patterns = dict(PATTERNS)
+    patterns.update({
+        "ATO_START": r"^ja\b", "ATO_END": r"doch$", "ATO_A": r"\Adu", "ATO_Z": r"bist\Z",
+        "ATO_NOT_AFTER": r"(?<!ja )du", "ATO_NOT_BEFORE": r"du(?! bist)",
+        "ATO_SPACE": r"\w\s+\w", "ATO_NEG": r"[^a-z ]{2}", "ATO_LB": r"(?<=\s)bist",
+        "ATO_MULTILINE": r"(?m)^aber", "ATO_SINGLE": r"\b[a-z]\b",
+    })
+    rng = random.Random(5)
+    words = ["mehr", "details", "immer", "nie", "aber", "doch", "du", "bist", "ja",
+             "straße", "x", "\n", "!", ""]
+    for chunk_size in (1, 3, 16):
+        for prefilter in (True, False):
+            scanner = PatternScanner(patterns, chunk_size=chunk_size, prefilter=prefilter)
+            for _ in range(100):
+                texts = [" ".join(rng.choice(words) for _ in range(rng.randint(0, 8)))
+                         for _ in range(rng.randint(0, 12))]
+                assert scanner.scan_corpus(texts) == [scanner.scan(t) for t in texts], texts
+
+
+@pytest.mark.skipif(sys.version_info < (3, 11), reason="(?>…) und *+ erst ab Python 3.11")
+def test_scan_corpus_rejects_non_backtracking_constructs():
+    # atomare Gruppe verschluckt den Trenner, das Lookbehind scheitert dann im Puffer
+    patterns = {"A": r"(?>ab\s*)(?<=b)", "B": r"ab", "C": r"ab\s*+(?<=b)"}
+    texts = ["ab", "cd", "ab"]
+    for prefilter in (True, False):
+        scanner = PatternScanner(patterns, prefilter=prefilter)
+        assert scanner.scan_corpus(texts) == [scanner.scan(t) for t in texts] == [
+            ["A", "B", "C"], [], ["A", "B", "C"]]